@@ -0,0 +1,227 @@
+"""Async (ASGI) entry point.
+
+Serves the long-running AI routes natively on an event loop, so one process
+can hold hundreds of in-flight Twelve Labs and Gemini calls:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 3000
+
+The routes below use the async variants of the same service instances as the
+Flask app. Firebase writes are started before the response is sent and run
+while it goes out. Every other route (uploads, jobs, streaming listings, SSE)
+falls through to the Flask app in `main`.
+"""
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from flask_cors.core import get_cors_headers, get_cors_options
+from uvicorn.middleware.wsgi import WSGIMiddleware
+from werkzeug.datastructures import Headers
+
+from main import app as flask_app, allowed_origins, tl_service, gemini_service, firebase_service, single_flight
+from prompts import PRESENTATION_QUERY
+from services.metrics import metrics
+from services.registry import services
+
+wsgi_app = WSGIMiddleware(flask_app)
+# The same CORS options as the Flask app; preflight requests have no native route and go to Flask.
+cors_options = get_cors_options(flask_app, {"origins": allowed_origins()})
+routes = []
+
+
+class Request:
+    def __init__(self, scope, receive, params):
+        self.scope = scope
+        self.receive = receive
+        self.params = params
+        self.query = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+
+    async def json(self):
+        body = b''
+        while True:
+            message = await self.receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        try:
+            return json.loads(body) if body else {}
+        except ValueError:
+            return {}
+
+
+class JSONResponse:
+    def __init__(self, payload, status=200, background=None, headers=None):
+        self.payload = payload
+        self.status = status
+        self.background = background
+        self.headers = list(headers or [])
+
+    async def __call__(self, send):
+        body = json.dumps(self.payload).encode()
+        # Start persisting before the response goes out so the two overlap.
+        task = asyncio.ensure_future(self.background) if self.background is not None else None
+        await send({
+            'type': 'http.response.start',
+            'status': self.status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+                       + [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in self.headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+        if task is not None:
+            result = await task
+            if isinstance(result, dict) and "error" in result:
+                print(f"Background write failed: {result['error']}")
+
+
+def cors_headers(scope):
+    request_headers = Headers([(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']])
+    return list(get_cors_headers(cors_options, request_headers, scope['method']).items(multi=True))
+
+
+def route(method, pattern, when=None):
+    def register(handler):
+        # Reported in metrics with Flask's rule syntax, e.g. /videos/<video_id>/analyze
+        rule = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'<\1>', pattern)
+        routes.append((method, re.compile(f"^{pattern}$"), when, handler, rule))
+        return handler
+    return register
+
+
+def is_forced(request, data=None):
+    if request.query.get('force', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return bool((data or {}).get('force'))
+
+
+@route('GET', r'/')
+async def health_check(request):
+    return JSONResponse({"status": "ok"})
+
+
+@route('GET', r'/health/twelvelabs')
+async def twelvelabs_health_check(request):
+    return JSONResponse(await tl_service.check_connection_async())
+
+
+@route('GET', r'/health/gemini')
+async def gemini_health_check(request):
+    return JSONResponse(await asyncio.to_thread(gemini_service.check_connection))
+
+
+@route('GET', r'/indexes')
+async def get_indexes(request):
+    return JSONResponse(await tl_service.get_indexes_async())
+
+
+# Streaming listings (all=true) stay on the Flask route.
+@route('GET', r'/indexes/(?P<index_id>[^/]+)/videos', when=lambda query: 'all' not in query)
+async def get_videos(request):
+    def number(name):
+        value = request.query.get(name)
+        return int(value) if value and value.isdigit() else None
+
+    page = await tl_service.get_videos_page_async(
+        request.params['index_id'],
+        page=number('page'),
+        page_limit=number('page_limit'),
+        sort_by=request.query.get('sort_by'),
+        sort_option=request.query.get('sort_option')
+    )
+    if "error" in page:
+        flask_app.logger.error("Error listing videos of index %s: %s", request.params['index_id'], page["error"])
+        return JSONResponse(page, 502)
+
+    page_info = page["page_info"]
+    headers = [(header, str(page_info[key])) for header, key in
+               (('X-Page', 'page'), ('X-Total-Pages', 'total_page'), ('X-Total-Results', 'total_results'))
+               if key in page_info]
+    return JSONResponse(page["data"], headers=headers)
+
+
+@route('POST', r'/videos/(?P<video_id>[^/]+)/analyze')
+async def analyze_video(request):
+    video_id = request.params['video_id']
+    data = await request.json()
+    force = is_forced(request, data)
+
+    async def analyze():
+        return await tl_service.analyze_video_async(video_id, force=force)
+
+    # Requests joining one already in flight share its result; only the caller that made it saves it.
+    try:
+        video_analysis, leader = await single_flight.do_async(
+            single_flight.make_key("analyze", video_id=video_id, force=force), analyze)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, 500)
+
+    saved_data = {"analysis": video_analysis}
+    return JSONResponse(saved_data, background=firebase_service.save_analysis_async(video_id, saved_data) if leader else None)
+
+
+@route('POST', r'/videos/(?P<video_id>[^/]+)/presentation')
+async def generate_presentation(request):
+    video_id = request.params['video_id']
+    data = await request.json()
+
+    firebase_data = await firebase_service.get_analysis_async(video_id)
+    if not firebase_data:
+        return JSONResponse({"error": "Video analysis not found. Please analyze the video first."}, 404)
+    video_analysis = firebase_data.get("analysis")
+    if not video_analysis:
+        return JSONResponse({"error": "Video analysis data not found in the Firebase record."}, 404)
+
+    num_slides = data.get('num_slides', 5)
+    force = is_forced(request, data)
+
+    async def generate():
+        return await gemini_service.generate_slides_async(
+            video_analysis, PRESENTATION_QUERY.format(num_slides=num_slides), video_id=video_id, force=force
+        )
+
+    slides, leader = await single_flight.do_async(single_flight.make_key(
+        "generate_slides", video_id=video_id, analysis=video_analysis, num_slides=num_slides, force=force), generate)
+    if "error" in slides:
+        return JSONResponse(slides)
+    return JSONResponse(slides, background=firebase_service.save_presentation_async(video_id, slides) if leader else None)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Blocking SDK calls (Firebase) run on the default executor; size it for many in-flight requests.
+            threads = int(os.environ.get('ASGI_THREADPOOL_SIZE', '64'))
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=threads))
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if 'twelvelabs' in services.created():
+                await tl_service.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'http':
+        query = parse_qs(scope.get('query_string', b'').decode())
+        for method, pattern, when, handler, rule in routes:
+            match = pattern.match(scope['path'])
+            if match and scope['method'] == method and (when is None or when(query)):
+                operation = metrics.http_operation(method, rule)
+                trace = metrics.start_trace(operation.name)
+                start = operation.start()
+                try:
+                    response = await handler(Request(scope, receive, match.groupdict()))
+                except BaseException:
+                    operation.finish(start, True)
+                    raise
+                operation.finish(start, response.status >= 500, status=response.status)
+                if trace is not None:
+                    metrics.end_trace(trace, status=response.status)
+                response.headers.extend(cors_headers(scope))
+                return await response(send)
+    return await wsgi_app(scope, receive, send)
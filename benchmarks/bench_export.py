@@ -0,0 +1,104 @@
+"""Benchmark for GET /presentations/<video_id>/export.
+
+Starts the Flask app with the local Firebase backend and `--decks` stored
+decks of `--slides` slides, then for each EXPORT_WORKERS setting:
+
+- cold: every deck is exported once, all at once, so each request renders;
+- warm: the same requests again, now served from the export cache.
+
+`GET /` requests are sent alongside the exports to show whether
+renders hold up the other request threads.
+
+    python -m benchmarks.bench_export [--format pdf] [--decks 24] [--slides 40] [--workers 0,2] [--json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.driver import drive
+
+
+def serve(env, args, urls):
+    """Runs one server until it is terminated."""
+    os.environ.update(env)
+    from main import create_app
+    from benchmarks.servers import start_flask
+    from services.registry import services
+    app = create_app()
+    firebase = services.get('firebase')
+    # One more deck than is timed, exported first to start the render processes
+    for i in range(args.decks + 1):
+        firebase.save_presentation(f"video{i}", {
+            "presentation_name": f"Benchmark deck {i}",
+            "slides": [{"title": f"Slide {n} of deck {i}",
+                        "sub_points": [f"Point {p} of slide {n}, long enough to wrap onto a second line of the page " * 2
+                                       for p in range(5)]}
+                       for n in range(args.slides)]
+        })
+    url, _ = start_flask(app, args.threads)
+    urls.put(url)
+    threading.Event().wait()
+
+
+def run(workers, args):
+    context = multiprocessing.get_context("spawn")
+    urls = context.Queue()
+    with tempfile.TemporaryDirectory(prefix="export-") as directory:
+        env = {"EXPORT_WORKERS": str(workers), "EXPORT_CACHE_DIR": os.path.join(directory, "exports"),
+               "SINGLE_FLIGHT_DIR": os.path.join(directory, "single-flight"), "FIREBASE_BACKEND": "local",
+               "KEEP_ALIVE": "off", "RESULT_STORE_DIR": "",
+               "GEMINI_API_KEY": "benchmark", "TWELVELABS_API_KEY": "benchmark"}
+        # Not a daemon, which could not start the render processes
+        server = context.Process(target=serve, args=(env, args, urls))
+        server.start()
+        try:
+            base = urls.get(timeout=60)
+            requests = [("export", "GET", f"/presentations/video{i}/export?format={args.format}", {})
+                        for i in range(args.decks)]
+            requests += [("health", "GET", "/", {})] * args.decks
+            warmup = [("GET", f"/presentations/video{args.decks}/export?format={args.format}", None)]
+            result = {"workers": workers}
+            for phase in ("cold", "warm"):
+                stats = drive(base, requests, len(requests), warmup)
+                result[phase] = {route: {key: stats["routes"][route][key] for key in ("errors", "p50_ms", "p95_ms")}
+                                 for route in ("export", "health")}
+            result["cache"] = httpx.get(f"{base}/health/exports").json()
+            return result
+        finally:
+            server.terminate()
+            server.join()
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", default="pdf", choices=("pptx", "pdf", "md"))
+    parser.add_argument("--decks", type=int, default=24)
+    parser.add_argument("--slides", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=64, help="request threads of the server")
+    parser.add_argument("--workers", default="0,2", help="comma-separated EXPORT_WORKERS settings to compare")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = [run(int(workers), args) for workers in args.workers.split(",")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'workers':>7} {'phase':>5} {'export p50/p95 ms':>20} {'health p50/p95 ms':>20} {'errors':>7}")
+    for row in results:
+        for phase in ("cold", "warm"):
+            export, health = row[phase]["export"], row[phase]["health"]
+            print(f"{row['workers']:>7} {phase:>5} {export['p50_ms']:>9}/{export['p95_ms']:<10} "
+                  f"{health['p50_ms']:>9}/{health['p95_ms']:<10} {export['errors'] + health['errors']:>7}")
+        print(f"{'':>7} renders {row['cache']['renders']}, hits {row['cache']['hits']}")
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,103 @@
+"""Micro-benchmark for deck extraction from LLM responses.
+
+Compares the original find('{') / rfind('}') + json.loads extraction with
+services.llm_json on synthetic Gemini-style responses (code fence, leading
+and trailing prose) of increasing size, both as a whole response and fed in
+small streaming chunks.
+
+    python -m benchmarks.bench_llm_json [--slides 50 500 5000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_json import DeckStreamParser, parse_deck
+
+
+def synthetic_response(num_slides):
+    deck = {
+        "presentation_name": "Synthetic Deck",
+        "slides": [
+            {
+                "slide_number": i,
+                "title": f"Slide {i}: a \"quoted\" title with {{braces}}",
+                "sub_points": [f"Point {j} of slide {i}, with some filler text to pad it out." for j in range(5)]
+            }
+            for i in range(1, num_slides + 1)
+        ]
+    }
+    return "Here is your presentation:\n```json\n" + json.dumps(deck, indent=2) + "\n```\nLet me know if you need changes."
+
+
+def find_rfind(text):
+    start = text.find('{')
+    end = text.rfind('}') + 1
+    return json.loads(text[start:end])
+
+
+def whole(text):
+    deck, errors = parse_deck(text)
+    assert not errors, errors
+    return deck
+
+
+def repaired(text):
+    # A trailing comma defeats the fast path and forces the scanning parser.
+    deck, errors = parse_deck(text.replace('\n    }\n  ]', ',\n    }\n  ]', 1))
+    assert not errors, errors
+    return deck
+
+
+def streamed(text, chunk_size=64):
+    parser = DeckStreamParser()
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i:i + chunk_size])
+    deck, errors = parser.finish()
+    assert not errors, errors
+    return deck
+
+
+def measure(fn, text, min_seconds=0.5):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn(text)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = []
+    for num_slides in args.slides:
+        text = synthetic_response(num_slides)
+        # The trailing prose has no braces here, so the old extraction still works and can be compared.
+        methods = (("find_rfind", find_rfind), ("parse_deck", whole), ("repair", repaired), ("stream_64", streamed))
+        for name, fn in methods:
+            results.append({
+                "slides": num_slides,
+                "bytes": len(text),
+                "method": name,
+                "ms_per_parse": round(measure(fn, text), 3)
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'slides':>7} {'bytes':>10} {'method':>12} {'ms/parse':>10}")
+    for row in results:
+        print(f"{row['slides']:>7} {row['bytes']:>10} {row['method']:>12} {row['ms_per_parse']:>10}")
+
+
+if __name__ == '__main__':
+    main()
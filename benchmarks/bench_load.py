@@ -0,0 +1,339 @@
+"""Offline load test of the main routes against stub upstreams.
+
+The app runs in this process with Twelve Labs (the analyze client and a
+local HTTP server for the upload/task endpoints), Gemini and the Firebase
+Realtime Database replaced by stubs from benchmarks.stubs. Each stub takes a
+latency/failure distribution "median[:sigma[:failure_rate]]": seconds, the
+log-normal shape, and the fraction of calls that fail. The services
+themselves (result store, read cache, summaries, job queue, task poller) run
+unchanged.
+
+A driver in a separate process first sends each route in the mix on its own
+(`--requests` each), then a weighted mix of all of them (`--requests` in
+total), with `--concurrency` requests in flight. Analyses and presentations
+are forced, so every one reaches the stubs. For each phase and route it
+reports p50/p95/p99 latency, throughput and errors, with the server's peak
+RSS while the phase ran. `--output` writes the results as JSON and
+`--baseline` compares them with an earlier file.
+
+    python -m benchmarks.bench_load [--mix upload=1,analyze=4,presentation=4,presentations=11]
+        [--requests 200] [--concurrency 16] [--gemini 1.0:0.4:0.01] [--output run.json] [--baseline old.json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+os.environ.setdefault('TWELVELABS_API_KEY', 'benchmark')
+os.environ['FIREBASE_BACKEND'] = 'local'
+os.environ['KEEP_ALIVE'] = 'off'
+os.environ['RESULT_STORE_DIR'] = ''
+# Measure the app against the stub latencies; set these to test the limits instead.
+os.environ.setdefault('TWELVELABS_RATE_LIMIT', '0')
+os.environ.setdefault('GEMINI_RATE_LIMIT', '0')
+
+from benchmarks.driver import drive_in_subprocess
+from benchmarks.servers import start_asgi, start_flask
+from benchmarks.stubs import (AsyncStubTwelveLabsClient, Latency, StubDatabase, StubGeminiModel, StubTaskServer,
+                              StubTwelveLabsClient, sample_deck)
+
+ROUTES = {
+    "upload": "POST /upload",
+    "analyze": "POST /videos/<video_id>/analyze",
+    "presentation": "POST /videos/<video_id>/presentation",
+    "presentations": "GET /presentations",
+}
+INDEX_ID = "stub-index"
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ROUTES:
+            raise argparse.ArgumentTypeError(f"unknown route {name!r}; choose from {', '.join(ROUTES)}")
+        mix[name.strip()] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def max_rss_bytes():
+    """Peak RSS of this process so far (ru_maxrss is in KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakRss:
+    """Samples this process's RSS in the background and keeps the peak seen while active.
+
+    Without /proc, reports the lifetime peak from getrusage instead.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    def __enter__(self):
+        if rss_bytes() is None:
+            self.thread = None
+        else:
+            self.peak = rss_bytes()
+            self.thread = threading.Thread(target=self._sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        if self.thread is None:
+            self.peak = max_rss_bytes()
+        else:
+            self.thread.join()
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / 2 ** 20, 1)
+
+
+def stub_firebase(database):
+    """A FirebaseService on the stub database, with the write buffer and read cache the environment asks for."""
+    from services.firebase_cache import FirebaseReadCache
+    from services.firebase_service import FirebaseService
+    from services.metrics import InstrumentedDatabase
+    from services.write_behind import WriteBehindBuffer
+    database = InstrumentedDatabase(database)
+    write_behind = os.environ.get('FIREBASE_WRITE_MODE', 'sync') == 'write_behind'
+    return FirebaseService(database, WriteBehindBuffer.from_env(database) if write_behind else None,
+                           FirebaseReadCache.from_env(database))
+
+
+def seed(database, videos, presentations):
+    """Stores an analysis for every video and `presentations` saved decks, without stub latency."""
+    from services.firebase_service import FirebaseService
+    updates = {f"video_analysis/video{i}": {"analysis": "Stub analysis of the video."} for i in range(videos)}
+    for i in range(presentations):
+        updates.update(FirebaseService.presentation_updates(f"seeded{i:05d}", sample_deck()))
+    database.local.reference('/').update(updates)
+
+
+def install_stubs(args):
+    """Points every upstream of the app at a stub; returns the stubs by name for their call counts."""
+    upstreams = {
+        "twelvelabs_analyze": Latency.parse(args.twelvelabs, args.seed),
+        "twelvelabs_tasks": Latency.parse(args.twelvelabs_tasks, args.seed + 1),
+        "gemini": Latency.parse(args.gemini, args.seed + 2),
+        "firebase": Latency.parse(args.firebase, args.seed + 3),
+    }
+    task_server = StubTaskServer(duration=args.index_duration, latency=upstreams["twelvelabs_tasks"])
+    os.environ['TWELVELABS_BASE_URL'] = task_server.url
+    database = StubDatabase(upstreams["firebase"])
+    seed(database, args.videos, args.presentations)
+
+    import main
+    from services.registry import services
+    # Registered before anything asks for the Firebase service, which is created on first use.
+    services.register('firebase', lambda: stub_firebase(database))
+    main.tl_service.client = StubTwelveLabsClient(upstreams["twelvelabs_analyze"])
+    main.tl_service._async_client = AsyncStubTwelveLabsClient(upstreams["twelvelabs_analyze"])
+    for client in main.gemini_service.router.clients:
+        client.model = StubGeminiModel(upstreams["gemini"])
+    return upstreams, task_server
+
+
+def workload(routes, weights, num_requests, args, rng):
+    """`num_requests` requests drawn from `routes` in proportion to `weights`, as driver tuples."""
+    video = b"\0" * (args.upload_kb * 1024)
+    requests = []
+    for name in rng.choices(routes, weights, k=num_requests):
+        if name == "upload":
+            options = {"files": {"video": ("clip.mp4", video, "video/mp4")}, "data": {"index_id": INDEX_ID}}
+            requests.append((ROUTES[name], "POST", "/upload", options))
+        elif name == "presentations":
+            requests.append((ROUTES[name], "GET", f"/presentations?limit={args.page_size}", {}))
+        else:
+            path = f"/videos/video{rng.randrange(args.videos)}/{name}?force=true"
+            requests.append((ROUTES[name], "POST", path, {"json": {"num_slides": 5}}))
+    return requests
+
+
+def wait_for_uploads(timeout):
+    """Waits for upload jobs to finish indexing; returns job counts by status and the time waited."""
+    from services.registry import services
+    if 'job_queue' not in services.created():
+        return None
+    job_queue = services.get('job_queue')
+    start = time.monotonic()
+    while True:
+        statuses = [job["status"] for job in job_queue.list()]
+        if all(status in ("completed", "failed") for status in statuses) or time.monotonic() - start > timeout:
+            break
+        time.sleep(0.1)
+    counts = {status: statuses.count(status) for status in sorted(set(statuses))}
+    return {"jobs": counts, "wait_seconds": round(time.monotonic() - start, 2)}
+
+
+def rows(results):
+    """(phase, route, stats) for every measured route, then the mixed total as route "all"."""
+    for route, stats in results["isolated"].items():
+        yield "isolated", route, stats
+    if results["mixed"]:
+        for route, stats in results["mixed"]["routes"].items():
+            yield "mixed", route, stats
+        yield "mixed", "all", results["mixed"]
+
+
+def compare(baseline, results):
+    """Relative change of the latency percentiles and throughput against a baseline run."""
+    before = {(phase, route): stats for phase, route, stats in rows(baseline)}
+    changes = []
+    for phase, route, stats in rows(results):
+        old = before.get((phase, route))
+        if old is None:
+            continue
+        change = {"phase": phase, "route": route}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            change[key] = [old[key], stats[key],
+                           round((stats[key] - old[key]) / old[key] * 100, 1) if old[key] else None]
+        changes.append(change)
+    return changes
+
+
+def print_results(results):
+    print(f"{'phase':>8} {'route':>36} {'reqs':>6} {'errors':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'peak RSS MB':>12}")
+    for phase, route, row in rows(results):
+        peak = row.get("peak_rss_mb", "")
+        print(f"{phase:>8} {route:>36} {row['requests']:>6} {row['errors']:>6} {row['throughput_rps']:>8} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {peak:>12}")
+    print("upstream calls (failed): " + ", ".join(
+        f"{name} {stats['calls']} ({stats['failures']})" for name, stats in results["upstreams"].items()))
+    if results["uploads"]:
+        print(f"upload jobs after {results['uploads']['wait_seconds']}s: {results['uploads']['jobs']}")
+    print(f"peak RSS of the run: {results['max_rss_mb']} MB")
+
+
+def print_comparison(changes):
+    print(f"\n{'phase':>8} {'route':>36} " + " ".join(f"{key:>22}" for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")))
+    for change in changes:
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            old, new, percent = change[key]
+            cells.append(f"{old}->{new} ({'n/a' if percent is None else f'{percent:+}%'})")
+        print(f"{change['phase']:>8} {change['route']:>36} " + " ".join(f"{cell:>22}" for cell in cells))
+
+
+def run(args, phases):
+    upstreams, task_server = install_stubs(args)
+    if args.mode == "asgi":
+        import asgi
+        base_url, stop = start_asgi(asgi.app)
+    else:
+        import main
+        base_url, stop = start_flask(main.app, args.flask_threads)
+
+    rng = random.Random(args.seed)
+    routes, weights = list(args.mix), list(args.mix.values())
+    results = {
+        "config": {**{key: value for key, value in vars(args).items() if key not in ("output", "baseline", "json")},
+                   "python": platform.python_version(), "platform": platform.platform(),
+                   "started_at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "isolated": {},
+        "mixed": None,
+        "uploads": None,
+    }
+    try:
+        # One request per route first, so lazy service creation is not measured.
+        warmup = [request for name in routes for request in workload([name], [1], 1, args, random.Random(0))]
+        drive_in_subprocess(base_url, warmup, len(routes))
+        if "isolated" in phases:
+            for name in routes:
+                with PeakRss() as rss:
+                    stats = drive_in_subprocess(base_url, workload([name], [1], args.requests, args, rng), args.concurrency)
+                results["isolated"][ROUTES[name]] = {**stats["routes"][ROUTES[name]], "peak_rss_mb": rss.peak_mb}
+        if "mixed" in phases:
+            with PeakRss() as rss:
+                stats = drive_in_subprocess(base_url, workload(routes, weights, args.requests, args, rng), args.concurrency)
+            results["mixed"] = {**stats, "peak_rss_mb": rss.peak_mb}
+        results["uploads"] = wait_for_uploads(args.job_timeout)
+    finally:
+        stop()
+        task_server.close()
+    results["upstreams"] = {name: latency.get_stats() for name, latency in upstreams.items()}
+    results["upstreams"]["twelvelabs_tasks"]["requests"] = dict(task_server.requests)
+    results["max_rss_mb"] = round(max_rss_bytes() / 2 ** 20, 1)
+    return results
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", type=parse_mix, default="upload=1,analyze=4,presentation=4,presentations=11",
+                        help="relative weight of each route")
+    parser.add_argument("--requests", type=int, default=200, help="requests per isolated route, and in the mix")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--phases", default="isolated,mixed")
+    parser.add_argument("--mode", choices=("flask", "asgi"), default="flask")
+    parser.add_argument("--flask-threads", type=int, default=16)
+    parser.add_argument("--twelvelabs", default="0.5:0.3:0.01", help="analyze call latency[:sigma[:failure rate]]")
+    parser.add_argument("--twelvelabs-tasks", default="0.05:0.3:0.01", help="upload and task status requests")
+    parser.add_argument("--gemini", default="1.0:0.4:0.01")
+    parser.add_argument("--firebase", default="0.02:0.5:0.001", help="each Realtime Database call")
+    parser.add_argument("--index-duration", type=float, default=3.0, help="seconds until an upload is indexed")
+    parser.add_argument("--upload-kb", type=int, default=256)
+    parser.add_argument("--videos", type=int, default=50, help="distinct video ids, each with a stored analysis")
+    parser.add_argument("--presentations", type=int, default=500, help="presentations stored before the run")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--job-timeout", type=float, default=60, help="how long to wait for upload jobs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+    phases = {phase.strip() for phase in args.phases.split(',')}
+    output, baseline = (os.path.abspath(path) if path else None for path in (args.output, args.baseline))
+
+    # Uploads are staged under ./uploads and caches under ./.cache; keep them out of the checkout.
+    workdir = tempfile.TemporaryDirectory(prefix="bench-load-")
+    os.chdir(workdir.name)
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        # The app prints as it serves; with --json only the results go to stdout.
+        results = run(args, phases)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    changes = None
+    if baseline:
+        with open(baseline) as f:
+            changes = compare(json.load(f), results)
+    if args.json:
+        print(json.dumps({**results, "comparison": changes} if changes is not None else results, indent=2))
+        return
+    print_results(results)
+    if changes is not None:
+        print_comparison(changes)
+
+
+if __name__ == '__main__':
+    main_()
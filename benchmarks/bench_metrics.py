@@ -0,0 +1,121 @@
+"""Micro-benchmark for the overhead of services.metrics instrumentation.
+
+Times a no-op function bare, wrapped with @instrument, and inside an
+Operation.timed() block, and a Flask route's request hooks from
+routes.metrics; then @instrument again with every request traced. Overhead
+is the difference from the bare call, per call. Exits with status 1 when
+the overhead of an untraced case is over the budget (1 µs by default).
+
+    python -m benchmarks.bench_metrics [--calls 200000] [--budget-ns 1000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from routes.metrics import metrics_bp, record_request, start_request_timer
+from services.metrics import MetricsRegistry, instrument, metrics
+
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def best_of(fn, calls, repeats=5):
+    return min(per_call_ns(fn, calls) for _ in range(repeats))
+
+
+def flask_app(instrumented):
+    app = Flask(__name__)
+    if instrumented:
+        app.register_blueprint(metrics_bp)
+
+    @app.route('/ping')
+    def ping():
+        return 'ok'
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--budget-ns", type=float, default=1000, help="allowed overhead per untraced call or request")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+
+    def noop():
+        return None
+
+    wrapped = instrument("bench", "noop", registry=registry)(noop)
+    operation = registry.operation("bench", "timed")
+
+    def timed():
+        with operation.timed():
+            noop()
+
+    def clock():
+        time.perf_counter()
+        time.perf_counter()
+
+    bare = best_of(noop, args.calls)
+    results = [
+        {"case": "bare call", "ns_per_call": round(bare, 1), "overhead_ns": 0.0},
+        # For scale: the two clock reads any timing needs, on this machine.
+        {"case": "2x perf_counter()", "ns_per_call": round(best_of(clock, args.calls), 1)},
+        {"case": "@instrument", "ns_per_call": round(best_of(wrapped, args.calls), 1)},
+        {"case": "Operation.timed()", "ns_per_call": round(best_of(timed, args.calls), 1)},
+    ]
+    for row in results[1:]:
+        row["overhead_ns"] = round(row["ns_per_call"] - bare, 1)
+
+    # The request hooks, called directly inside one request context; a test client
+    # round trip varies by far more than the hooks cost.
+    app = flask_app(True)
+    with app.test_request_context('/ping'):
+        response = app.make_response('ok')
+
+        def hooks():
+            start_request_timer()
+            record_request(response)
+
+        hooks_ns = round(best_of(hooks, args.calls // 4), 1)
+    results.append({"case": "Flask request hooks", "ns_per_call": hooks_ns, "overhead_ns": hooks_ns})
+    # The hooks record into the process-wide registry.
+    metrics.operations.pop(("http", "GET /ping"), None)
+    metrics.routes.pop(("/ping", "GET"), None)
+    for row in results[2:]:
+        row["within_budget"] = row["overhead_ns"] <= args.budget_ns
+
+    # Last, since once a registry samples traces every recording looks for the current trace.
+    traced_registry = MetricsRegistry(trace_sample=1.0)
+    traced = instrument("bench", "noop", registry=traced_registry)(noop)
+    trace = traced_registry.start_trace("bench")
+    # A trace keeps every span, so measure fewer calls to bound its memory.
+    traced_ns = round(best_of(traced, min(args.calls, 20000)), 1)
+    trace.spans.clear()
+    results.append({"case": "@instrument, traced", "ns_per_call": traced_ns, "overhead_ns": round(traced_ns - bare, 1)})
+
+    over = [row["case"] for row in results if row.get("within_budget") is False]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'case':>24} {'ns/call':>10} {'overhead ns':>12}")
+        for row in results:
+            print(f"{row['case']:>24} {row['ns_per_call']:>10} {row['overhead_ns']:>12}")
+    if over:
+        print(f"Over the {args.budget_ns:g} ns budget: {', '.join(over)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
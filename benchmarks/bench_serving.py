@@ -0,0 +1,82 @@
+"""Compares the Flask (WSGI) and async (ASGI) serving modes against local stub upstreams.
+
+Both servers run in this process on top of the same service instances, with
+the Twelve Labs, Gemini and Firebase clients replaced by stubs that sleep for
+a configurable latency. The Flask app is served by a thread pool of
+`--flask-threads` threads, like a gunicorn worker with `--threads`. A
+driver in a separate process keeps `--concurrency` analyze/presentation
+requests in flight and reports latency percentiles and throughput per mode.
+
+    python -m benchmarks.bench_serving [--requests 200] [--concurrency 100] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('FIREBASE_DATABASE_URL', 'https://benchmark.firebaseio.com')
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+os.environ.setdefault('TWELVELABS_API_KEY', 'benchmark')
+os.environ['RESULT_STORE_DIR'] = ''
+# Measure the serving modes, not the upstream rate limits.
+os.environ['TWELVELABS_RATE_LIMIT'] = '0'
+os.environ['GEMINI_RATE_LIMIT'] = '0'
+
+import asgi
+import main
+from benchmarks.driver import drive_in_subprocess
+from benchmarks.servers import start_asgi, start_flask
+from benchmarks.stubs import AsyncStubTwelveLabsClient, StubFirebase, StubGeminiModel, StubTwelveLabsClient
+
+
+def install_stubs(args):
+    main.tl_service.client = StubTwelveLabsClient(args.analyze_latency)
+    main.tl_service._async_client = AsyncStubTwelveLabsClient(args.analyze_latency)
+    main.gemini_service.model = StubGeminiModel(args.gemini_latency)
+    StubFirebase(args.firebase_latency).install(main.firebase_service)
+
+
+def workload(num_requests, concurrency):
+    """Alternating analyze/presentation requests over `concurrency` videos, plus analyses to seed them."""
+    warmup = [("POST", f"/videos/v{i}/analyze", None) for i in range(concurrency)]
+    requests = []
+    for i in range(num_requests):
+        video_id = f"v{i % concurrency}"
+        route = "analyze" if i % 2 else "presentation"
+        requests.append(("POST", f"/videos/{video_id}/{route}?force=true", {"num_slides": 5}))
+    return requests, warmup
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--flask-threads", type=int, default=8)
+    parser.add_argument("--analyze-latency", type=float, default=0.5)
+    parser.add_argument("--gemini-latency", type=float, default=1.0)
+    parser.add_argument("--firebase-latency", type=float, default=0.05)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    install_stubs(args)
+    results = {}
+    for mode, start in (("flask", lambda: start_flask(main.app, args.flask_threads)), ("asgi", lambda: start_asgi(asgi.app))):
+        base_url, stop = start()
+        try:
+            requests, warmup = workload(args.requests, args.concurrency)
+            results[mode] = drive_in_subprocess(base_url, requests, args.concurrency, warmup)
+        finally:
+            stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':>6} {'reqs':>6} {'errors':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for mode, row in results.items():
+        print(f"{mode:>6} {row['requests']:>6} {row['errors']:>6} {row['throughput_rps']:>8} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,102 @@
+"""Benchmark for coalescing duplicate analyze and presentation requests.
+
+Starts `--workers` Flask worker processes, like gunicorn workers sharing one
+SINGLE_FLIGHT_DIR, with the Twelve Labs, Gemini and Firebase clients
+replaced by stubs. For each of `--videos` videos, `--duplicates` identical
+requests arrive at once, spread over the workers: first analyses, then
+presentations. Runs with SINGLE_FLIGHT off and on, and reports the upstream
+calls made, the calls saved and the latency.
+
+    python -m benchmarks.bench_single_flight [--workers 2] [--videos 10] [--duplicates 8] [--json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.driver import drive
+
+
+def serve(env, args, urls):
+    """Runs one worker until it is terminated."""
+    os.environ.update(env)
+    import main
+    from benchmarks.servers import start_flask
+    from benchmarks.stubs import StubFirebase, StubGeminiModel, StubTwelveLabsClient
+    main.tl_service.client = StubTwelveLabsClient(args.analyze_latency)
+    main.gemini_service.model = StubGeminiModel(args.gemini_latency)
+    firebase = StubFirebase(args.firebase_latency)
+    firebase.install(main.firebase_service)
+    # Every worker sees the same analyses, as it would in the shared database. The stub is per
+    # process, so presentations use videos that are not analyzed again during the run.
+    for i in range(args.videos, 2 * args.videos):
+        firebase.data[f"video_analysis/video{i}"] = {"analysis": "Stub analysis of the video."}
+    url, _ = start_flask(main.app, args.threads)
+    urls.put(url)
+    threading.Event().wait()
+
+
+def run(mode, args):
+    context = multiprocessing.get_context("spawn")
+    urls = context.Queue()
+    with tempfile.TemporaryDirectory(prefix="single-flight-") as directory:
+        env = {"SINGLE_FLIGHT": mode, "SINGLE_FLIGHT_DIR": directory, "FIREBASE_BACKEND": "local",
+               "KEEP_ALIVE": "off", "RESULT_STORE_DIR": "", "GEMINI_API_KEY": "benchmark",
+               "TWELVELABS_API_KEY": "benchmark", "TWELVELABS_RATE_LIMIT": "0", "GEMINI_RATE_LIMIT": "0"}
+        workers = [context.Process(target=serve, args=(env, args, urls), daemon=True) for _ in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        try:
+            bases = [urls.get(timeout=60) for _ in workers]
+            result = {"mode": mode}
+            for route, videos in (("analyze", range(args.videos)), ("presentation", range(args.videos, 2 * args.videos))):
+                # Absolute URLs spread the duplicates of every video over the workers.
+                requests = [(route, "POST", f"{bases[(video * args.duplicates + copy) % len(bases)]}/videos/video{video}/{route}",
+                             {"json": {"num_slides": 5}})
+                            for video in videos for copy in range(args.duplicates)]
+                stats = drive(bases[0], requests, len(requests))
+                result[route] = {key: stats[key] for key in ("requests", "errors", "p50_ms", "p95_ms")}
+            totals = [httpx.get(f"{base}/health/single-flight").json() for base in bases]
+            for key in ("calls", "coalesced", "shared_across_workers", "saved"):
+                result[key] = sum(stats[key] for stats in totals)
+            return result
+        finally:
+            for worker in workers:
+                worker.terminate()
+                worker.join()
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=32, help="request threads per worker")
+    parser.add_argument("--videos", type=int, default=10)
+    parser.add_argument("--duplicates", type=int, default=8, help="identical requests per video")
+    parser.add_argument("--analyze-latency", type=float, default=0.5)
+    parser.add_argument("--gemini-latency", type=float, default=1.0)
+    parser.add_argument("--firebase-latency", type=float, default=0.05)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = [run(mode, args) for mode in ("off", "on")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':>4} {'upstream calls':>15} {'saved':>6} {'across workers':>15} "
+          f"{'analyze p50/p95 ms':>20} {'presentation p50/p95 ms':>24} {'errors':>7}")
+    for row in results:
+        print(f"{row['mode']:>4} {row['calls']:>15} {row['saved']:>6} {row['shared_across_workers']:>15} "
+              f"{row['analyze']['p50_ms']:>9}/{row['analyze']['p95_ms']:<10} "
+              f"{row['presentation']['p50_ms']:>11}/{row['presentation']['p95_ms']:<12} "
+              f"{row['analyze']['errors'] + row['presentation']['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main_()
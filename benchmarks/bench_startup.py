@@ -0,0 +1,82 @@
+"""Benchmark for import time and cold start of the Flask app.
+
+Each run is a fresh interpreter. It measures `import main`, then the first
+`GET /` (a worker that only answers health checks) and the first
+`GET /presentations` (which creates the Firebase service, on the local
+backend). The `eager` mode also creates every service right after import, as
+the app did before services became lazy. Also lists which heavy SDKs were
+loaded after the import.
+
+    python -m benchmarks.bench_startup [--runs 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+heavy = [name for name in ("twelvelabs", "google.generativeai", "firebase_admin", "httpx", "apscheduler") if name in sys.modules]
+if sys.argv[1] == "eager":
+    for name in ("twelvelabs", "gemini", "firebase", "job_queue", "batch_runner"):
+        main.services.get(name)
+        getattr(main.services.get(name), "client", None)
+    main.gemini_service.model
+ready = time.perf_counter()
+client = main.app.test_client()
+client.get("/")
+health = time.perf_counter()
+client.get("/presentations?limit=1")
+listed = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_health_ms": (health - start) * 1000,
+    "first_presentations_ms": (listed - start) * 1000,
+    "heavy_after_import": heavy
+}))
+'''
+
+
+def run(mode):
+    env = {**os.environ, "FIREBASE_BACKEND": "local", "FIREBASE_LOCAL_PATH": "", "KEEP_ALIVE": "off",
+           "TWELVELABS_API_KEY": "benchmark", "GEMINI_API_KEY": "benchmark", "RESULT_STORE_DIR": ""}
+    output = subprocess.run([sys.executable, "-c", CHILD, mode], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = []
+    for mode in ("lazy", "eager"):
+        samples = [run(mode) for _ in range(args.runs)]
+        results.append({
+            "mode": mode,
+            "runs": args.runs,
+            **{key: round(statistics.median(sample[key] for sample in samples), 1)
+               for key in ("import_ms", "first_health_ms", "first_presentations_ms")},
+            "heavy_after_import": samples[0]["heavy_after_import"]
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':>6} {'import ms':>10} {'first / ms':>11} {'first /presentations ms':>24}  SDKs loaded by import")
+    for row in results:
+        print(f"{row['mode']:>6} {row['import_ms']:>10} {row['first_health_ms']:>11} "
+              f"{row['first_presentations_ms']:>24}  {', '.join(row['heavy_after_import']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
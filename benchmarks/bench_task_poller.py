@@ -0,0 +1,119 @@
+"""Benchmark for waiting on many Twelve Labs indexing tasks at once.
+
+Compares the original loop (one thread per task, a GET every 2 seconds) with
+the shared TaskPoller against a local stub of the tasks endpoint. Tasks take
+between --min-duration and --max-duration seconds to index. Reports the
+number of status requests and how long after a task became ready the waiter
+found out. --time-scale shrinks every duration and interval to keep runs short.
+
+    python -m benchmarks.bench_task_poller [--tasks 50] [--time-scale 0.2] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.stubs import StubTaskServer
+from services.task_poller import TaskPoller, SUCCEEDED
+
+
+def fetcher(stub):
+    session = requests.Session()
+
+    def fetch(task_id):
+        r = session.get(f"{stub.url}/tasks/{task_id}")
+        return r.status_code, r.json(), r.headers
+    return fetch
+
+
+def fixed_interval(stub, task_ids, interval):
+    fetch = fetcher(stub)
+    detected = {}
+
+    def wait(task_id):
+        while True:
+            status_code, task, _ = fetch(task_id)
+            if status_code == 200 and task.get("status") in SUCCEEDED:
+                detected[task_id] = time.monotonic()
+                return
+            time.sleep(interval)
+
+    threads = [threading.Thread(target=wait, args=(task_id,)) for task_id in task_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return detected
+
+
+def shared_poller(stub, task_ids, scale):
+    poller = TaskPoller(fetcher(stub), min_interval=2 * scale, max_interval=30 * scale,
+                        max_requests_per_second=2 / scale)
+    detected = {}
+    futures = []
+    for task_id in task_ids:
+        future = poller.watch(task_id)
+        future.add_done_callback(lambda f, task_id=task_id: detected.setdefault(task_id, time.monotonic()))
+        futures.append(future)
+    for future in futures:
+        future.result()
+    poller.shutdown()
+    return detected
+
+
+def run(mode, args):
+    rng = random.Random(42)
+    durations = [rng.uniform(args.min_duration, args.max_duration) * args.time_scale for _ in range(args.tasks)]
+    stub = StubTaskServer(duration=lambda number: durations[number - 1])
+    try:
+        task_ids = [stub.create_task() for _ in range(args.tasks)]
+        start = time.monotonic()
+        if mode == "fixed_2s":
+            detected = fixed_interval(stub, task_ids, 2 * args.time_scale)
+        else:
+            detected = shared_poller(stub, task_ids, args.time_scale)
+        elapsed = time.monotonic() - start
+        delays = [(detected[task_id] - stub.ready_at(task_id)) / args.time_scale for task_id in task_ids]
+        return {
+            "mode": mode,
+            "tasks": args.tasks,
+            "requests": stub.requests["get"],
+            "requests_per_task": round(stub.requests["get"] / args.tasks, 1),
+            "mean_delay_s": round(statistics.mean(delays), 2),
+            "max_delay_s": round(max(delays), 2),
+            "wall_s": round(elapsed, 2)
+        }
+    finally:
+        stub.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--min-duration", type=float, default=20)
+    parser.add_argument("--max-duration", type=float, default=120)
+    parser.add_argument("--time-scale", type=float, default=0.2)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = [run(mode, args) for mode in ("fixed_2s", "shared_poller")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':>14} {'tasks':>6} {'requests':>9} {'req/task':>9} {'mean delay':>11} {'max delay':>10}")
+    for row in results:
+        print(f"{row['mode']:>14} {row['tasks']:>6} {row['requests']:>9} {row['requests_per_task']:>9} "
+              f"{row['mean_delay_s']:>10}s {row['max_delay_s']:>9}s")
+
+
+if __name__ == '__main__':
+    main()
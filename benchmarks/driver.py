@@ -0,0 +1,74 @@
+"""HTTP load driver, run in its own process so it doesn't share a GIL with the servers under test."""
+import asyncio
+import multiprocessing
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(quantiles[49] * 1000, 1),
+        "p95_ms": round(quantiles[94] * 1000, 1),
+        "p99_ms": round(quantiles[98] * 1000, 1),
+    }
+
+
+def _normalize(request):
+    """A (method, path, json_body) tuple, or (route, method, path, httpx_options) to report it per route."""
+    if len(request) == 3:
+        method, path, body = request
+        return None, method, path, {"json": body}
+    return request
+
+
+async def _drive(base_url, requests, concurrency, warmup):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=600) as client:
+        await asyncio.gather(*(client.request(method, path, **options)
+                               for _, method, path, options in map(_normalize, warmup)))
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = {}
+        errors = {}
+
+        async def one(route, method, path, options):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, **options)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies.setdefault(route, []).append(time.perf_counter() - start)
+                errors[route] = errors.get(route, 0) + int(failed)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(*_normalize(request)) for request in requests))
+        elapsed = time.perf_counter() - start
+        result = summarize([latency for samples in latencies.values() for latency in samples],
+                           sum(errors.values()), elapsed)
+        if any(route is not None for route in latencies):
+            # Per-route throughput is over the whole run, so the routes add up to the total.
+            result["routes"] = {route: summarize(samples, errors[route], elapsed)
+                                for route, samples in sorted(latencies.items(), key=lambda item: str(item[0]))}
+        return result
+
+
+def drive(base_url, requests, concurrency, warmup=()):
+    """Sends `requests` with `concurrency` in flight; returns latency stats, per route when requests name one."""
+    return asyncio.run(_drive(base_url, requests, concurrency, warmup))
+
+
+def drive_in_subprocess(base_url, requests, concurrency, warmup=()):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(drive, base_url, requests, concurrency, warmup).result()
@@ -0,0 +1,56 @@
+"""Serves an app on a free local port for the benchmarks, with Werkzeug (WSGI) or uvicorn (ASGI)."""
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class PooledWSGIServer(ThreadingMixIn, BaseWSGIServer):
+    """Werkzeug server that handles requests on a fixed-size thread pool."""
+
+    request_queue_size = 1024
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app, handler=QuietHandler)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_flask(app, threads):
+    """Serves a WSGI app on `threads` threads, like a gunicorn worker with `--threads`; returns (url, stop)."""
+    port = free_port()
+    server = PooledWSGIServer('127.0.0.1', port, app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{port}", server.shutdown
+
+
+def start_asgi(app):
+    """Serves an ASGI app with uvicorn; returns (url, stop)."""
+    import uvicorn
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', timeout_keep_alive=60))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return f"http://127.0.0.1:{port}", stop
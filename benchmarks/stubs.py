@@ -0,0 +1,345 @@
+"""Local stand-ins for the upstream services, with configurable latency and failures.
+
+They replace the upstream clients on already-built service instances, so the
+service code itself (result store, parsing, persistence calls) still runs.
+Every `latency` accepts a number of seconds or a `Latency` distribution.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+
+from services.local_db import LocalDatabase
+
+
+def sample_deck(num_slides=5):
+    return {
+        "presentation_name": "Benchmark Deck",
+        "slides": [
+            {"slide_number": i, "title": f"Slide {i}", "sub_points": ["Point A", "Point B", "Point C"]}
+            for i in range(1, num_slides + 1)
+        ]
+    }
+
+
+class StubFailure(Exception):
+    """Raised by a stub call that `Latency` decided should fail."""
+
+
+class Latency:
+    """Latency and failure distribution of one stub upstream.
+
+    Latencies are log-normal with the given `median` (seconds) and shape
+    `sigma`; sigma 0 gives a fixed latency, 0.5 a p99 about 3x the median.
+    Each call fails with probability `failure_rate`. Calls and failures are
+    counted.
+    """
+
+    def __init__(self, median, sigma=0.0, failure_rate=0.0, seed=None):
+        self.median = median
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    @classmethod
+    def of(cls, value):
+        return value if isinstance(value, Latency) else cls(float(value))
+
+    @classmethod
+    def parse(cls, spec, seed=None):
+        """Parses "median[:sigma[:failure_rate]]", e.g. "0.5:0.4:0.02"."""
+        median, sigma, failure_rate = (spec.split(':') + ['0', '0'])[:3]
+        return cls(float(median), float(sigma), float(failure_rate), seed)
+
+    def sample(self):
+        """Returns (seconds, fails) for one call."""
+        with self.lock:
+            self.calls += 1
+            seconds = self.median * self.random.lognormvariate(0, self.sigma) if self.sigma else self.median
+            fails = self.random.random() < self.failure_rate
+            self.failures += int(fails)
+        return seconds, fails
+
+    def wait(self):
+        seconds, fails = self.sample()
+        time.sleep(seconds)
+        if fails:
+            raise StubFailure("injected upstream failure")
+
+    async def wait_async(self):
+        seconds, fails = self.sample()
+        await asyncio.sleep(seconds)
+        if fails:
+            raise StubFailure("injected upstream failure")
+
+    def get_stats(self):
+        return {"median_s": self.median, "sigma": self.sigma, "failure_rate": self.failure_rate,
+                "calls": self.calls, "failures": self.failures}
+
+
+class _Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class StubTwelveLabsClient:
+    """Answers `analyze` after `latency` seconds, blocking or async."""
+
+    def __init__(self, latency=1.0, analysis="Stub analysis of the video."):
+        self.latency = Latency.of(latency)
+        self.analysis = analysis
+
+    def analyze(self, video_id, prompt, **kwargs):
+        self.latency.wait()
+        return _Result(data=f"{self.analysis} ({video_id})")
+
+
+class AsyncStubTwelveLabsClient(StubTwelveLabsClient):
+    async def analyze(self, video_id, prompt, **kwargs):
+        await self.latency.wait_async()
+        return _Result(data=f"{self.analysis} ({video_id})")
+
+
+class StubGeminiModel:
+    """Returns a fenced JSON deck after `latency` seconds, blocking or async.
+
+    With `stream=True` the deck arrives in `chunk_size` character chunks.
+    """
+
+    def __init__(self, latency=2.0, num_slides=5, chunk_size=64):
+        self.latency = Latency.of(latency)
+        self.text = "```json\n" + json.dumps(sample_deck(num_slides), indent=2) + "\n```"
+        self.chunk_size = chunk_size
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.latency.wait()
+        if stream:
+            return (_Result(text=self.text[i:i + self.chunk_size]) for i in range(0, len(self.text), self.chunk_size))
+        return _Result(text=self.text)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await self.latency.wait_async()
+        return _Result(text=self.text)
+
+
+class StubFirebase:
+    """In-memory replacement for the FirebaseService data methods, with per-call latency."""
+
+    def __init__(self, latency=0.05):
+        self.latency = Latency.of(latency)
+        self.data = {}
+
+    def install(self, firebase_service):
+        for name in ("save_analysis", "get_analysis", "save_presentation", "get_presentation", "save_many"):
+            setattr(firebase_service, name, getattr(self, name))
+
+    def _set(self, path, value):
+        self.latency.wait()
+        self.data[path] = value
+        return {"success": True}
+
+    def _get(self, path):
+        self.latency.wait()
+        return self.data.get(path)
+
+    def save_many(self, updates):
+        self.latency.wait()
+        self.data.update(updates)
+        return {"success": True}
+
+    def save_analysis(self, video_id, analysis):
+        return self._set(f"video_analysis/{video_id}", analysis)
+
+    def get_analysis(self, video_id):
+        return self._get(f"video_analysis/{video_id}")
+
+    def save_presentation(self, video_id, presentation):
+        return self._set(f"presentations/{video_id}", presentation)
+
+    def get_presentation(self, video_id):
+        return self._get(f"presentations/{video_id}")
+
+
+class StubDatabase:
+    """Realtime Database stand-in for FirebaseService(database=...).
+
+    A LocalDatabase whose reference calls (get, set, update) each take
+    `latency` and may raise StubFailure, so the service's own read cache,
+    summaries and queries still run. `local` takes writes with no latency,
+    e.g. to seed data.
+    """
+
+    def __init__(self, latency=0.02):
+        self.latency = Latency.of(latency)
+        self.local = LocalDatabase()
+
+    def reference(self, path='/'):
+        return _StubReference(self.latency, self.local.reference(path))
+
+
+class _StubReference:
+    def __init__(self, latency, ref):
+        self.latency = latency
+        self.ref = ref
+
+    def get(self, *args, **kwargs):
+        self.latency.wait()
+        return self.ref.get(*args, **kwargs)
+
+    def set(self, value):
+        self.latency.wait()
+        return self.ref.set(value)
+
+    def update(self, value):
+        self.latency.wait()
+        return self.ref.update(value)
+
+    def order_by_key(self):
+        return _StubReference(self.latency, self.ref.order_by_key())
+
+    def start_at(self, start):
+        return _StubReference(self.latency, self.ref.start_at(start))
+
+    def limit_to_first(self, limit):
+        return _StubReference(self.latency, self.ref.limit_to_first(limit))
+
+
+class StubTaskServer:
+    """Local HTTP server with the Twelve Labs task endpoints.
+
+    POST /tasks drains the upload body and creates a task that becomes ready
+    `duration` seconds later (a callable gets the task number), reporting
+    `process.percentage` while indexing. GET /tasks/<id> returns it. With
+    `rate_limit`, more than that many requests per second get a 429 with
+    Retry-After, and with `rate_headers` as well, task responses carry
+    X-Ratelimit-Remaining and X-Ratelimit-Reset (an epoch timestamp). With
+    `latency`, every request takes that long and a failed one gets a 503.
+    Every request is counted in `requests`.
+    """
+
+    def __init__(self, duration=10.0, rate_limit=None, latency=None, rate_headers=False):
+        self.duration = duration
+        self.rate_limit = rate_limit
+        self.rate_headers = rate_headers
+        self.latency = Latency.of(latency) if latency is not None else None
+        self.tasks = {}
+        self.requests = {"create": 0, "get": 0, "throttled": 0, "failed": 0}
+        self.window = [0.0, 0]
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _failed(self):
+                if stub.latency is None:
+                    return False
+                seconds, fails = stub.latency.sample()
+                time.sleep(seconds)
+                if fails:
+                    with stub.lock:
+                        stub.requests["failed"] += 1
+                    self._reply(503, {"code": "service_unavailable"})
+                return fails
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                elif self.headers.get("Transfer-Encoding") == "chunked":
+                    while True:
+                        size = int(self.rfile.readline().strip() or b"0", 16)
+                        self.rfile.read(size + 2)
+                        if size == 0:
+                            break
+                if self._failed():
+                    return
+                self._reply(201, {"_id": stub.create_task()})
+
+            def do_GET(self):
+                throttled = stub.throttle()
+                if throttled:
+                    self._reply(429, {"code": "too_many_requests"}, {"Retry-After": str(throttled)})
+                    return
+                if self._failed():
+                    return
+                task = stub.get_task(self.path.rstrip('/').rsplit('/', 1)[-1])
+                if task is None:
+                    self._reply(404, {"code": "not_found"})
+                else:
+                    self._reply(200, task, stub.rate_limit_headers())
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def create_task(self):
+        with self.lock:
+            number = next(self.counter)
+            self.requests["create"] += 1
+            duration = self.duration(number) if callable(self.duration) else self.duration
+            task_id = f"task{number}"
+            self.tasks[task_id] = {"created": time.monotonic(), "duration": duration, "index_id": "stub-index"}
+            return task_id
+
+    def ready_at(self, task_id):
+        task = self.tasks[task_id]
+        return task["created"] + task["duration"]
+
+    def get_task(self, task_id):
+        with self.lock:
+            self.requests["get"] += 1
+            task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        elapsed = time.monotonic() - task["created"]
+        if elapsed >= task["duration"]:
+            return {"_id": task_id, "status": "ready", "index_id": task["index_id"], "video_id": f"video-{task_id}"}
+        return {"_id": task_id, "status": "indexing", "index_id": task["index_id"],
+                "process": {"percentage": round(100 * elapsed / task["duration"], 1)}}
+
+    def throttle(self):
+        """Returns seconds to wait when the request is over the rate limit, else 0."""
+        if not self.rate_limit:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window[0] >= 1:
+                self.window = [now, 0]
+            self.window[1] += 1
+            if self.window[1] > self.rate_limit:
+                self.requests["throttled"] += 1
+                return 1
+            return 0
+
+    def rate_limit_headers(self):
+        if not (self.rate_limit and self.rate_headers):
+            return {}
+        with self.lock:
+            remaining = max(0, self.rate_limit - self.window[1])
+            reset = time.time() + max(0.0, 1 - (time.monotonic() - self.window[0]))
+        return {"X-Ratelimit-Remaining": str(remaining), "X-Ratelimit-Reset": f"{reset:.3f}"}
+
+    def close(self):
+        self.server.shutdown()
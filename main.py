@@ -1,97 +1,279 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_file, url_for
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 import os
-import requests
-from datetime import datetime
-import atexit
-from apscheduler.schedulers.background import BackgroundScheduler
+import json
+import base64
+import hashlib
+import shutil
+import uuid
 
 # Load environment variables from .env file
 load_dotenv()
 
-from services.twelvelabs_service import TwelveLabsService
-from services.gemini_service import GeminiService
-from services.firebase_service import FirebaseService
+from services.registry import services
+from services.keep_alive import start_keep_alive_from_env
+from services.upload_stream import UploadProgress
+from services.task_poller import verify_webhook_signature
 from routes.presentations import presentations_bp
+from routes.metrics import metrics_bp
+from prompts import PRESENTATION_QUERY
 
-# Initialize services
-tl_service = TwelveLabsService()
-gemini_service = GeminiService()
-firebase_service = FirebaseService()
+# Shared services, each created on first use, so a worker answering only
+# health checks never loads the Twelve Labs, Gemini or Firebase SDKs.
+tl_service = services.lazy('twelvelabs')
+gemini_service = services.lazy('gemini')
+firebase_service = services.lazy('firebase')
+job_queue = services.lazy('job_queue')
+batch_runner = services.lazy('batch_runner')
+single_flight = services.lazy('single_flight')
 
-app = Flask(__name__)
+api = Blueprint('api', __name__)
 
-# Configure CORS
-allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
-CORS(app, resources={r"/*": {"origins": allowed_origins}})
 
+def allowed_origins():
+    return os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 
-# Register blueprints
-app.register_blueprint(presentations_bp)
 
-def wake_up_app():
-    """Pings the Moody Bomb website to prevent it from sleeping."""
-    try:
-        app_url = os.getenv('APP_URL')
-        if app_url:
-            response = requests.get(app_url)
-            if response.status_code == 200:
-                print(f"Successfully pinged {app_url} at {datetime.now()}")
-            else:
-                print(f"Failed to ping {app_url} (status code: {response.status_code}) at {datetime.now()}")
-        else:
-            print("APP_URL environment variable not set.")
-    except Exception as e:
-        print(f"Error occurred while pinging app: {e}")
-
-# Create a background scheduler
-scheduler = BackgroundScheduler()
-scheduler.add_job(wake_up_app, 'interval', minutes=9)
-scheduler.start()
-
-# Shut down the scheduler when exiting the app
-atexit.register(lambda: scheduler.shutdown())
-
-
-@app.route('/', methods=['GET'])
+def create_app():
+    app = Flask(__name__)
+
+    # Configure CORS
+    CORS(app, resources={r"/*": {"origins": allowed_origins()}})
+
+    # Register blueprints
+    app.register_blueprint(api)
+    app.register_blueprint(presentations_bp)
+    app.register_blueprint(metrics_bp)
+
+    # Runs in one process per host, however many workers call create_app
+    start_keep_alive_from_env()
+    return app
+
+
+@api.route('/', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok"})
 
-@app.route('/health/twelvelabs', methods=['GET'])
+@api.route('/health/twelvelabs', methods=['GET'])
 def twelvelabs_health_check():
     status = tl_service.check_connection()
     return jsonify(status)
 
-@app.route('/health/gemini', methods=['GET'])
+@api.route('/health/twelvelabs/metrics', methods=['GET'])
+def twelvelabs_request_metrics():
+    return jsonify(tl_service.get_request_metrics())
+
+@api.route('/health/twelvelabs/cache', methods=['GET'])
+def twelvelabs_cache_stats():
+    return jsonify(tl_service.get_cache_stats())
+
+@api.route('/health/twelvelabs/tasks', methods=['GET'])
+def twelvelabs_task_stats():
+    return jsonify(tl_service.get_task_stats())
+
+@api.route('/health/twelvelabs/thumbnails', methods=['GET'])
+def twelvelabs_thumbnail_stats():
+    if tl_service.thumbnail_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **tl_service.thumbnail_cache.get_stats()})
+
+@api.route('/health/firebase/writes', methods=['GET'])
+def firebase_write_stats():
+    return jsonify(firebase_service.get_write_stats())
+
+@api.route('/health/firebase/cache', methods=['GET'])
+def firebase_cache_stats():
+    return jsonify(firebase_service.get_cache_stats())
+
+@api.route('/health/single-flight', methods=['GET'])
+def single_flight_stats():
+    return jsonify(single_flight.get_stats())
+
+@api.route('/health/gemini', methods=['GET'])
 def gemini_health_check():
     status = gemini_service.check_connection()
     return jsonify(status)
 
-@app.route('/indexes', methods=['GET'])
+@api.route('/health/gemini/models', methods=['GET'])
+def gemini_model_stats():
+    return jsonify(gemini_service.get_model_stats())
+
+@api.route('/indexes', methods=['GET'])
 def get_indexes():
     indexes = tl_service.get_indexes()
     return jsonify(indexes)
 
-@app.route('/indexes/<index_id>/videos', methods=['GET'])
+@api.route('/indexes/<index_id>/videos', methods=['GET'])
 def get_videos(index_id):
-    videos = tl_service.get_videos(index_id)
-    return jsonify(videos)
+    sort_by = request.args.get('sort_by')
+    sort_option = request.args.get('sort_option')
+    page_limit = request.args.get('page_limit', type=int)
+
+    if request.args.get('all', '').lower() in ('1', 'true', 'yes'):
+        return stream_all_videos(index_id, page_limit or 50, sort_by, sort_option)
+
+    page = tl_service.get_videos_page(
+        index_id,
+        page=request.args.get('page', type=int),
+        page_limit=page_limit,
+        sort_by=sort_by,
+        sort_option=sort_option
+    )
+    if "error" in page:
+        current_app.logger.error("Error listing videos of index %s: %s", index_id, page["error"])
+        return jsonify(page), 502
+
+    response = jsonify(page["data"])
+    page_info = page["page_info"]
+    if "page" in page_info:
+        response.headers['X-Page'] = str(page_info["page"])
+    if "total_page" in page_info:
+        response.headers['X-Total-Pages'] = str(page_info["total_page"])
+    if "total_results" in page_info:
+        response.headers['X-Total-Results'] = str(page_info["total_results"])
+    return response
+
+def stream_all_videos(index_id, page_limit, sort_by, sort_option):
+    """Streams every video of an index one page at a time, as NDJSON (default) or a chunked JSON array."""
+    pages = tl_service.iter_video_pages(index_id, page_limit, sort_by, sort_option)
+    first_page = next(pages)
+    if "error" in first_page:
+        pages.close()
+        return jsonify(first_page), 502
 
-@app.route('/videos/<video_id>/analyze', methods=['POST'])
+    def all_pages():
+        yield first_page
+        yield from pages
+
+    if request.args.get('format', 'ndjson') == 'json':
+        def generate():
+            # An upstream failure after the first page just ends the array early.
+            separator = ''
+            yield '['
+            for page in all_pages():
+                if "error" in page:
+                    break
+                for video in page["data"]:
+                    yield separator + json.dumps(video)
+                    separator = ','
+            yield ']'
+        return Response(generate(), mimetype='application/json')
+
+    def generate():
+        for page in all_pages():
+            if "error" in page:
+                yield json.dumps(page) + '\n'
+                break
+            for video in page["data"]:
+                yield json.dumps(video) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson')
+
+THUMBNAIL_MAX_AGE = int(os.environ.get('THUMBNAIL_MAX_AGE', '86400'))
+MAX_THUMBNAILS = 100
+
+def thumbnail_response(thumbnail):
+    """Serves a thumbnail with its strong ETag and Cache-Control, answering 304 when the client already has it."""
+    if thumbnail.get("path"):
+        # Sent with the server's file wrapper (sendfile where available) straight from the cache
+        return send_file(thumbnail["path"], mimetype=thumbnail["content_type"], etag=thumbnail["etag"],
+                         last_modified=thumbnail["stored_at"], conditional=True, max_age=THUMBNAIL_MAX_AGE)
+    response = Response(thumbnail["data"], mimetype=thumbnail["content_type"])
+    response.set_etag(thumbnail["etag"])
+    response.cache_control.public = True
+    response.cache_control.max_age = THUMBNAIL_MAX_AGE
+    return response.make_conditional(request)
+
+@api.route('/indexes/<index_id>/videos/<video_id>/thumbnail', methods=['GET'])
+def get_video_thumbnail(index_id, video_id):
+    thumbnail = tl_service.get_thumbnail(index_id, video_id)
+    if "error" in thumbnail:
+        return jsonify(thumbnail), 404
+    return thumbnail_response(thumbnail)
+
+@api.route('/indexes/<index_id>/thumbnails', methods=['GET'])
+def get_index_thumbnails(index_id):
+    """Fetches the thumbnails of many videos at once, concurrently and through the disk cache.
+
+    Takes `video_ids` (comma-separated), or else a page of the index (`page`, `page_limit`).
+    Each entry links to the per-video route; `inline=true` also embeds the image as a data URI.
+    """
+    video_ids = [video_id for video_id in request.args.get('video_ids', '').split(',') if video_id]
+    if video_ids:
+        videos = list(dict.fromkeys(video_ids))
+    else:
+        page = tl_service.get_videos_page(
+            index_id,
+            page=request.args.get('page', type=int),
+            page_limit=request.args.get('page_limit', type=int)
+        )
+        if "error" in page:
+            return jsonify(page), 502
+        videos = page["data"]
+    if len(videos) > MAX_THUMBNAILS:
+        return jsonify({"error": f"At most {MAX_THUMBNAILS} thumbnails per request"}), 400
+    inline = request.args.get('inline', '').lower() in ('1', 'true', 'yes')
+
+    data, errors = [], {}
+    for video_id, thumbnail in tl_service.get_thumbnails(index_id, videos).items():
+        if "error" in thumbnail:
+            errors[video_id] = thumbnail["error"]
+            continue
+        entry = {
+            "video_id": video_id,
+            "etag": thumbnail["etag"],
+            "content_type": thumbnail["content_type"],
+            "size": thumbnail["size"],
+            "url": url_for('api.get_video_thumbnail', index_id=index_id, video_id=video_id)
+        }
+        if inline:
+            image = thumbnail["data"] if "data" in thumbnail else tl_service.thumbnail_cache.read(thumbnail)
+            if image is None:
+                errors[video_id] = "Cached thumbnail disappeared"
+                continue
+            # base64 reads the memory map directly, without copying the image into a bytes object first
+            entry["data_uri"] = f"data:{thumbnail['content_type']};base64," + base64.b64encode(image).decode()
+            if hasattr(image, 'close'):
+                image.close()
+        data.append(entry)
+
+    response = jsonify({"data": data, "errors": errors})
+    fingerprint = [[entry["video_id"], entry["etag"]] for entry in data] + [errors, inline]
+    response.set_etag(hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest())
+    # The set of videos can change, so clients revalidate; an unchanged grid costs a 304
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def is_forced(data=None):
+    """True when the caller asked to bypass stored results with `force=true` in the query string or JSON body."""
+    if request.args.get('force', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return bool((data or {}).get('force'))
+
+@api.route('/videos/<video_id>/analyze', methods=['POST'])
 def analyze_video(video_id):
-    # 1. Get video analysis from Twelve Labs
-    video_analysis = tl_service.analyze_video(video_id)
-    if "error" in video_analysis:
-        return jsonify(video_analysis), 500
+    force = is_forced(request.get_json(silent=True))
 
-    # 2. Save analysis to Firebase
-    saved_data = {"analysis": video_analysis}
-    firebase_service.save_analysis(video_id, saved_data)
+    def analyze_and_save():
+        # 1. Get video analysis from Twelve Labs (or the result store, unless forced)
+        video_analysis = tl_service.analyze_video(video_id, force=force)
+        if "error" in video_analysis:
+            return video_analysis, 500
 
-    return jsonify(saved_data)
+        # 2. Save analysis to Firebase
+        saved_data = {"analysis": video_analysis}
+        saved = firebase_service.save_analysis(video_id, saved_data)
+        if "error" in saved:
+            return {"error": f"Failed to save analysis: {saved['error']}", **saved_data}, 500
+        return saved_data, 200
 
-@app.route('/videos/<video_id>/presentation', methods=['POST'])
+    # Identical requests already in flight share their analysis and save instead of repeating them
+    key = single_flight.make_key("analyze_and_save", video_id=video_id, force=force)
+    (body, status), _ = single_flight.do(key, analyze_and_save)
+    return jsonify(body), status
+
+@api.route('/videos/<video_id>/presentation', methods=['POST'])
 def generate_presentation(video_id):
     # 1. Get video analysis from Firebase
     firebase_data = firebase_service.get_analysis(video_id)
@@ -105,17 +287,146 @@ def generate_presentation(video_id):
     # 2. Get the number of slides from the request, with a default of 5
     data = request.get_json() or {}
     num_slides = data.get('num_slides', 5)
+    force = is_forced(data)
 
-    # 3. Generate presentation with Gemini
-    presentation_prompt = f"Generate a presentation from the provided video analysis. The presentation should have a title and {num_slides} slides with bullet points."
-    slides = gemini_service.generate_slides(video_analysis, presentation_prompt)
-    
-    # 4. Save the presentation to a separate presentations collection in Firebase
-    firebase_service.save_presentation(video_id, slides)
+    def generate_and_save():
+        # 3. Generate presentation with Gemini
+        presentation_prompt = PRESENTATION_QUERY.format(num_slides=num_slides)
+        slides = gemini_service.generate_slides(
+            video_analysis, presentation_prompt, video_id=video_id, force=force
+        )
+
+        # 4. Save the presentation to a separate presentations collection in Firebase
+        if "error" in slides:
+            return slides, 200
+        saved = firebase_service.save_presentation(video_id, slides)
+        if "error" in saved:
+            return {"error": f"Failed to save presentation: {saved['error']}", **slides}, 500
+        return slides, 200
+
+    key = single_flight.make_key("generate_and_save", video_id=video_id, analysis=video_analysis,
+                                 num_slides=num_slides, force=force)
+    (body, status), _ = single_flight.do(key, generate_and_save)
+    return jsonify(body), status
+
+def batch_video_ids(data, index_id=None):
+    """Resolves the videos of a batch request: `video_ids` from the body, or every video of the index.
+
+    Returns (video_ids, None) or (None, error_response).
+    """
+    video_ids = data.get('video_ids')
+    if video_ids is None:
+        index_id = index_id or data.get('index_id')
+        if not index_id:
+            return None, (jsonify({"error": "Provide video_ids or index_id"}), 400)
+        video_ids = []
+        for page in tl_service.iter_video_pages(index_id):
+            if "error" in page:
+                return None, (jsonify(page), 502)
+            video_ids.extend(video["id"] for video in page["data"])
 
-    return jsonify(slides)
+    if not isinstance(video_ids, list) or not all(isinstance(video_id, str) and video_id for video_id in video_ids):
+        return None, (jsonify({"error": "video_ids must be a list of video ids"}), 400)
+    video_ids = list(dict.fromkeys(video_ids))
+    max_items = int(os.environ.get('BATCH_MAX_ITEMS', '500'))
+    if len(video_ids) > max_items:
+        return None, (jsonify({"error": f"A batch can have at most {max_items} videos"}), 400)
+    return video_ids, None
 
-@app.route('/upload', methods=['POST'])
+def batch_response(events):
+    """Streams batch progress as NDJSON, or returns only the final summary with `format=json`."""
+    if request.args.get('format') == 'json':
+        summary = None
+        for event in events:
+            summary = event
+        return jsonify(summary)
+
+    def generate():
+        for event in events:
+            yield json.dumps(event) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@api.route('/indexes/<index_id>/analyze', methods=['POST'])
+def analyze_videos_batch(index_id):
+    data = request.get_json(silent=True) or {}
+    video_ids, error = batch_video_ids(data, index_id)
+    if error:
+        return error
+    force = is_forced(data)
+
+    def analyze(video_id):
+        saved_data = {"analysis": tl_service.analyze_video(video_id, force=force)}
+        return saved_data, {f"video_analysis/{video_id}": saved_data}
+
+    return batch_response(batch_runner.run(video_ids, analyze, concurrency=data.get('concurrency')))
+
+@api.route('/presentations/batch', methods=['POST'])
+def generate_presentations_batch():
+    data = request.get_json(silent=True) or {}
+    video_ids, error = batch_video_ids(data)
+    if error:
+        return error
+    force = is_forced(data)
+    presentation_prompt = PRESENTATION_QUERY.format(num_slides=data.get('num_slides', 5))
+
+    def generate(video_id):
+        firebase_data = firebase_service.get_analysis(video_id)
+        if firebase_data and "error" in firebase_data:
+            return firebase_data, None
+        video_analysis = (firebase_data or {}).get("analysis")
+        if not video_analysis:
+            return {"error": "Video analysis not found. Please analyze the video first."}, None
+        slides = gemini_service.generate_slides(video_analysis, presentation_prompt, video_id=video_id, force=force)
+        if "error" in slides:
+            return slides, None
+        return slides, firebase_service.presentation_updates(video_id, slides)
+
+    return batch_response(batch_runner.run(video_ids, generate, concurrency=data.get('concurrency')))
+
+def upload_and_cleanup(index_id, file_path):
+    try:
+        created = tl_service.create_upload_task(index_id, file_path)
+    finally:
+        # Clean up the temporary file
+        shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+    if "error" in created:
+        return created
+    # Indexing is followed by the shared task poller; the job finishes when it does
+    return tl_service.watch_task(created["task_id"], index_id=index_id)
+
+@api.route('/videos/<video_id>/presentation/stream', methods=['GET', 'POST'])
+def stream_presentation(video_id):
+    """Generates a presentation and streams each slide as a server-sent event as soon as it is complete."""
+    firebase_data = firebase_service.get_analysis(video_id)
+    if not firebase_data:
+        return jsonify({"error": "Video analysis not found. Please analyze the video first."}), 404
+
+    video_analysis = firebase_data.get("analysis")
+    if not video_analysis:
+        return jsonify({"error": "Video analysis data not found in the Firebase record."}), 404
+
+    data = request.get_json(silent=True) or {}
+    num_slides = data.get('num_slides', request.args.get('num_slides', 5, type=int))
+    force = is_forced(data)
+
+    presentation_prompt = PRESENTATION_QUERY.format(num_slides=num_slides)
+
+    def generate():
+        for event, payload in gemini_service.stream_slides(
+            video_analysis, presentation_prompt, video_id=video_id, force=force
+        ):
+            if event == "done":
+                saved = firebase_service.save_presentation(video_id, payload)
+                if "error" in saved:
+                    event, payload = "error", {"error": f"Failed to save presentation: {saved['error']}"}
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@api.route('/upload', methods=['POST'])
 def upload_video():
     if 'video' not in request.files:
         return jsonify({"error": "No video file provided"}), 400
@@ -125,20 +436,74 @@ def upload_video():
     if not index_id:
         return jsonify({"error": "Index ID is required"}), 400
 
-    # Save the file temporarily
-    upload_folder = 'uploads'
-    if not os.path.exists(upload_folder):
-        os.makedirs(upload_folder)
-    file_path = os.path.join(upload_folder, video_file.filename)
+    # Save the file temporarily, in its own folder so concurrent uploads don't collide
+    upload_folder = os.path.join('uploads', uuid.uuid4().hex)
+    os.makedirs(upload_folder)
+    filename = secure_filename(video_file.filename) or 'video'
+    file_path = os.path.join(upload_folder, filename)
     video_file.save(file_path)
 
-    # Upload to Twelve Labs
-    result = tl_service.upload_video_file(index_id, file_path)
+    # Upload to Twelve Labs and wait for indexing in the background
+    job_id = job_queue.submit(upload_and_cleanup, index_id, file_path)
+
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@api.route('/upload/stream', methods=['POST'])
+def upload_video_stream():
+    """Streams the raw request body to Twelve Labs without staging it to disk.
+
+    The request body is the video itself; `index_id` and `filename` come from the
+    query string. Pass an `upload_id` to follow byte progress at /jobs/<upload_id>
+    while the upload is still running.
+    """
+    index_id = request.args.get('index_id')
+    if not index_id:
+        return jsonify({"error": "Index ID is required"}), 400
+    filename = secure_filename(request.args.get('filename', '')) or 'video'
+
+    upload_id = request.args.get('upload_id')
+    if upload_id and (len(upload_id) > 64 or not upload_id.replace('-', '').isalnum()):
+        return jsonify({"error": "Invalid upload_id"}), 400
+    try:
+        job_id = job_queue.create(upload_id, status="uploading")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+
+    progress = UploadProgress(
+        total_bytes=request.content_length,
+        on_update=lambda p: job_queue.update(job_id, progress=p.to_dict())
+    )
+    result = tl_service.create_upload_task_stream(index_id, request.stream, filename, progress=progress)
+    if "error" in result:
+        job_queue.finish(job_id, result)
+        return jsonify({"job_id": job_id, **result}), 502
+
+    # The bytes are with Twelve Labs now; wait for indexing in the background
+    job_queue.update(job_id, status="queued", task_id=result["task_id"])
+    job_queue.run(job_id, tl_service.watch_task, result["task_id"], index_id=index_id)
+
+    return jsonify({"job_id": job_id, "status": "queued", **result}), 202
+
+@api.route('/webhooks/twelvelabs', methods=['POST'])
+def twelvelabs_webhook():
+    """Receives Twelve Labs task events so uploads finish without waiting for the next poll."""
+    secret = os.environ.get('TWELVELABS_WEBHOOK_SECRET')
+    if not secret:
+        return jsonify({"error": "Webhooks are not configured"}), 404
+    if not verify_webhook_signature(secret, request.headers.get('TL-Signature', ''), request.get_data()):
+        return jsonify({"error": "Invalid signature"}), 401
+
+    payload = request.get_json(silent=True) or {}
+    return jsonify({"received": True, "matched": tl_service.notify_task(payload)})
 
-    # Clean up the temporary file
-    os.remove(file_path)
+@api.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
-    return jsonify(result)
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True, host="0.0.0.0", port=int(os.environ.get("PORT", 3000)))
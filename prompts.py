@@ -46,3 +46,18 @@ User Query:
   ]
 }}
 '''
+
+ANALYSIS_PROMPT = """Provide a clear and organized overview of the video, capturing its main theme, purpose, and progression of ideas.
+
+Describe all significant topics, arguments, and perspectives in detail, ensuring that no relevant point is overlooked.
+
+Incorporate observations of visual and auditory elements such as gestures, expressions, tone, and contextual visuals that enrich understanding."""
+
+PRESENTATION_QUERY = "Generate a presentation from the provided video analysis. The presentation should have a title and {num_slides} slides with bullet points."
+
+SECTION_SUMMARY_PROMPT = """The text below is one section of a longer analysis of a video. It will be combined with summaries of the other sections and used to build a slide presentation.
+
+Summarize it in at most {max_words} words. Keep every distinct topic, argument, example, name and number; drop repetition and filler. Reply with the summary only.
+
+Section:
+{section}"""
@@ -0,0 +1,65 @@
+import contextvars
+
+from flask import Blueprint, Response, request
+from services.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# [operation, start, trace] of the request being handled. Kept in a context
+# variable rather than on the request, so the later hooks need not resolve the `request` proxy.
+# The hook that records the request clears the list in place, which is cheaper than setting the
+# variable again.
+_request_state = contextvars.ContextVar('request_metrics', default=None)
+
+
+def _body_size(response):
+    # The Content-Length property parses the header on every access; a buffered body is measured directly.
+    body = response.response
+    if body.__class__ is list and len(body) == 1:
+        return len(body[0])
+    return None
+
+
+@metrics_bp.before_app_request
+def start_request_timer():
+    current = request._get_current_object()
+    method = current.method
+    rule = current.url_rule
+    route = rule.rule if rule is not None else "unmatched"
+    operation = metrics.http_operation(method, route)
+    trace = metrics.start_trace(operation.name) if metrics.trace_sample else None
+    _request_state.set([operation, operation.start(), trace])
+
+
+@metrics_bp.after_app_request
+def record_request(response):
+    # Streamed responses are measured up to the point their body starts streaming.
+    state = _request_state.get()
+    if state is None or state[0] is None:
+        return response
+    operation, start, trace = state
+    state[0] = None
+    status = response.status_code
+    operation.finish(start, status >= 500, _body_size(response), status)
+    if trace is not None:
+        response.headers['X-Trace-Id'] = trace.id
+        metrics.end_trace(trace, status=status)
+    return response
+
+
+@metrics_bp.teardown_app_request
+def finish_request_timer(error=None):
+    # Only reached with the timer still running when no response was produced.
+    state = _request_state.get()
+    if state is None or state[0] is None:
+        return
+    operation, start, trace = state
+    state[0] = None
+    operation.finish(start, True)
+    if trace is not None:
+        metrics.end_trace(trace, error=str(error))
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
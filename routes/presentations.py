@@ -1,12 +1,70 @@
-from flask import Blueprint, jsonify
-from services.firebase_service import FirebaseService
+from flask import Blueprint, Response, jsonify, request, send_file
+import click
+import os
+from services.deck_render import FORMATS
+from services.registry import services
 
 presentations_bp = Blueprint('presentations', __name__)
-firebase_service = FirebaseService()
+firebase_service = services.lazy('firebase')
+exporter = services.lazy('exporter')
+
+MAX_PAGE_SIZE = 200
+EXPORT_MAX_AGE = int(os.environ.get('EXPORT_MAX_AGE', '3600'))
 
 @presentations_bp.route('/presentations', methods=['GET'])
-def get_all_presentations():
-    presentations = firebase_service.get_all_presentations()
-    if presentations:
-        return jsonify(presentations)
-    return jsonify({})
+def list_presentations():
+    """Lists presentation summaries a page at a time; pass `next_start_after` back as `start_after` for the next page."""
+    limit = request.args.get('limit', 50, type=int)
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    page = firebase_service.list_presentation_summaries(limit, request.args.get('start_after'))
+    if "error" in page:
+        return jsonify(page), 500
+    return jsonify(page)
+
+@presentations_bp.route('/presentations/<video_id>', methods=['GET'])
+def get_presentation(video_id):
+    presentation = firebase_service.get_presentation(video_id)
+    if not presentation:
+        return jsonify({"error": "Presentation not found"}), 404
+    if "error" in presentation:
+        return jsonify(presentation), 500
+    return jsonify(presentation)
+
+@presentations_bp.route('/presentations/<video_id>/export', methods=['GET'])
+def export_presentation(video_id):
+    """Downloads the stored deck as a PPTX, PDF or Markdown file, rendered once per deck content."""
+    export_format = request.args.get('format', 'pptx').lower()
+    if export_format not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+
+    presentation = firebase_service.get_presentation(video_id)
+    if not presentation:
+        return jsonify({"error": "Presentation not found"}), 404
+    if "error" in presentation:
+        return jsonify(presentation), 500
+
+    # The ETag is the content hash, so a client that already has this version skips the render entirely
+    etag = exporter.make_key(presentation, export_format)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.cache_control.max_age = EXPORT_MAX_AGE
+        return response
+
+    exported = exporter.export(presentation, export_format)
+    if "error" in exported:
+        return jsonify(exported), 500
+    return send_file(exported["path"], mimetype=exported["content_type"], as_attachment=True,
+                     download_name=f"{video_id}.{exported['extension']}", etag=exported["etag"],
+                     conditional=True, max_age=EXPORT_MAX_AGE)
+
+@presentations_bp.route('/health/exports', methods=['GET'])
+def export_stats():
+    return jsonify(exporter.get_stats())
+
+@presentations_bp.cli.command('backfill-summaries')
+def backfill_summaries():
+    """Builds summary entries for presentations saved before the summary index existed."""
+    click.echo(firebase_service.backfill_presentation_summaries())
@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import re
+
+from prompts import SECTION_SUMMARY_PROMPT
+from services.metrics import bind_trace
+from services.result_store import ResultStore
+
+_PARAGRAPHS = re.compile(r'\n\s*\n')
+_SENTENCES = re.compile(r'(?<=[.!?])\s+')
+_WORDS = re.compile(r'\w+')
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (about four characters per token), without a network call."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _shingles(text, size=5):
+    words = _WORDS.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class AnalysisCompactor:
+    """Shrinks a video analysis to fit a token budget before it goes into the deck prompt.
+
+    Analyses within the budget are returned unchanged. Larger ones are split
+    into paragraphs, repeated or near-duplicate paragraphs are dropped, and if
+    that is not enough, sections of about `section_tokens` are summarized
+    concurrently (map) and the summaries joined (reduce), repeating on the
+    summaries while still over budget. The compacted text is stored per video
+    and analysis, so decks with a different number of slides reuse it.
+
+    `generate` takes a prompt and returns the model's text.
+    """
+
+    def __init__(self, generate, token_budget=8000, section_tokens=2000, max_workers=4,
+                 result_store=None, model_name=None, max_rounds=3, similarity=0.8):
+        self.generate = generate
+        self.token_budget = token_budget
+        self.section_tokens = section_tokens
+        self.max_workers = max_workers
+        self.result_store = result_store if result_store is not None else ResultStore.from_env()
+        self.model_name = model_name
+        self.max_rounds = max_rounds
+        self.similarity = similarity
+
+    @classmethod
+    def from_env(cls, generate, result_store=None, model_name=None):
+        return cls(
+            generate,
+            token_budget=int(os.environ.get('GEMINI_ANALYSIS_TOKEN_BUDGET', '8000')),
+            section_tokens=int(os.environ.get('GEMINI_ANALYSIS_SECTION_TOKENS', '2000')),
+            max_workers=int(os.environ.get('GEMINI_COMPACTION_WORKERS', '4')),
+            result_store=result_store,
+            model_name=model_name
+        )
+
+    def compact(self, video_analysis, video_id=None):
+        text = video_analysis if isinstance(video_analysis, str) else json.dumps(video_analysis)
+        if self.token_budget <= 0 or estimate_tokens(text) <= self.token_budget:
+            return video_analysis
+
+        key = ResultStore.make_key(
+            operation="compact_analysis",
+            video_id=video_id,
+            prompt=SECTION_SUMMARY_PROMPT,
+            model=self.model_name,
+            params={
+                "analysis": hashlib.sha256(text.encode()).hexdigest(),
+                "token_budget": self.token_budget,
+                "section_tokens": self.section_tokens
+            }
+        )
+        stored = self.result_store.get(key)
+        if stored is not None:
+            return stored
+
+        paragraphs = self.deduplicate(self.paragraphs(text))
+        compacted = "\n\n".join(paragraphs)
+        if estimate_tokens(compacted) > self.token_budget:
+            try:
+                compacted = self.summarize(paragraphs)
+            except Exception as e:
+                # Not stored, so the next request tries summarizing again
+                print(f"Error summarizing analysis for video {video_id}, trimming it instead: {e}")
+                return self.trim(self.sections(paragraphs))
+        self.result_store.put(key, compacted)
+        return compacted
+
+    def paragraphs(self, text):
+        """Splits text into paragraphs no longer than a section, breaking long ones at sentence ends."""
+        result = []
+        for paragraph in _PARAGRAPHS.split(text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if estimate_tokens(paragraph) <= self.section_tokens:
+                result.append(paragraph)
+                continue
+            for sentences in self.sections(_SENTENCES.split(paragraph), separator=" "):
+                result.extend(self._hard_split(sentences))
+        return result
+
+    def _hard_split(self, text):
+        limit = self.section_tokens * CHARS_PER_TOKEN
+        return [text[i:i + limit] for i in range(0, len(text), limit)]
+
+    def deduplicate(self, paragraphs):
+        """Drops paragraphs whose word 5-grams mostly repeat an earlier paragraph."""
+        kept, seen = [], []
+        for paragraph in paragraphs:
+            shingles = _shingles(paragraph)
+            if any(len(shingles & other) >= self.similarity * len(shingles) for other in seen):
+                continue
+            kept.append(paragraph)
+            seen.append(shingles)
+        return kept
+
+    def sections(self, pieces, separator="\n\n"):
+        """Packs consecutive pieces into sections of at most `section_tokens`."""
+        sections, current, size = [], [], 0
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and size + tokens > self.section_tokens:
+                sections.append(separator.join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += tokens
+        if current:
+            sections.append(separator.join(current))
+        return sections
+
+    def summarize(self, paragraphs):
+        pieces = paragraphs
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compact") as executor:
+            for _ in range(self.max_rounds):
+                sections = self.sections(pieces)
+                max_words = max(50, int(self.token_budget / len(sections) * 0.75))
+                prompts = [SECTION_SUMMARY_PROMPT.format(max_words=max_words, section=section) for section in sections]
+                futures = [executor.submit(bind_trace(self.generate), prompt) for prompt in prompts]
+                pieces = [future.result().strip() for future in futures]
+                if estimate_tokens("\n\n".join(pieces)) <= self.token_budget:
+                    break
+        return self.trim(pieces)
+
+    def trim(self, sections):
+        """Cuts every section to an equal share of the budget, so no part of the video is dropped entirely."""
+        text = "\n\n".join(sections)
+        if estimate_tokens(text) <= self.token_budget:
+            return text
+        separators = 2 * (len(sections) - 1)
+        share = max(1, (self.token_budget * CHARS_PER_TOKEN - separators) // len(sections))
+        return "\n\n".join(section[:share] for section in sections)
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import time
+
+from services.metrics import bind_trace
+
+
+class BatchRunner:
+    """Runs one task per video on a bounded thread pool and persists the results in batches.
+
+    A task takes a video id and returns `(result, writes)`: a result dict, which
+    marks the item as failed when it contains an "error" key, and a dict of
+    Firebase paths to values. Writes from finished items are buffered and
+    saved with one multi-path update per `flush_size` items (or per
+    `flush_interval` seconds), instead of one write per video.
+
+    `run` yields progress events as items finish and ends with a summary.
+    """
+
+    def __init__(self, firebase_service, max_workers=None, flush_size=None, flush_interval=None):
+        if max_workers is None:
+            max_workers = int(os.environ.get('BATCH_MAX_CONCURRENCY', '4'))
+        if flush_size is None:
+            flush_size = int(os.environ.get('BATCH_FLUSH_SIZE', '20'))
+        if flush_interval is None:
+            flush_interval = float(os.environ.get('BATCH_FLUSH_INTERVAL', '5'))
+        self.firebase_service = firebase_service
+        self.max_workers = max(1, max_workers)
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+
+    def run(self, video_ids, task, concurrency=None):
+        if not isinstance(concurrency, int) or concurrency < 1:
+            concurrency = self.max_workers
+        workers = min(self.max_workers, concurrency, len(video_ids) or 1)
+        results = {}
+        pending_ids = []
+        pending_writes = {}
+        last_flush = time.monotonic()
+        completed = 0
+
+        def flush():
+            nonlocal last_flush
+            ids = list(pending_ids)
+            saved = self.firebase_service.save_many(pending_writes)
+            pending_ids.clear()
+            pending_writes.clear()
+            last_flush = time.monotonic()
+            if isinstance(saved, dict) and "error" in saved:
+                for video_id in ids:
+                    results[video_id] = {"status": "failed", "error": f"Failed to save results: {saved['error']}"}
+                return {"type": "save_failed", "video_ids": ids, "error": saved["error"]}
+            return None
+
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+        try:
+            futures = {executor.submit(bind_trace(self._call), task, video_id): video_id for video_id in video_ids}
+            for future in as_completed(futures):
+                video_id = futures[future]
+                result, writes = future.result()
+                completed += 1
+                if "error" in result:
+                    results[video_id] = {"status": "failed", "error": result["error"]}
+                else:
+                    results[video_id] = {"status": "succeeded"}
+                    if writes:
+                        pending_ids.append(video_id)
+                        pending_writes.update(writes)
+                yield {"type": "item", "video_id": video_id, **results[video_id],
+                       "completed": completed, "total": len(video_ids)}
+
+                if pending_ids and (len(pending_ids) >= self.flush_size
+                                    or time.monotonic() - last_flush >= self.flush_interval):
+                    failure = flush()
+                    if failure:
+                        yield failure
+            if pending_ids:
+                failure = flush()
+                if failure:
+                    yield failure
+        finally:
+            # Also reached when the client goes away mid-stream: drop queued items but keep finished work.
+            executor.shutdown(wait=False, cancel_futures=True)
+            if pending_ids:
+                flush()
+
+        succeeded = sum(1 for item in results.values() if item["status"] == "succeeded")
+        yield {
+            "type": "summary",
+            "total": len(video_ids),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results
+        }
+
+    @staticmethod
+    def _call(task, video_id):
+        try:
+            return task(video_id)
+        except Exception as e:
+            return {"error": str(e)}, None
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache.
+
+    Entries are dicts with at least `value` and `stored_at`. Expiry is decided
+    by the caller, so stale entries stay available for revalidation until
+    they are evicted.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class FileCache:
+    """Cache stored as JSON files in a directory, shared by every process on the host.
+
+    Writes go through a temporary file and `os.replace`, so readers never see a
+    partial entry. The oldest files are pruned once the directory holds more
+    than `max_entries` of them.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 4096):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("key") == key else None
+
+    def set(self, key, entry):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({**entry, "key": key}, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.writes += 1
+        if self.writes % 100 == 0:
+            self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _prune(self):
+        try:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+            if len(paths) <= self.max_entries:
+                return
+            paths.sort(key=lambda path: os.stat(path).st_mtime)
+            for path in paths[:len(paths) - self.max_entries]:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+class TieredCache:
+    """Two-level cache: an in-process LRU in front of an optional shared backend.
+
+    Every key belongs to a tag (e.g. one index). Invalidating a tag replaces its
+    generation token, which is part of every stored key, so all workers sharing
+    the backend stop seeing the old entries at once.
+    """
+
+    def __init__(self, ttl_seconds: float = 30, max_entries: int = 512, shared=None):
+        self.ttl_seconds = ttl_seconds
+        self.local = MemoryCache(max_entries)
+        self.shared = shared
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "invalidations": 0}
+
+    def _generation(self, tag):
+        if self.shared is not None:
+            entry = self.shared.get(f"generation:{tag}")
+            return entry["value"] if entry else "0"
+        return self.generations.get(tag, "0")
+
+    def _key(self, key, tag):
+        return f"{tag}@{self._generation(tag)}:{key}"
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get(self, key, tag):
+        """Returns (entry, fresh). `entry` may be stale but still carry an ETag to revalidate."""
+        full_key = self._key(key, tag)
+        entry = self.local.get(full_key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(full_key)
+            if entry is not None:
+                self.local.set(full_key, entry)
+        if entry is None:
+            self._count("misses")
+            return None, False
+        if time.time() - entry["stored_at"] < self.ttl_seconds:
+            self._count("hits")
+            return entry, True
+        self._count("stale")
+        return entry, False
+
+    def set(self, key, tag, value, etag=None):
+        full_key = self._key(key, tag)
+        entry = {"value": value, "etag": etag, "stored_at": time.time()}
+        self.local.set(full_key, entry)
+        if self.shared is not None:
+            self.shared.set(full_key, entry)
+
+    def revalidated(self, key, tag, entry):
+        self._count("revalidated")
+        self.set(key, tag, entry["value"], entry.get("etag"))
+
+    def invalidate(self, tag):
+        generation = uuid.uuid4().hex
+        if self.shared is not None:
+            self.shared.set(f"generation:{tag}", {"value": generation, "stored_at": time.time()})
+        with self.lock:
+            self.generations[tag] = generation
+            self.stats["invalidations"] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"] + stats["stale"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["entries"] = len(self.local)
+        stats["shared"] = self.shared is not None
+        return stats
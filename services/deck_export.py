@@ -0,0 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from services.deck_render import FORMATS, RENDER_VERSION, render
+from services.metrics import metrics
+
+
+def _exit_with_parent(parent_pid):
+    """Pool initializer: render processes exit once the worker that started them is gone, however it died."""
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+    threading.Thread(target=watch, daemon=True).start()
+
+
+class DeckExporter:
+    """Renders decks to PPTX, PDF or Markdown files, kept in a disk cache keyed by content hash.
+
+    The key is a SHA-256 of the deck's name and slides, the format and RENDER_VERSION, and is
+    also the file's strong ETag. A cached file is served from disk; a miss is
+    rendered by one of `workers` processes (in the calling thread when 0), so
+    rendering never holds a request thread's GIL. Identical renders in flight
+    at once, in this or another worker, are made once through `single_flight`.
+    Once the directory holds more than `max_bytes`, the least recently used
+    files are removed (hits refresh the file's mtime).
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, workers=2, timeout=60.0, single_flight=None):
+        # Absolute, since send_file resolves relative paths against the app's root rather than the cwd
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        if workers and multiprocessing.current_process().daemon:
+            print("Export renders run in-thread: daemonic processes cannot start a process pool")
+            workers = 0
+        self.workers = workers
+        self.timeout = timeout
+        self.single_flight = single_flight
+        self._pool = None
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "renders": 0, "failures": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, single_flight=None):
+        return cls(
+            os.environ.get('EXPORT_CACHE_DIR', os.path.join('.cache', 'exports')),
+            max_bytes=int(os.environ.get('EXPORT_CACHE_MAX_BYTES', str(512 * 1024 * 1024))),
+            workers=int(os.environ.get('EXPORT_WORKERS', '2')),
+            timeout=float(os.environ.get('EXPORT_TIMEOUT', '60')),
+            single_flight=single_flight
+        )
+
+    @staticmethod
+    def make_key(deck, export_format):
+        # Only the fields the renderers read, so bookkeeping fields stored with a deck do not change the key.
+        rendered = {"presentation_name": deck.get("presentation_name"), "slides": deck.get("slides")}
+        payload = json.dumps({"deck": rendered, "format": export_format, "version": RENDER_VERSION},
+                             sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    @property
+    def pool(self):
+        with self.lock:
+            if self._pool is None:
+                # Spawned rather than forked: the request threads of this process may hold locks.
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_exit_with_parent, initargs=(os.getpid(),))
+            return self._pool
+
+    def _entry(self, key, export_format, path):
+        return {"etag": key, "path": path, "size": os.path.getsize(path),
+                "content_type": FORMATS[export_format], "extension": export_format}
+
+    def export(self, deck, export_format):
+        """Returns {"etag", "path", "size", "content_type", "extension"} for the rendered deck, or {"error": ...}."""
+        if export_format not in FORMATS:
+            return {"error": f"Unknown export format: {export_format}"}
+        key = self.make_key(deck, export_format)
+        path = os.path.join(self.directory, f"{key}.{export_format}")
+        try:
+            os.utime(path)
+            self._count("hits")
+            return self._entry(key, export_format, path)
+        except OSError:
+            self._count("misses")
+
+        def render_and_store():
+            return self._render(deck, export_format, key, path)
+
+        if self.single_flight is None:
+            return render_and_store()
+        result, _ = self.single_flight.do(self.single_flight.make_key("export", key=key), render_and_store)
+        return result
+
+    def _render(self, deck, export_format, key, path):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            with metrics.operation("export", f"render {export_format}").timed() as timing:
+                if self.workers > 0:
+                    self.pool.submit(render, deck, export_format, tmp_path).result(timeout=self.timeout)
+                else:
+                    render(deck, export_format, tmp_path)
+                timing.size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A crashed worker breaks the pool for good; start a new one for the next render.
+                with self.lock:
+                    self._pool = None
+            self._count("failures")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            if isinstance(e, TimeoutError):
+                return {"error": f"Rendering {export_format} took longer than {self.timeout:g} seconds"}
+            return {"error": f"Failed to render {export_format}: {type(e).__name__} - {e}"}
+        self._count("renders")
+        self._prune()
+        return self._entry(key, export_format, path)
+
+    def _prune(self):
+        try:
+            files = []
+            total = 0
+            # A render that timed out may still write its temporary file after it was removed
+            stale = time.time() - 2 * self.timeout - 60
+            for item in os.scandir(self.directory):
+                stat = item.stat()
+                if not item.name.endswith('.tmp'):
+                    files.append((stat.st_mtime, stat.st_size, item.path))
+                    total += stat.st_size
+                elif stat.st_mtime < stale:
+                    try:
+                        os.remove(item.path)
+                    except OSError:
+                        pass
+            if total <= self.max_bytes:
+                return
+            files.sort()
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+                self._count("evictions")
+        except OSError:
+            pass
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["directory"] = self.directory
+        stats["max_bytes"] = self.max_bytes
+        stats["workers"] = self.workers
+        return stats
+
+    def shutdown(self):
+        with self.lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
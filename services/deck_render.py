@@ -0,0 +1,285 @@
+"""Renders a deck (the SYSTEM_PROMPT JSON) to PPTX, PDF or Markdown files.
+
+Only the standard library is used, so render workers start quickly and no
+office suite is needed. Output depends only on the deck: the same deck
+always gives the same bytes, which is what makes a content hash a valid
+ETag. Bump RENDER_VERSION whenever the output changes.
+"""
+from xml.sax.saxutils import escape
+import re
+import zipfile
+import zlib
+
+RENDER_VERSION = 1
+
+FORMATS = {
+    "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "pdf": "application/pdf",
+    "md": "text/markdown; charset=utf-8",
+}
+
+
+def _slides(deck):
+    """(title, bullet points) per slide, tolerating the shape slips normalize_deck fixes."""
+    slides = deck.get("slides") if isinstance(deck.get("slides"), list) else []
+    for slide in slides:
+        if not isinstance(slide, dict):
+            continue
+        points = slide.get("sub_points") or []
+        if isinstance(points, str):
+            points = [points]
+        yield str(slide.get("title") or ""), [str(point) for point in points]
+
+
+def _name(deck):
+    return str(deck.get("presentation_name") or "Presentation")
+
+
+def render(deck, export_format, path):
+    """Writes `deck` to `path` in one of FORMATS."""
+    {"pptx": render_pptx, "pdf": render_pdf, "md": render_markdown}[export_format](deck, path)
+
+
+# Markdown
+
+def render_markdown(deck, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"# {_name(deck)}\n")
+        for number, (title, points) in enumerate(_slides(deck), start=1):
+            f.write(f"\n## {number}. {title}\n\n")
+            for point in points:
+                f.write(f"- {point}\n")
+
+
+# PDF: one 16:9 page per slide, in the standard Helvetica fonts
+
+PAGE_WIDTH, PAGE_HEIGHT, MARGIN = 960, 540, 60
+TITLE_SIZE, POINT_SIZE = 32, 20
+
+
+def _pdf_string(text):
+    # The standard fonts use WinAnsiEncoding (cp1252); other characters become "?".
+    data = re.sub(r'\s+', ' ', text).encode('cp1252', errors='replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _pdf_text_string(text):
+    # Document metadata is not drawn with the fonts, so it can hold any character as UTF-16.
+    return b'<FEFF' + text.encode('utf-16-be').hex().upper().encode() + b'>'
+
+
+def _wrap(text, size, width):
+    """Greedy word wrap, assuming Helvetica's average glyph width of about half the font size."""
+    limit = max(1, int(width / (size * 0.5)))
+    lines, line = [], ""
+    for word in text.split():
+        while len(word) > limit:
+            if line:
+                lines.append(line)
+                line = ""
+            lines.append(word[:limit])
+            word = word[limit:]
+        if line and len(line) + 1 + len(word) > limit:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines or [""]
+
+
+def _pdf_pages(deck):
+    """Content streams, one per page; slides too long for one page continue on the next."""
+    pages = [(_name(deck), [])]
+    for title, points in _slides(deck):
+        pages.append((title, points))
+    for title, points in pages:
+        commands = []
+        y = PAGE_HEIGHT - MARGIN - TITLE_SIZE
+        for line in _wrap(title, TITLE_SIZE, PAGE_WIDTH - 2 * MARGIN):
+            commands.append(b"BT /F2 %d Tf %d %d Td %s Tj ET" % (TITLE_SIZE, MARGIN, y, _pdf_string(line)))
+            y -= int(TITLE_SIZE * 1.25)
+        y -= POINT_SIZE
+        for point in points:
+            for index, line in enumerate(_wrap(point, POINT_SIZE, PAGE_WIDTH - 2 * MARGIN - 30)):
+                if y < MARGIN:
+                    yield b"\n".join(commands)
+                    commands = [b"BT /F2 %d Tf %d %d Td %s Tj ET" % (
+                        POINT_SIZE, MARGIN, PAGE_HEIGHT - MARGIN - POINT_SIZE, _pdf_string(f"{title} (continued)"))]
+                    y = PAGE_HEIGHT - MARGIN - 3 * POINT_SIZE
+                if index == 0:
+                    commands.append(b"BT /F1 %d Tf %d %d Td %s Tj ET" % (POINT_SIZE, MARGIN, y, _pdf_string("•")))
+                commands.append(b"BT /F1 %d Tf %d %d Td %s Tj ET" % (POINT_SIZE, MARGIN + 30, y, _pdf_string(line)))
+                y -= int(POINT_SIZE * 1.4)
+            y -= POINT_SIZE // 2
+        yield b"\n".join(commands)
+
+
+def render_pdf(deck, path):
+    # Objects 1-4 are the catalog, page tree and fonts; each page adds a page and a content object.
+    offsets = {}
+    with open(path, 'wb') as f:
+        def write_object(number, body):
+            offsets[number] = f.tell()
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        write_object(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        kids = []
+        number = 5
+        for content in _pdf_pages(deck):
+            stream = zlib.compress(content)
+            write_object(number, b"<< /Type /Page /Parent 2 0 R /Contents %d 0 R >>" % (number + 1))
+            write_object(number + 1, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+            kids.append(b"%d 0 R" % number)
+            number += 2
+        write_object(2, b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d /MediaBox [0 0 %d %d] "
+                     b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (len(kids), PAGE_WIDTH, PAGE_HEIGHT))
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(number, b"<< /Title " + _pdf_text_string(_name(deck)) + b" >>")
+
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (number + 1))
+        for object_number in range(1, number + 1):
+            f.write(b"%010d 00000 n \n" % offsets[object_number])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (number + 1, number, xref))
+
+
+# PPTX: a minimal PresentationML package with one blank layout and text boxes
+
+EMU_WIDTH, EMU_HEIGHT = 12192000, 6858000
+NAMESPACES = ('xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+              'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+              'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"')
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+RELS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+CONTENT_TYPE = "application/vnd.openxmlformats-officedocument"
+EMPTY_TREE = ('<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+              '<p:grpSpPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/>'
+              '<a:chOff x="0" y="0"/><a:chExt cx="0" cy="0"/></a:xfrm></p:grpSpPr>')
+
+THEME = XML_HEADER + (
+    '<a:theme xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" name="Export">'
+    '<a:themeElements><a:clrScheme name="Export">'
+    '<a:dk1><a:srgbClr val="000000"/></a:dk1><a:lt1><a:srgbClr val="FFFFFF"/></a:lt1>'
+    '<a:dk2><a:srgbClr val="1F2937"/></a:dk2><a:lt2><a:srgbClr val="F3F4F6"/></a:lt2>'
+    '<a:accent1><a:srgbClr val="2563EB"/></a:accent1><a:accent2><a:srgbClr val="DC2626"/></a:accent2>'
+    '<a:accent3><a:srgbClr val="16A34A"/></a:accent3><a:accent4><a:srgbClr val="9333EA"/></a:accent4>'
+    '<a:accent5><a:srgbClr val="EA580C"/></a:accent5><a:accent6><a:srgbClr val="0891B2"/></a:accent6>'
+    '<a:hlink><a:srgbClr val="2563EB"/></a:hlink><a:folHlink><a:srgbClr val="7C3AED"/></a:folHlink>'
+    '</a:clrScheme><a:fontScheme name="Export">'
+    '<a:majorFont><a:latin typeface="Calibri"/><a:ea typeface=""/><a:cs typeface=""/></a:majorFont>'
+    '<a:minorFont><a:latin typeface="Calibri"/><a:ea typeface=""/><a:cs typeface=""/></a:minorFont>'
+    '</a:fontScheme><a:fmtScheme name="Export"><a:fillStyleLst>'
+    + '<a:solidFill><a:schemeClr val="phClr"/></a:solidFill>' * 3 +
+    '</a:fillStyleLst><a:lnStyleLst>'
+    + '<a:ln w="9525"><a:solidFill><a:schemeClr val="phClr"/></a:solidFill></a:ln>' * 3 +
+    '</a:lnStyleLst><a:effectStyleLst>'
+    + '<a:effectStyle><a:effectLst/></a:effectStyle>' * 3 +
+    '</a:effectStyleLst><a:bgFillStyleLst>'
+    + '<a:solidFill><a:schemeClr val="phClr"/></a:solidFill>' * 3 +
+    '</a:bgFillStyleLst></a:fmtScheme></a:themeElements></a:theme>'
+)
+
+MASTER = XML_HEADER + (
+    f'<p:sldMaster {NAMESPACES}><p:cSld><p:spTree>{EMPTY_TREE}</p:spTree></p:cSld>'
+    '<p:clrMap bg1="lt1" tx1="dk1" bg2="lt2" tx2="dk2" accent1="accent1" accent2="accent2" accent3="accent3" '
+    'accent4="accent4" accent5="accent5" accent6="accent6" hlink="hlink" folHlink="folHlink"/>'
+    '<p:sldLayoutIdLst><p:sldLayoutId id="2147483649" r:id="rId1"/></p:sldLayoutIdLst></p:sldMaster>'
+)
+
+LAYOUT = XML_HEADER + (
+    f'<p:sldLayout {NAMESPACES} type="blank" preserve="1"><p:cSld name="Blank"><p:spTree>{EMPTY_TREE}</p:spTree>'
+    '</p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sldLayout>'
+)
+
+
+def _xml_text(text):
+    # Control characters are not allowed in XML 1.0.
+    return escape(re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f]', '', text))
+
+
+def _relationships(targets):
+    items = "".join(f'<Relationship Id="rId{index}" Type="{RELS}/{kind}" Target="{target}"/>'
+                    for index, (kind, target) in enumerate(targets, start=1))
+    return XML_HEADER + f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{items}</Relationships>'
+
+
+def _text_box(shape_id, name, x, y, width, height, paragraphs):
+    return (f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="{name}"/><p:cNvSpPr txBox="1"/><p:nvPr/></p:nvSpPr>'
+            f'<p:spPr><a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{width}" cy="{height}"/></a:xfrm>'
+            '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr>'
+            f'<p:txBody><a:bodyPr wrap="square"><a:normAutofit/></a:bodyPr><a:lstStyle/>{paragraphs}</p:txBody></p:sp>')
+
+
+def _slide(title, points, title_only=False):
+    margin = 609600
+    width = EMU_WIDTH - 2 * margin
+    if title_only:
+        shapes = _text_box(2, "Title", margin, 2286000, width, 1828800,
+                           '<a:p><a:pPr algn="ctr"/><a:r><a:rPr lang="en-US" sz="4400" b="1"/>'
+                           f'<a:t>{_xml_text(title)}</a:t></a:r></a:p>')
+    else:
+        shapes = _text_box(2, "Title", margin, 457200, width, 1143000,
+                           f'<a:p><a:r><a:rPr lang="en-US" sz="3600" b="1"/><a:t>{_xml_text(title)}</a:t></a:r></a:p>')
+        bullets = "".join('<a:p><a:pPr marL="342900" indent="-342900"><a:buFont typeface="Arial"/><a:buChar char="&#8226;"/>'
+                          f'</a:pPr><a:r><a:rPr lang="en-US" sz="2000"/><a:t>{_xml_text(point)}</a:t></a:r></a:p>'
+                          for point in points)
+        if bullets:
+            shapes += _text_box(3, "Points", margin, 1752600, width, EMU_HEIGHT - 1752600 - 457200, bullets)
+    return XML_HEADER + (f'<p:sld {NAMESPACES}><p:cSld><p:spTree>{EMPTY_TREE}{shapes}</p:spTree></p:cSld>'
+                         '<p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>')
+
+
+def render_pptx(deck, path):
+    # Only titles and points are held; each slide's XML is built as it is written to the package.
+    slides = [(_name(deck), [])] + list(_slides(deck))
+    content_types = XML_HEADER + (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        f'<Override PartName="/ppt/presentation.xml" ContentType="{CONTENT_TYPE}.presentationml.presentation.main+xml"/>'
+        f'<Override PartName="/ppt/slideMasters/slideMaster1.xml" ContentType="{CONTENT_TYPE}.presentationml.slideMaster+xml"/>'
+        f'<Override PartName="/ppt/slideLayouts/slideLayout1.xml" ContentType="{CONTENT_TYPE}.presentationml.slideLayout+xml"/>'
+        f'<Override PartName="/ppt/theme/theme1.xml" ContentType="{CONTENT_TYPE}.theme+xml"/>'
+        + "".join(f'<Override PartName="/ppt/slides/slide{number}.xml" ContentType="{CONTENT_TYPE}.presentationml.slide+xml"/>'
+                  for number in range(1, len(slides) + 1))
+        + '</Types>'
+    )
+    presentation = XML_HEADER + (
+        f'<p:presentation {NAMESPACES}>'
+        '<p:sldMasterIdLst><p:sldMasterId id="2147483648" r:id="rId1"/></p:sldMasterIdLst><p:sldIdLst>'
+        + "".join(f'<p:sldId id="{255 + number}" r:id="rId{number + 2}"/>' for number in range(1, len(slides) + 1))
+        + f'</p:sldIdLst><p:sldSz cx="{EMU_WIDTH}" cy="{EMU_HEIGHT}"/><p:notesSz cx="6858000" cy="9144000"/>'
+        '</p:presentation>'
+    )
+    parts = [
+        ("[Content_Types].xml", content_types),
+        ("_rels/.rels", _relationships([("officeDocument", "ppt/presentation.xml")])),
+        ("ppt/presentation.xml", presentation),
+        ("ppt/_rels/presentation.xml.rels", _relationships(
+            [("slideMaster", "slideMasters/slideMaster1.xml"), ("theme", "theme/theme1.xml")]
+            + [("slide", f"slides/slide{number}.xml") for number in range(1, len(slides) + 1)])),
+        ("ppt/slideMasters/slideMaster1.xml", MASTER),
+        ("ppt/slideMasters/_rels/slideMaster1.xml.rels", _relationships(
+            [("slideLayout", "../slideLayouts/slideLayout1.xml"), ("theme", "../theme/theme1.xml")])),
+        ("ppt/slideLayouts/slideLayout1.xml", LAYOUT),
+        ("ppt/slideLayouts/_rels/slideLayout1.xml.rels", _relationships([("slideMaster", "../slideMasters/slideMaster1.xml")])),
+        ("ppt/theme/theme1.xml", THEME),
+    ]
+    slide_rels = _relationships([("slideLayout", "../slideLayouts/slideLayout1.xml")])
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as package:
+        def write(name, content):
+            # A fixed timestamp keeps the archive byte-for-byte reproducible.
+            info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            package.writestr(info, content.encode('utf-8'))
+
+        for name, content in parts:
+            write(name, content)
+        for number, (title, points) in enumerate(slides, start=1):
+            write(f"ppt/slides/slide{number}.xml", _slide(title, points, title_only=number == 1))
+            write(f"ppt/slides/_rels/slide{number}.xml.rels", slide_rels)
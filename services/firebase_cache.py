@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+import uuid
+
+from services.cache import MemoryCache
+
+# Nodes whose children are cached, e.g. video_analysis/<video_id>.
+CACHED_NODES = ("video_analysis", "presentations")
+VERSIONS_NODE = "cache_versions"
+
+
+class FirebaseReadCache:
+    """Size-bounded read-through cache for single analyses and presentations.
+
+    Every write through FirebaseService also writes a random stamp to
+    `cache_versions/<path>`. A hit, including a cached miss, still costs one
+    round trip: it reads only that small stamp, and reloads the value when the
+    stamp changed. What it saves is downloading the value itself.
+
+    Misses are cached for `negative_ttl` seconds, and no entry is served after
+    `ttl_seconds`, which bounds staleness for writes made outside this service.
+    """
+
+    def __init__(self, database, max_entries=1024, ttl_seconds=300, negative_ttl=5):
+        self.database = database
+        self.entries = MemoryCache(max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "revalidations": 0, "stale": 0,
+                      "expired": 0, "served_age_total": 0.0, "served_age_max": 0.0}
+
+    @classmethod
+    def from_env(cls, database):
+        mode = os.environ.get('FIREBASE_CACHE_MODE', 'version')
+        if mode == 'off':
+            return None
+        if mode != 'version':
+            raise ValueError(f"Unknown Firebase cache mode: {mode}")
+        return cls(
+            database,
+            max_entries=int(os.environ.get('FIREBASE_CACHE_SIZE', '1024')),
+            ttl_seconds=float(os.environ.get('FIREBASE_CACHE_TTL', '300')),
+            negative_ttl=float(os.environ.get('FIREBASE_CACHE_NEGATIVE_TTL', '5'))
+        )
+
+    @staticmethod
+    def handles(path: str):
+        parts = [part for part in path.split('/') if part]
+        return len(parts) == 2 and parts[0] in CACHED_NODES
+
+    @staticmethod
+    def _key(path):
+        return '/'.join(part for part in path.split('/') if part)
+
+    def _count(self, stat, amount=1):
+        with self.lock:
+            self.stats[stat] += amount
+
+    def get(self, path: str, load):
+        """Returns the value at `path`, calling `load()` for it on a miss or a stale entry."""
+        key = self._key(path)
+        entry = self.entries.get(key)
+        version = None
+        if entry is not None:
+            fresh, version = self._check(key, entry)
+            if fresh:
+                age = time.monotonic() - entry["stored_at"]
+                with self.lock:
+                    self.stats["negative_hits" if entry["missing"] else "hits"] += 1
+                    self.stats["served_age_total"] += age
+                    self.stats["served_age_max"] = max(self.stats["served_age_max"], age)
+                return entry["value"]
+
+        self._count("misses")
+        if version is None:
+            version = self._version(key)
+        value = load()
+        self._store(key, value, version)
+        return value
+
+    def _check(self, key, entry):
+        """Returns (fresh, current version stamp if it was read)."""
+        age = time.monotonic() - entry["stored_at"]
+        if age >= self.ttl_seconds or (entry["missing"] and age >= self.negative_ttl):
+            self._count("expired")
+            return False, None
+        self._count("revalidations")
+        version = self._version(key)
+        if version == entry["version"]:
+            return True, version
+        self._count("stale")
+        return False, version
+
+    def _version(self, key):
+        return self.database.reference(f'/{VERSIONS_NODE}/{key}').get()
+
+    def _store(self, key, value, version):
+        self.entries.set(key, {"value": value, "version": version, "missing": value is None,
+                               "stored_at": time.monotonic()})
+
+    def stamp(self, updates: dict):
+        """Adds a version stamp for every cached path in a multi-path update."""
+        stamped = dict(updates)
+        for path in updates:
+            if self.handles(path):
+                stamped[f"{VERSIONS_NODE}/{self._key(path)}"] = uuid.uuid4().hex
+        return stamped
+
+    def stored(self, updates: dict):
+        """Writes through the values of a successful update."""
+        for path, value in updates.items():
+            if self.handles(path):
+                key = self._key(path)
+                self._store(key, value, updates.get(f"{VERSIONS_NODE}/{key}"))
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        served = stats["hits"] + stats["negative_hits"]
+        total = served + stats["misses"]
+        return {
+            "mode": "version",
+            "hits": stats["hits"],
+            "negative_hits": stats["negative_hits"],
+            "misses": stats["misses"],
+            "hit_ratio": round(served / total, 3) if total else 0.0,
+            "revalidations": stats["revalidations"],
+            "stale": stats["stale"],
+            "expired": stats["expired"],
+            "entries": len(self.entries),
+            "mean_served_age_seconds": round(stats["served_age_total"] / served, 3) if served else 0.0,
+            "max_served_age_seconds": round(stats["served_age_max"], 3)
+        }
@@ -1,54 +1,195 @@
-import firebase_admin
-from firebase_admin import credentials, db
+from datetime import datetime
+from services.local_db import LocalDatabase
+from services.write_behind import WriteBehindBuffer
+from services.firebase_cache import FirebaseReadCache
+from services.metrics import InstrumentedDatabase
+import asyncio
+import threading
 import os
 
+# One database handle and write buffer per process, shared by every FirebaseService.
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def _default_database():
+    with _shared_lock:
+        if "database" not in _shared:
+            if os.environ.get('FIREBASE_BACKEND', 'firebase') == 'local':
+                _shared["database"] = InstrumentedDatabase(LocalDatabase(os.environ.get('FIREBASE_LOCAL_PATH') or None))
+            else:
+                database_url = os.environ.get('FIREBASE_DATABASE_URL')
+                if not database_url:
+                    raise ValueError("Missing Firebase database URL")
+
+                # Imported here so processes that never touch Firebase do not pay for the SDK.
+                import firebase_admin
+                from firebase_admin import credentials, db
+                if not firebase_admin._apps:
+                    # The SDK will automatically use the GOOGLE_APPLICATION_CREDENTIALS environment
+                    # variable if it's set. Otherwise, it will look for a default credential.
+                    cred = credentials.Certificate("firebase_credentials.json")
+                    firebase_admin.initialize_app(cred, {
+                        'databaseURL': database_url
+                    })
+                _shared["database"] = InstrumentedDatabase(db)
+        return _shared["database"]
+
+
+def _default_write_buffer(database):
+    with _shared_lock:
+        if "write_buffer" not in _shared:
+            write_behind = os.environ.get('FIREBASE_WRITE_MODE', 'sync') == 'write_behind'
+            _shared["write_buffer"] = WriteBehindBuffer.from_env(database) if write_behind else None
+        return _shared["write_buffer"]
+
+
+def _default_read_cache(database):
+    with _shared_lock:
+        if "read_cache" not in _shared:
+            _shared["read_cache"] = FirebaseReadCache.from_env(database)
+        return _shared["read_cache"]
+
+
 class FirebaseService:
-    def __init__(self):
-        database_url = os.environ.get('FIREBASE_DATABASE_URL')
-        if not database_url:
-            raise ValueError("Missing Firebase database URL")
-        
-        if not firebase_admin._apps:
-            # The SDK will automatically use the GOOGLE_APPLICATION_CREDENTIALS environment
-            # variable if it's set. Otherwise, it will look for a default credential.
-            cred = credentials.Certificate("firebase_credentials.json")
-            firebase_admin.initialize_app(cred, {
-                'databaseURL': database_url
-            })
+    def __init__(self, database=None, write_buffer=None, read_cache=None):
+        """`database` is anything with the `firebase_admin.db` reference API. Without one, the
+        process-wide database, write buffer (FIREBASE_WRITE_MODE) and read cache (FIREBASE_CACHE_MODE) are used."""
+        self.db = database if database is not None else _default_database()
+        self.write_buffer = write_buffer if write_buffer is not None else (
+            _default_write_buffer(self.db) if database is None else None
+        )
+        self.read_cache = read_cache if read_cache is not None else (
+            _default_read_cache(self.db) if database is None else None
+        )
 
     def save_analysis(self, video_id: str, analysis: dict):
-        try:
-            ref = db.reference(f'/video_analysis/{video_id}')
-            ref.set(analysis)
-            return {"success": True}
-        except Exception as e:
-            return {"error": str(e)}
+        return self.save_many({f"video_analysis/{video_id}": analysis})
+
+    def _read(self, path: str):
+        """Reads a path, preferring writes that are still waiting in the write buffer."""
+        if self.write_buffer:
+            found, value = self.write_buffer.lookup(path)
+            if found:
+                return value
+        if self.read_cache and self.read_cache.handles(path):
+            return self.read_cache.get(path, self.db.reference(path).get)
+        return self.db.reference(path).get()
 
     def get_analysis(self, video_id: str):
         try:
-            ref = db.reference(f'/video_analysis/{video_id}')
-            return ref.get()
+            return self._read(f'/video_analysis/{video_id}')
         except Exception as e:
             return {"error": str(e)}
 
     def save_presentation(self, video_id: str, presentation: dict):
+        return self.save_many(self.presentation_updates(video_id, presentation))
+
+    @staticmethod
+    def presentation_updates(video_id: str, presentation: dict):
+        """Paths for a presentation together with its entry in the compact summary index."""
+        slides = presentation.get("slides")
+        return {
+            f"presentations/{video_id}": presentation,
+            f"presentation_summaries/{video_id}": {
+                "video_id": video_id,
+                "presentation_name": presentation.get("presentation_name"),
+                "slide_count": len(slides) if isinstance(slides, list) else 0,
+                "created_at": datetime.now().isoformat()
+            }
+        }
+
+    def get_presentation(self, video_id: str):
         try:
-            ref = db.reference(f'/presentations/{video_id}')
-            ref.set(presentation)
-            return {"success": True}
+            return self._read(f'/presentations/{video_id}')
         except Exception as e:
             return {"error": str(e)}
 
-    def get_presentation(self, video_id: str):
+    def save_many(self, updates: dict):
+        """Writes several paths (e.g. "presentations/<video_id>") in one atomic multi-path update."""
+        if not updates:
+            return {"success": True}
+        if self.read_cache:
+            updates = self.read_cache.stamp(updates)
+        if self.write_buffer:
+            result = self.write_buffer.put(updates)
+        else:
+            try:
+                self.db.reference('/').update(updates)
+                result = {"success": True}
+            except Exception as e:
+                result = {"error": str(e)}
+        if self.read_cache and "error" not in result:
+            self.read_cache.stored(updates)
+        return result
+
+    def get_all_presentations(self):
         try:
-            ref = db.reference(f'/presentations/{video_id}')
+            ref = self.db.reference('/presentations')
             return ref.get()
         except Exception as e:
             return {"error": str(e)}
 
-    def get_all_presentations(self):
+    def list_presentation_summaries(self, limit: int = 50, start_after: str = None):
+        """One page of presentation summaries ordered by video id.
+
+        Returns {"data": [...], "next_start_after": <video_id or None>} or {"error": ...}.
+        """
         try:
-            ref = db.reference('/presentations')
-            return ref.get()
+            query = self.db.reference('/presentation_summaries').order_by_key()
+            if start_after:
+                query = query.start_at(start_after)
+            # One extra row for start_after itself, and one to tell whether another page follows.
+            page = query.limit_to_first(limit + (2 if start_after else 1)).get() or {}
+            items = [(video_id, summary) for video_id, summary in page.items() if video_id != start_after]
+            has_more = len(items) > limit
+            items = items[:limit]
+            return {
+                "data": [{**summary, "video_id": video_id} for video_id, summary in items],
+                "next_start_after": items[-1][0] if has_more else None
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
+    def backfill_presentation_summaries(self, batch_size: int = 100):
+        """Writes summaries for presentations saved before the summary index existed."""
+        try:
+            video_ids = self.db.reference('/presentations').get(shallow=True) or {}
+            existing = self.db.reference('/presentation_summaries').get(shallow=True) or {}
+            missing = [video_id for video_id in video_ids if video_id not in existing]
+            for i in range(0, len(missing), batch_size):
+                updates = {}
+                for video_id in missing[i:i + batch_size]:
+                    presentation = self.db.reference(f'/presentations/{video_id}').get()
+                    if isinstance(presentation, dict):
+                        summary_path = f"presentation_summaries/{video_id}"
+                        updates[summary_path] = self.presentation_updates(video_id, presentation)[summary_path]
+                if updates:
+                    self.db.reference('/').update(updates)
+            return {"success": True, "backfilled": len(missing)}
         except Exception as e:
             return {"error": str(e)}
+
+    def get_write_stats(self):
+        if not self.write_buffer:
+            return {"mode": "sync"}
+        return {"mode": "write_behind", **self.write_buffer.get_stats()}
+
+    def get_cache_stats(self):
+        if not self.read_cache:
+            return {"mode": "off"}
+        return self.read_cache.get_stats()
+
+    # Async variants for the ASGI entry point. The Admin SDK is blocking, so these
+    # run the calls on the default executor instead of holding up the event loop.
+    async def save_analysis_async(self, video_id: str, analysis: dict):
+        return await asyncio.to_thread(self.save_analysis, video_id, analysis)
+
+    async def get_analysis_async(self, video_id: str):
+        return await asyncio.to_thread(self.get_analysis, video_id)
+
+    async def save_presentation_async(self, video_id: str, presentation: dict):
+        return await asyncio.to_thread(self.save_presentation, video_id, presentation)
+
+    async def get_presentation_async(self, video_id: str):
+        return await asyncio.to_thread(self.get_presentation, video_id)
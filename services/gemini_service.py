@@ -1,22 +1,97 @@
 
-import google.generativeai as genai
+import asyncio
 import os
-import json
 from prompts import SYSTEM_PROMPT
+from services.result_store import ResultStore
+from services.rate_limit import RateLimiter
+from services.llm_json import DeckStreamParser, parse_deck
+from services.analysis_compactor import AnalysisCompactor
+from services.model_router import ModelRouter
+from services.metrics import instrument, metrics
+
+
+def _genai(api_key):
+    """Imports and configures the Gemini SDK. Deferred to first use, as the import takes most of a second."""
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai
+
+
+class GeminiModelClient:
+    """ModelRouter client for one Gemini model, sharing the Gemini rate limit."""
+
+    def __init__(self, model_name, rate_limiter=None, model=None, api_key=None):
+        self.name = model_name
+        self.rate_limiter = rate_limiter
+        self.api_key = api_key
+        self._model = model
+        self.operation = metrics.operation("gemini", f"generate_content {model_name}")
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = _genai(self.api_key).GenerativeModel(self.name)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    def generate(self, prompt):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        with self.operation.timed() as timing:
+            text = self.model.generate_content(prompt).text
+            timing.size = len(text)
+        return text
+
+    async def generate_async(self, prompt):
+        if self.rate_limiter:
+            await self.rate_limiter.acquire_async()
+        with self.operation.timed() as timing:
+            text = (await self.model.generate_content_async(prompt)).text
+            timing.size = len(text)
+        return text
+
 
 class GeminiService:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, model_name='gemini-1.5-flash', result_store=None, rate_limiter=None, clients=None):
+        """`clients` overrides the models named in GEMINI_MODELS (default: `model_name`); the first is the primary."""
         if api_key is None:
             api_key = os.environ.get('GEMINI_API_KEY')
         if not api_key:
             raise ValueError("Missing Gemini API key")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.api_key = api_key
+        self.result_store = result_store if result_store is not None else ResultStore.from_env()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter.from_env('GEMINI', 5)
+        if clients is None:
+            model_names = [name.strip() for name in os.environ.get('GEMINI_MODELS', model_name).split(',') if name.strip()]
+            clients = [GeminiModelClient(name, self.rate_limiter, api_key=api_key) for name in model_names]
+        self.router = ModelRouter(
+            clients,
+            hedge=os.environ.get('GEMINI_HEDGE', 'true').lower() in ('1', 'true', 'yes'),
+            default_hedge_delay=float(os.environ.get('GEMINI_HEDGE_DEFAULT_DELAY', '10')),
+            min_hedge_delay=float(os.environ.get('GEMINI_HEDGE_MIN_DELAY', '0.5'))
+        )
+        self.model_name = ",".join(client.name for client in clients)
+        self.compactor = AnalysisCompactor.from_env(self._summarize, self.result_store, self.model_name)
+
+    @property
+    def model(self):
+        """The primary model, also used for streaming."""
+        return self.router.clients[0].model
+
+    @model.setter
+    def model(self, model):
+        self.router.clients[0].model = model
+
+    def get_model_stats(self):
+        return self.router.get_stats()
 
     def check_connection(self):
         try:
             # A simple way to check the connection is to list the available models.
-            models = [m for m in genai.list_models()]
+            models = [m for m in _genai(self.api_key).list_models()]
             if any('generateContent' in m.supported_generation_methods for m in models):
                 return {"status": "ok", "message": "Gemini API connection successful"}
             else:
@@ -24,28 +99,116 @@ class GeminiService:
         except Exception as e:
             return {"status": "error", "message": f"Error connecting to Gemini API: {e}"}
 
-    def generate_slides(self, video_analysis: dict, user_query: str) -> dict:
+    @instrument("gemini", "generate_slides")
+    def generate_slides(self, video_analysis: dict, user_query: str, video_id: str = None, force: bool = False) -> dict:
+        """Generates a deck, reusing a stored deck for an identical prompt and model unless `force` is set."""
+        text = None
+        try:
+            key = self._slides_key(video_analysis, user_query, video_id)
+            if not force:
+                stored = self.result_store.get(key)
+                if stored is not None:
+                    return stored
+            prompt = SYSTEM_PROMPT.format(
+                video_analysis=self.compactor.compact(video_analysis, video_id),
+                user_query=user_query
+            )
+            text, _, _ = self.router.generate(prompt, validate=self._deck_errors)
+            return self._deck_from_text(text, key)
+        except Exception as e:
+            return {"error": f"An unexpected error occurred: {type(e).__name__} - {e}", "raw_response": text or 'N/A'}
+
+    @instrument("gemini", "generate_slides")
+    async def generate_slides_async(self, video_analysis: dict, user_query: str, video_id: str = None, force: bool = False) -> dict:
+        text = None
         try:
+            key = self._slides_key(video_analysis, user_query, video_id)
+            if not force:
+                stored = self.result_store.get(key)
+                if stored is not None:
+                    return stored
             prompt = SYSTEM_PROMPT.format(
-                video_analysis=video_analysis,
+                video_analysis=await asyncio.to_thread(self.compactor.compact, video_analysis, video_id),
                 user_query=user_query
             )
-            response = self.model.generate_content(prompt)
-            
-            text = response.text
-            
-            # Find the start and end of the JSON object
-            start = text.find('{')
-            end = text.rfind('}') + 1
-            
-            if start == -1 or end == 0:
-                return {"error": "No JSON object found in Gemini response", "raw_response": text}
-
-            json_text = text[start:end]
-            
-            # Load the response as JSON
-            return json.loads(json_text)
-        except json.JSONDecodeError as e:
-            return {"error": f"Failed to decode Gemini response as JSON: {e}", "raw_response": text}
+            text, _, _ = await self.router.generate_async(prompt, validate=self._deck_errors)
+            return self._deck_from_text(text, key)
         except Exception as e:
-            return {"error": f"An unexpected error occurred: {type(e).__name__} - {e}", "raw_response": getattr(response, 'text', 'N/A')}
+            return {"error": f"An unexpected error occurred: {type(e).__name__} - {e}", "raw_response": text or 'N/A'}
+
+    @staticmethod
+    def _deck_errors(text: str):
+        return parse_deck(text)[1]
+
+    def _deck_from_text(self, text: str, key: str) -> dict:
+        # Extract the deck, tolerating fences and surrounding prose, and repair what we can
+        slides, errors = parse_deck(text)
+        if errors:
+            return {"error": f"Gemini response does not match the presentation schema: {'; '.join(errors)}", "raw_response": text}
+
+        self._store_deck(key, slides)
+        return slides
+
+    def _store_deck(self, key, deck):
+        # A truncated deck is still returned, but a retry should ask the model again rather than replay it.
+        if deck.get("truncated"):
+            print(f"Gemini response was truncated after {len(deck['slides'])} slides; not storing the deck")
+            return
+        self.result_store.put(key, deck)
+
+    def stream_slides(self, video_analysis: dict, user_query: str, video_id: str = None, force: bool = False):
+        """Generates a deck with Gemini streaming and yields (event, data) pairs as parts complete.
+
+        Yields ("meta", {"presentation_name": ...}) and one ("slide", {...}) per slide as
+        soon as each is fully received, then ("done", deck) or ("error", {...}).
+        """
+        response = None
+        try:
+            key = self._slides_key(video_analysis, user_query, video_id)
+            if not force:
+                stored = self.result_store.get(key)
+                if stored is not None:
+                    yield "meta", {"presentation_name": stored.get("presentation_name")}
+                    for slide in stored.get("slides", []):
+                        yield "slide", slide
+                    yield "done", stored
+                    return
+
+            prompt = SYSTEM_PROMPT.format(
+                video_analysis=self.compactor.compact(video_analysis, video_id),
+                user_query=user_query
+            )
+            parser = DeckStreamParser()
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            # Timed until the last chunk arrives, including the time the client takes to read each event
+            with metrics.operation("gemini", f"generate_content_stream {self.router.clients[0].name}").timed() as timing:
+                response = self.model.generate_content(prompt, stream=True)
+                for chunk in response:
+                    for event, value in parser.feed(chunk.text):
+                        if event == "presentation_name":
+                            yield "meta", {"presentation_name": value}
+                        else:
+                            yield "slide", value
+                timing.size = len(parser.text())
+
+            deck, errors = parser.finish()
+            if errors:
+                yield "error", {"error": f"Gemini response does not match the presentation schema: {'; '.join(errors)}", "raw_response": parser.text()}
+                return
+            self._store_deck(key, deck)
+            yield "done", deck
+        except Exception as e:
+            yield "error", {"error": f"An unexpected error occurred: {type(e).__name__} - {e}"}
+
+    def _summarize(self, prompt: str) -> str:
+        text, _, _ = self.router.generate(prompt)
+        return text
+
+    def _slides_key(self, video_analysis, user_query: str, video_id: str = None):
+        # Keyed on the full analysis, so a stored deck is found without compacting it again.
+        prompt = SYSTEM_PROMPT.format(video_analysis=video_analysis, user_query=user_query)
+        return ResultStore.make_key(
+            operation="generate_slides", video_id=video_id, prompt=prompt, model=self.model_name,
+            params={"token_budget": self.compactor.token_budget}
+        )
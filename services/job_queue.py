@@ -0,0 +1,270 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+import json
+import os
+import queue
+import threading
+import uuid
+
+FINISHED = ("completed", "failed")
+
+
+class ThreadPoolBackend:
+    """Runs jobs on an in-process thread pool."""
+
+    def __init__(self, max_workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, fn):
+        self.executor.submit(fn)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LocalQueueBackend:
+    """Runs jobs from a local FIFO queue drained by a fixed set of worker threads."""
+
+    def __init__(self, max_workers: int, max_size: int = 0):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._work, name=f"job-queue-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _work(self):
+        while True:
+            fn = self.queue.get()
+            if fn is None:
+                break
+            try:
+                fn()
+            finally:
+                self.queue.task_done()
+
+    def submit(self, fn):
+        self.queue.put(fn)
+
+    def shutdown(self):
+        for _ in self.workers:
+            self.queue.put(None)
+
+
+BACKENDS = {
+    "thread": ThreadPoolBackend,
+    "queue": LocalQueueBackend,
+}
+
+
+class MemoryJobStore:
+    """Job records in a dict, visible to this process only."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def add(self, job):
+        if job["id"] in self.jobs:
+            raise ValueError(f"Job already exists: {job['id']}")
+        self.jobs[job["id"]] = job
+
+    def put(self, job):
+        self.jobs[job["id"]] = job
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    def list(self):
+        return [dict(job) for job in self.jobs.values()]
+
+    def prune(self, max_jobs):
+        # Forget the oldest finished jobs once the table is full; dicts keep insertion order.
+        excess = len(self.jobs) - max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self.jobs.items() if job["status"] in FINISHED][:excess]:
+            del self.jobs[job_id]
+
+
+class FileJobStore:
+    """Job records as one JSON file per job, shared by every worker process on the host.
+
+    A job is only written by the process that runs it; the file records that
+    process, so a job whose process exited before it finished (a crash or a
+    restart) reads as failed instead of staying "running" forever.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write_tmp(self, job):
+        tmp_path = os.path.join(self.directory, f".{job['id']}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({"pid": os.getpid(), "job": job}, f)
+        return tmp_path
+
+    def add(self, job):
+        tmp_path = self._write_tmp(job)
+        try:
+            # Linking fails if the file exists, so a job id is only ever created once on the host
+            os.link(tmp_path, self._path(job["id"]))
+        except FileExistsError:
+            raise ValueError(f"Job already exists: {job['id']}")
+        finally:
+            os.remove(tmp_path)
+
+    def put(self, job):
+        os.replace(self._write_tmp(job), self._path(job["id"]))
+
+    def get(self, job_id):
+        try:
+            with open(self._path(job_id)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = record["job"]
+        if job["status"] not in FINISHED and not self._alive(record["pid"]):
+            job.update(status="failed", result={"error": "The worker running this job exited before it finished"})
+        return job
+
+    @staticmethod
+    def _alive(pid):
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _files(self):
+        return [item for item in os.scandir(self.directory) if item.name.endswith('.json')]
+
+    def list(self):
+        jobs = (self.get(item.name[:-len('.json')]) for item in self._files())
+        return [job for job in jobs if job]
+
+    def prune(self, max_jobs):
+        files = self._files()
+        excess = len(files) - max_jobs
+        if excess <= 0:
+            return
+        files.sort(key=lambda item: item.stat().st_mtime)
+        for item in files:
+            if excess <= 0:
+                break
+            job = self.get(item.name[:-len('.json')])
+            if job and job["status"] in FINISHED:
+                try:
+                    os.remove(item.path)
+                    excess -= 1
+                except OSError:
+                    pass
+
+
+class JobQueue:
+    """Tracks background jobs and runs them on a pluggable backend.
+
+    A job function returns a result dict. A result containing an "error" key
+    marks the job as failed, mirroring how the services report failures. A
+    job may also return a Future of such a dict; it then shows as "waiting"
+    without holding a worker until the future resolves.
+
+    Job records live in `store`: by default files in JOB_STORE_DIR, so any
+    worker process on the host can report a job, or in memory when it is empty.
+    """
+
+    def __init__(self, backend=None, max_workers=None, max_jobs=1000, store=None):
+        if backend is None:
+            backend = os.environ.get('JOB_QUEUE_BACKEND', 'thread')
+        if max_workers is None:
+            max_workers = int(os.environ.get('JOB_QUEUE_WORKERS', '4'))
+        if isinstance(backend, str):
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown job queue backend: {backend}")
+            backend = BACKENDS[backend](max_workers)
+        if store is None:
+            directory = os.environ.get('JOB_STORE_DIR', os.path.join('.cache', 'jobs'))
+            store = FileJobStore(directory) if directory else MemoryJobStore()
+        self.backend = backend
+        self.max_jobs = max_jobs
+        self.store = store
+        self.lock = threading.Lock()
+
+    def create(self, job_id=None, status="queued", **fields):
+        job_id = job_id or uuid.uuid4().hex
+        with self.lock:
+            self.store.add({
+                "id": job_id,
+                "status": status,
+                "created_at": datetime.now().isoformat(),
+                **fields,
+            })
+            self.store.prune(self.max_jobs)
+        return job_id
+
+    def run(self, job_id, fn, *args, **kwargs):
+        self.backend.submit(lambda: self._run(job_id, fn, args, kwargs))
+
+    def submit(self, fn, *args, **kwargs):
+        job_id = self.create()
+        self.run(job_id, fn, *args, **kwargs)
+        return job_id
+
+    def update(self, job_id, **fields):
+        self._update(job_id, **fields)
+
+    def finish(self, job_id, result):
+        self._finish(job_id, result)
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._update(job_id, status="running", started_at=datetime.now().isoformat())
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            result = {"error": str(e)}
+        if isinstance(result, Future):
+            # The job handed the rest of its wait to someone else (e.g. the task
+            # poller); free the worker and finish when the future does.
+            self._update(job_id, status="waiting")
+            result.add_done_callback(lambda future: self._finish(job_id, self._future_result(future)))
+            return
+        self._finish(job_id, result)
+
+    @staticmethod
+    def _future_result(future):
+        try:
+            return future.result()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _finish(self, job_id, result):
+        status = "failed" if isinstance(result, dict) and "error" in result else "completed"
+        fields = {"status": status, "result": result, "finished_at": datetime.now().isoformat()}
+        if isinstance(result, dict) and result.get("video_id"):
+            fields["video_id"] = result["video_id"]
+        self._update(job_id, **fields)
+
+    def _update(self, job_id, **fields):
+        with self.lock:
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            self.store.put(job)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def list(self):
+        return self.store.list()
+
+    def shutdown(self):
+        self.backend.shutdown()
@@ -0,0 +1,62 @@
+from datetime import datetime
+import atexit
+import fcntl
+import os
+import threading
+
+_state = {}
+_state_lock = threading.Lock()
+
+
+def wake_up_app():
+    """Pings the Moody Bomb website to prevent it from sleeping."""
+    try:
+        app_url = os.getenv('APP_URL')
+        if app_url:
+            import requests
+            response = requests.get(app_url)
+            if response.status_code == 200:
+                print(f"Successfully pinged {app_url} at {datetime.now()}")
+            else:
+                print(f"Failed to ping {app_url} (status code: {response.status_code}) at {datetime.now()}")
+        else:
+            print("APP_URL environment variable not set.")
+    except Exception as e:
+        print(f"Error occurred while pinging app: {e}")
+
+
+def start_keep_alive(lock_path=None, interval_minutes=9):
+    """Starts the keep-alive pinger unless another process on this host already runs it.
+
+    The process that takes an exclusive lock on `lock_path` runs the scheduler
+    and holds the lock until it exits; every other worker skips it. When that
+    process dies the lock is released, and the next worker to start takes over.
+    Returns True when this process runs the pinger.
+    """
+    with _state_lock:
+        if "scheduler" in _state:
+            return True
+        lock_path = lock_path or os.environ.get('KEEP_ALIVE_LOCK_FILE', os.path.join('.cache', 'keep-alive.lock'))
+        os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+        lock = open(lock_path, 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+
+        # Imported only by the one process that schedules anything.
+        from apscheduler.schedulers.background import BackgroundScheduler
+        scheduler = BackgroundScheduler()
+        scheduler.add_job(wake_up_app, 'interval', minutes=interval_minutes)
+        scheduler.start()
+        atexit.register(scheduler.shutdown)
+        _state.update(scheduler=scheduler, lock=lock)
+        return True
+
+
+def start_keep_alive_from_env():
+    """KEEP_ALIVE=off disables the pinger, e.g. when an external cron pings the app instead."""
+    if os.environ.get('KEEP_ALIVE', 'on').lower() in ('0', 'off', 'false', 'no'):
+        return False
+    return start_keep_alive(interval_minutes=float(os.environ.get('KEEP_ALIVE_INTERVAL_MINUTES', '9')))
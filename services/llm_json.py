@@ -0,0 +1,313 @@
+import bisect
+import json
+import re
+
+from services.metrics import instrument
+
+# Characters that matter outside and inside JSON strings. Everything between
+# them (numbers, literals, string contents) is skipped by the regex engine.
+_STRUCTURAL = re.compile(r'[{}\[\]",:]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+DECK_KEYS = ("presentation_name", "slides")
+
+_decoder = json.JSONDecoder(strict=False)
+
+
+class DeckStreamParser:
+    """Single-pass, incremental parser for a deck in the SYSTEM_PROMPT shape.
+
+    Text is fed in arbitrary chunks and every character is scanned once.
+    Anything before the deck object (prose, a code fence, an unrelated `{...}`)
+    and anything after it is ignored. When `emit_events` is set, `feed` returns
+    events as soon as the top-level `presentation_name` string or an element
+    of the `slides` array is complete:
+
+        ("presentation_name", "Title")
+        ("slide", {"slide_number": 1, "title": ..., "sub_points": [...]})
+
+    `finish` returns the deck with common LLM defects repaired: trailing
+    commas are dropped, and a truncated response keeps the slides that were
+    fully received and is marked `"truncated": true`.
+    """
+
+    def __init__(self, emit_events: bool = True):
+        self.emit_events = emit_events
+        self.chunks = []
+        self.offsets = []
+        self.length = 0
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.key = None
+        self.expect_key = False
+        self.seen_deck_key = False
+        self.in_slides = False
+        self.slide_start = None
+        self.slide_spans = []
+        self.comma = None
+        self.trailing_commas = []
+        self.start = None
+        self.end = None
+        # Whether any top-level `{` was seen, deck or not
+        self.saw_object = False
+        self.presentation_name = None
+        self.slides = []
+        self.repairs = []
+
+    @property
+    def done(self):
+        return self.end is not None
+
+    def text(self):
+        return "".join(self.chunks)
+
+    def feed(self, chunk: str):
+        events = []
+        if self.done or not chunk:
+            return events
+        base = self.length
+        self.chunks.append(chunk)
+        self.offsets.append(base)
+        self.length += len(chunk)
+
+        i, n = 0, len(chunk)
+        if self.escaped:
+            # The previous chunk ended with a backslash inside a string; skip the escaped character.
+            self.escaped = False
+            i = 1
+        while i < n:
+            if self.in_string:
+                match = _STRING_SPECIAL.search(chunk, i)
+                if match is None:
+                    break
+                i = match.end()
+                if match.group() == '\\':
+                    if i >= n:
+                        self.escaped = True
+                    i += 1
+                    continue
+                self.in_string = False
+                if len(self.stack) == 1:
+                    events.extend(self._top_level_string(base + i))
+                continue
+
+            match = _STRUCTURAL.search(chunk, i)
+            if match is None:
+                break
+            char = match.group()
+            pos = base + match.start()
+            i = match.end()
+
+            if self.start is None:
+                if char == '{':
+                    self.start = pos
+                    self.saw_object = True
+                    self.stack.append(char)
+                    self.expect_key = True
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = pos
+                self.comma = None
+            elif char == '{' or char == '[':
+                if char == '[' and len(self.stack) == 1 and self.key == 'slides' and not self.expect_key:
+                    self.in_slides = True
+                elif char == '{' and self.in_slides and len(self.stack) == 2:
+                    self.slide_start = pos
+                self.stack.append(char)
+                self.comma = None
+            elif char == '}' or char == ']':
+                self._check_trailing_comma(pos)
+                if not self.stack:
+                    continue
+                self.stack.pop()
+                depth = len(self.stack)
+                if depth == 2 and char == '}' and self.slide_start is not None:
+                    events.extend(self._slide(self.slide_start, pos + 1))
+                    self.slide_start = None
+                elif depth == 1 and char == ']' and self.in_slides:
+                    self.in_slides = False
+                elif depth == 0:
+                    if self.seen_deck_key:
+                        self.end = pos + 1
+                        break
+                    # A brace-delimited aside in the prose, not the deck; keep looking.
+                    self._reset_candidate()
+            elif char == ',':
+                self.comma = pos
+                if len(self.stack) == 1:
+                    self.expect_key = True
+            else:
+                self.comma = None
+                if len(self.stack) == 1:
+                    self.expect_key = False
+        return events
+
+    def _reset_candidate(self):
+        self.start = None
+        self.key = None
+        self.expect_key = False
+        self.trailing_commas = []
+
+    def _slice(self, start, end):
+        """Source text in [start, end) with trailing commas removed."""
+        index = bisect.bisect_right(self.offsets, start) - 1
+        pieces = []
+        last = index
+        while last < len(self.chunks) and self.offsets[last] < end:
+            pieces.append(self.chunks[last])
+            last += 1
+        text = "".join(pieces)
+        base = self.offsets[index]
+        commas = [c for c in self.trailing_commas if start <= c < end]
+        if not commas:
+            return text[start - base:end - base]
+        parts = []
+        cursor = start
+        for comma in commas:
+            parts.append(text[cursor - base:comma - base])
+            cursor = comma + 1
+        parts.append(text[cursor - base:end - base])
+        return "".join(parts)
+
+    def _check_trailing_comma(self, closer):
+        if self.comma is None:
+            return
+        comma, self.comma = self.comma, None
+        if not self._slice(comma + 1, closer).strip():
+            self.trailing_commas.append(comma)
+            self.repairs.append("trailing_comma")
+
+    def _top_level_string(self, end):
+        try:
+            value = json.loads(self._slice(self.string_start, end), strict=False)
+        except ValueError:
+            return []
+        if self.expect_key:
+            self.key = value
+            if value in DECK_KEYS:
+                self.seen_deck_key = True
+            return []
+        if self.key == 'presentation_name':
+            self.presentation_name = value
+            if self.emit_events:
+                return [("presentation_name", value)]
+        return []
+
+    def _slide(self, start, end):
+        if not self.emit_events:
+            self.slide_spans.append((start, end))
+            return []
+        slide = self._load_slide(start, end)
+        if slide is None:
+            return []
+        self.slides.append(slide)
+        return [("slide", slide)]
+
+    def _load_slide(self, start, end):
+        try:
+            return json.loads(self._slice(start, end), strict=False)
+        except ValueError:
+            return None
+
+    def _completed_slides(self):
+        if self.emit_events:
+            return list(self.slides)
+        slides = (self._load_slide(start, end) for start, end in self.slide_spans)
+        return [slide for slide in slides if slide is not None]
+
+    def finish(self):
+        """Returns (deck, errors); `errors` is empty when the deck matches the schema."""
+        if self.start is None:
+            if self.saw_object:
+                # e.g. single-quoted pseudo-JSON, whose keys are not JSON strings
+                return None, ['Gemini response has no JSON object with a "presentation_name" or "slides" key']
+            return None, ["No JSON object found in Gemini response"]
+
+        deck = None
+        if self.done:
+            try:
+                deck = json.loads(self._slice(self.start, self.end), strict=False)
+            except ValueError:
+                pass
+        if deck is None:
+            # Truncated or otherwise unparsable: keep what was fully received.
+            slides = self._completed_slides()
+            if self.presentation_name is None and not slides:
+                return None, ["Gemini response ended before any part of the deck was complete"]
+            deck = {"presentation_name": self.presentation_name, "slides": slides, "truncated": True}
+            self.repairs.append("partial")
+
+        deck = normalize_deck(deck)
+        return deck, validate_deck(deck)
+
+    def result(self):
+        deck, _ = self.finish()
+        return deck
+
+
+@instrument("json", "parse_deck", size=lambda result, text: len(text))
+def parse_deck(text: str):
+    """Extracts, repairs and validates a deck from a complete LLM response. Returns (deck, errors)."""
+    # Fast path: a well-formed deck right after the first brace decodes in one C-speed
+    # pass, and raw_decode stops at its end, so a code fence or trailing prose is fine.
+    start = text.find('{')
+    if start != -1:
+        try:
+            deck, _ = _decoder.raw_decode(text, start)
+        except ValueError:
+            deck = None
+        if isinstance(deck, dict) and any(key in deck for key in DECK_KEYS):
+            deck = normalize_deck(deck)
+            return deck, validate_deck(deck)
+
+    parser = DeckStreamParser(emit_events=False)
+    parser.feed(text)
+    return parser.finish()
+
+
+def normalize_deck(deck):
+    """Fixes harmless shape slips: numeric strings for slide_number, a bare string for sub_points, missing numbers."""
+    if not isinstance(deck, dict) or not isinstance(deck.get("slides"), list):
+        return deck
+    for index, slide in enumerate(deck["slides"], start=1):
+        if not isinstance(slide, dict):
+            continue
+        number = slide.get("slide_number")
+        if number is None:
+            slide["slide_number"] = index
+        elif isinstance(number, str) and number.strip().isdigit():
+            slide["slide_number"] = int(number)
+        if isinstance(slide.get("sub_points"), str):
+            slide["sub_points"] = [slide["sub_points"]]
+    return deck
+
+
+def validate_deck(deck):
+    """Checks a deck against the SYSTEM_PROMPT output schema and returns a list of problems."""
+    if not isinstance(deck, dict):
+        return ["Deck must be a JSON object"]
+    errors = []
+    name = deck.get("presentation_name")
+    if not isinstance(name, str) or not name.strip():
+        errors.append("presentation_name must be a non-empty string")
+    slides = deck.get("slides")
+    if not isinstance(slides, list):
+        return errors + ["slides must be a list"]
+    if not slides:
+        errors.append("slides must not be empty")
+    for index, slide in enumerate(slides):
+        if not isinstance(slide, dict):
+            errors.append(f"slides[{index}] must be an object")
+            continue
+        if not isinstance(slide.get("slide_number"), int) or isinstance(slide.get("slide_number"), bool):
+            errors.append(f"slides[{index}].slide_number must be an integer")
+        if not isinstance(slide.get("title"), str):
+            errors.append(f"slides[{index}].title must be a string")
+        sub_points = slide.get("sub_points")
+        if not isinstance(sub_points, list) or not all(isinstance(point, str) for point in sub_points):
+            errors.append(f"slides[{index}].sub_points must be a list of strings")
+    return errors
@@ -0,0 +1,107 @@
+import copy
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def _parts(path):
+    return [part for part in path.split('/') if part]
+
+
+class LocalDatabase:
+    """In-process stand-in for `firebase_admin.db` for local development and tests.
+
+    Implements the subset of the Realtime Database reference API the services
+    use: get (optionally shallow), set, update with multi-path keys, and
+    order_by_key / start_at / limit_to_first queries. With a `path`, the whole
+    tree is kept in a JSON file that is rewritten after every write.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.data = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def reference(self, path='/'):
+        return LocalReference(self, _parts(path))
+
+    def _get(self, parts):
+        node = self.data
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return copy.deepcopy(node)
+
+    def _set(self, parts, value):
+        if not parts:
+            self.data = value if isinstance(value, dict) else {}
+            return
+        node = self.data
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = copy.deepcopy(value)
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+
+class LocalReference:
+    def __init__(self, database, parts, start=None, limit=None):
+        self.database = database
+        self.parts = parts
+        self.start = start
+        self.limit = limit
+
+    def get(self, etag=False, shallow=False):
+        with self.database.lock:
+            value = self.database._get(self.parts)
+        if isinstance(value, dict) and (self.start is not None or self.limit is not None):
+            items = sorted(value.items())
+            if self.start is not None:
+                items = [(key, item) for key, item in items if key >= self.start]
+            if self.limit is not None:
+                items = items[:self.limit]
+            value = OrderedDict(items)
+        if shallow and isinstance(value, dict):
+            return {key: True for key in value}
+        return value
+
+    def set(self, value):
+        with self.database.lock:
+            self.database._set(self.parts, value)
+            self.database._save()
+
+    def update(self, value):
+        if not value:
+            raise ValueError("Dictionary must not be empty")
+        with self.database.lock:
+            for path, item in value.items():
+                self.database._set(self.parts + _parts(path), item)
+            self.database._save()
+
+    def order_by_key(self):
+        return LocalReference(self.database, self.parts, self.start, self.limit)
+
+    def start_at(self, start):
+        return LocalReference(self.database, self.parts, start, self.limit)
+
+    def limit_to_first(self, limit):
+        return LocalReference(self.database, self.parts, self.start, limit)
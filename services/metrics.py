@@ -0,0 +1,444 @@
+from bisect import bisect_left
+import asyncio
+import contextvars
+import functools
+import json
+import math
+import os
+import random
+import threading
+import time
+from time import perf_counter
+import uuid
+import weakref
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, math.inf)
+
+# The trace of the request being handled, or None when it is not sampled.
+_current_trace = contextvars.ContextVar('trace', default=None)
+# Set once any registry samples traces; until then recording never looks for a trace.
+_tracing = False
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+
+class _Shard:
+    """One thread's share of an operation's figures. Only its own thread writes to it."""
+
+    __slots__ = ('started', 'duration_counts', 'duration_sum', 'size_counts', 'size_sum', 'size_count', 'errors',
+                 'statuses')
+
+    def __init__(self):
+        self.started = 0
+        self.duration_counts = [0] * len(DURATION_BUCKETS)
+        self.duration_sum = 0.0
+        self.size_counts = [0] * len(SIZE_BUCKETS)
+        self.size_sum = 0
+        self.size_count = 0
+        self.errors = 0
+        # {status: count}, for operations that answer HTTP requests
+        self.statuses = {}
+
+
+class _ThreadToken:
+    """Lives in a thread's local storage, so it is freed when the thread exits."""
+
+    __slots__ = ('__weakref__',)
+
+
+class Operation:
+    """Latency histogram, payload size histogram, error count and in-flight gauge of one operation.
+
+    Recording takes no lock: each thread updates its own shard, found through
+    a thread-local attribute, and shards are summed when the operation is
+    read. When a thread exits, its shard is folded into one, so short-lived
+    pool threads do not accumulate.
+    """
+
+    __slots__ = ('component', 'name', 'shards', 'retired', 'lock', 'local')
+
+    def __init__(self, component, name):
+        self.component = component
+        self.name = name
+        self.shards = set()
+        self.retired = _Shard()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _shard(self):
+        """Creates the calling thread's shard, on its first recording."""
+        shard = _Shard()
+        token = _ThreadToken()
+        with self.lock:
+            self.shards.add(shard)
+        self.local.shard = shard
+        self.local.token = token
+        weakref.finalize(token, self._retire, shard).atexit = False
+        return shard
+
+    def _retire(self, shard):
+        with self.lock:
+            self.shards.discard(shard)
+            self._fold(self.retired, shard)
+
+    def start(self):
+        try:
+            self.local.shard.started += 1
+        except AttributeError:
+            self._shard().started += 1
+        return perf_counter()
+
+    def finish(self, start, error=False, size=None, status=None):
+        elapsed = perf_counter() - start
+        try:
+            shard = self.local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard.duration_counts[bisect_left(DURATION_BUCKETS, elapsed)] += 1
+        shard.duration_sum += elapsed
+        if error:
+            shard.errors += 1
+        if size is not None:
+            shard.size_counts[bisect_left(SIZE_BUCKETS, size)] += 1
+            shard.size_sum += size
+            shard.size_count += 1
+        if status is not None:
+            statuses = shard.statuses
+            statuses[status] = statuses.get(status, 0) + 1
+        if _tracing:
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.add(self, start, elapsed, error)
+
+    def timed(self):
+        """Context manager timing a block; set `.size` and `.error` on it as needed. Exceptions count as errors."""
+        return _Timing(self)
+
+    def snapshot(self):
+        """Returns (duration histogram, size histogram, errors, in flight) summed over all threads."""
+        with self.lock:
+            total = _Shard()
+            for shard in [self.retired, *self.shards]:
+                self._fold(total, shard)
+        duration = Histogram(DURATION_BUCKETS)
+        duration.counts, duration.sum, duration.count = total.duration_counts, total.duration_sum, sum(total.duration_counts)
+        size = Histogram(SIZE_BUCKETS)
+        size.counts, size.sum, size.count = total.size_counts, total.size_sum, total.size_count
+        # A call may start on one thread and finish on another, so only the totals pair up.
+        return duration, size, total.errors, max(0, total.started - duration.count)
+
+    def statuses(self):
+        """Returns {status: count} of the HTTP responses recorded with `finish`."""
+        with self.lock:
+            total = _Shard()
+            for shard in [self.retired, *self.shards]:
+                self._fold(total, shard)
+        return total.statuses
+
+    @staticmethod
+    def _fold(into, shard):
+        into.started += shard.started
+        into.duration_counts = [a + b for a, b in zip(into.duration_counts, shard.duration_counts)]
+        into.duration_sum += shard.duration_sum
+        into.size_counts = [a + b for a, b in zip(into.size_counts, shard.size_counts)]
+        into.size_sum += shard.size_sum
+        into.size_count += shard.size_count
+        into.errors += shard.errors
+        # Copying a dict is atomic; iterating one while its thread adds a key is not.
+        for status, count in dict(shard.statuses).items():
+            into.statuses[status] = into.statuses.get(status, 0) + count
+
+
+class _Timing:
+    __slots__ = ('operation', 'start', 'size', 'error')
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.size = None
+        self.error = False
+
+    def __enter__(self):
+        self.start = self.operation.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.operation.finish(self.start, self.error or exc_type is not None, self.size)
+        return False
+
+
+class Trace:
+    """Spans of one sampled request."""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, operation, start, elapsed, error):
+        span = {"component": operation.component, "operation": operation.name,
+                "start_ms": round((start - self.started) * 1000, 3), "duration_ms": round(elapsed * 1000, 3)}
+        if error:
+            span["error"] = True
+        with self.lock:
+            self.spans.append(span)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bound(bound):
+    return '+Inf' if bound == math.inf else repr(float(bound))
+
+
+class MetricsRegistry:
+    """Process-wide collection of operations and sampled traces.
+
+    Every worker process has its own registry, so with several gunicorn
+    workers /metrics reports the worker that served the scrape.
+    """
+
+    def __init__(self, trace_sample=0.0, trace_file=None):
+        self.operations = {}
+        # {(route, method): operation} of the HTTP routes; responses are counted by their operations
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.trace_sample = trace_sample
+        self.trace_file = trace_file
+        self.trace_lock = threading.Lock()
+        if trace_sample > 0:
+            global _tracing
+            _tracing = True
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            trace_sample=float(os.environ.get('METRICS_TRACE_SAMPLE', '0')),
+            trace_file=os.environ.get('METRICS_TRACE_FILE') or None
+        )
+
+    def operation(self, component, name):
+        key = (component, name)
+        operation = self.operations.get(key)
+        if operation is None:
+            with self.lock:
+                operation = self.operations.setdefault(key, Operation(component, name))
+        return operation
+
+    def http_operation(self, method, route):
+        """Returns the operation timing `method` requests to `route`; finish it with the response status."""
+        operation = self.routes.get((route, method))
+        if operation is None:
+            operation = self.operation("http", f"{method} {route}")
+            with self.lock:
+                self.routes[(route, method)] = operation
+        return operation
+
+    def start_trace(self, name):
+        """Starts tracing the current request when it is sampled. Returns the trace or None."""
+        if self.trace_sample <= 0:
+            return None
+        trace = Trace(name) if random.random() < self.trace_sample else None
+        _current_trace.set(trace)
+        return trace
+
+    def end_trace(self, trace, **fields):
+        _current_trace.set(None)
+        record = {"trace_id": trace.id, "name": trace.name,
+                  "duration_ms": round((time.perf_counter() - trace.started) * 1000, 3), **fields,
+                  "spans": sorted(trace.spans, key=lambda span: span["start_ms"])}
+        line = json.dumps(record)
+        if not self.trace_file:
+            print(f"trace {line}")
+            return
+        with self.trace_lock:
+            try:
+                with open(self.trace_file, 'a') as f:
+                    f.write(line + '\n')
+            except OSError as e:
+                print(f"Could not write trace: {e}")
+
+    def summary(self, component):
+        """Returns count, errors, in-flight calls and mean latency of each operation of `component`."""
+        with self.lock:
+            operations = sorted((op for op in self.operations.values() if op.component == component),
+                                key=lambda op: op.name)
+        result = {}
+        for op in operations:
+            duration, _, errors, in_flight = op.snapshot()
+            total_ms = duration.sum * 1000
+            result[op.name] = {
+                "count": duration.count,
+                "errors": errors,
+                "in_flight": in_flight,
+                "total_ms": round(total_ms, 3),
+                "avg_ms": round(total_ms / duration.count, 3) if duration.count else 0.0
+            }
+        return result
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        with self.lock:
+            operations = sorted(self.operations.values(), key=lambda op: (op.component, op.name))
+            routes = sorted(self.routes.items())
+
+        durations, sizes, errors, in_flight = [], [], [], []
+        for op in operations:
+            labels = f'component="{_escape(op.component)}",operation="{_escape(op.name)}"'
+            duration, size, op_errors, op_in_flight = op.snapshot()
+            errors.append(f'app_operation_errors_total{{{labels}}} {op_errors}')
+            in_flight.append(f'app_operation_in_flight{{{labels}}} {op_in_flight}')
+            for bound, count in duration.cumulative():
+                durations.append(f'app_operation_duration_seconds_bucket{{{labels},le="{_bound(bound)}"}} {count}')
+            durations.append(f'app_operation_duration_seconds_sum{{{labels}}} {duration.sum!r}')
+            durations.append(f'app_operation_duration_seconds_count{{{labels}}} {duration.count}')
+            if size.count:
+                for bound, count in size.cumulative():
+                    sizes.append(f'app_operation_payload_bytes_bucket{{{labels},le="{_bound(bound)}"}} {count}')
+                sizes.append(f'app_operation_payload_bytes_sum{{{labels}}} {size.sum!r}')
+                sizes.append(f'app_operation_payload_bytes_count{{{labels}}} {size.count}')
+
+        lines = [
+            '# HELP app_operation_duration_seconds Latency of instrumented operations.',
+            '# TYPE app_operation_duration_seconds histogram', *durations,
+            '# HELP app_operation_payload_bytes Size of payloads handled by instrumented operations.',
+            '# TYPE app_operation_payload_bytes histogram', *sizes,
+            '# HELP app_operation_errors_total Failed instrumented operations.',
+            '# TYPE app_operation_errors_total counter', *errors,
+            '# HELP app_operation_in_flight Instrumented operations currently running.',
+            '# TYPE app_operation_in_flight gauge', *in_flight,
+            '# HELP app_http_responses_total HTTP responses by route, method and status.',
+            '# TYPE app_http_responses_total counter'
+        ]
+        for (route, method), op in routes:
+            for status, count in sorted(op.statuses().items()):
+                lines.append(f'app_http_responses_total{{route="{_escape(route)}",method="{method}",'
+                             f'status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry.from_env()
+
+
+def bind_trace(fn):
+    """Returns `fn` run in a copy of the caller's context when a trace is active.
+
+    Pool threads do not inherit context variables, so without it the spans of
+    work handed to an executor would be missing from the request's trace.
+    Each submission needs its own copy: one context cannot run in two threads.
+    """
+    if not _tracing or _current_trace.get() is None:
+        return fn
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def instrument(component, operation=None, size=None, registry=None):
+    """Decorator recording latency, errors and in-flight calls of a function or coroutine.
+
+    A raised exception or a returned {"error": ...} dict counts as an error.
+    `size(result, *args, **kwargs)` returns the payload size in bytes to record.
+    """
+    def decorate(fn):
+        op = (registry or metrics).operation(component, operation or fn.__name__)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                start = op.start()
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException:
+                    op.finish(start, True)
+                    raise
+                # Inlined rather than a helper call: this is the whole per-call cost
+                op.finish(start, isinstance(result, dict) and "error" in result,
+                          size(result, *args, **kwargs) if size else None)
+                return result
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = op.start()
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException:
+                    op.finish(start, True)
+                    raise
+                # Inlined rather than a helper call: this is the whole per-call cost
+                op.finish(start, isinstance(result, dict) and "error" in result,
+                          size(result, *args, **kwargs) if size else None)
+                return result
+        return wrapper
+    return decorate
+
+
+class InstrumentedDatabase:
+    """Wraps anything with the `firebase_admin.db` reference API and times each round trip.
+
+    Operations are named after the call and the top-level node, e.g.
+    "get video_analysis" or "update /". Payload sizes are not recorded, as
+    they would mean serializing every value again.
+    """
+
+    def __init__(self, database, component="firebase", registry=None):
+        self.database = database
+        self.component = component
+        self.registry = registry or metrics
+
+    def reference(self, path='/'):
+        return _InstrumentedRef(self.database.reference(path), self, _node(path))
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+
+_ROUND_TRIPS = ('get', 'set', 'update', 'push', 'delete', 'transaction')
+
+
+def _node(path):
+    parts = [part for part in (path or '').split('/') if part]
+    return parts[0] if parts else '/'
+
+
+class _InstrumentedRef:
+    """A reference or query whose network calls are timed; chained queries stay instrumented."""
+
+    def __init__(self, target, database, node):
+        self._target = target
+        self._database = database
+        self._node = node
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        if name in _ROUND_TRIPS:
+            op = self._database.registry.operation(self._database.component, f"{name} {self._node}")
+
+            def timed(*args, **kwargs):
+                with op.timed():
+                    return attr(*args, **kwargs)
+            return timed
+        if name in ('child', 'order_by_key', 'order_by_child', 'order_by_value', 'limit_to_first',
+                    'limit_to_last', 'start_at', 'end_at', 'equal_to'):
+            def chained(*args, **kwargs):
+                child_node = _node(args[0]) if name == 'child' and self._node == '/' and args else self._node
+                return _InstrumentedRef(attr(*args, **kwargs), self._database, child_node)
+            return chained
+        return attr
@@ -0,0 +1,225 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import asyncio
+import threading
+import time
+
+from services.metrics import bind_trace
+
+
+class ModelStats:
+    """Rolling latency and error window for one model."""
+
+    def __init__(self, window=100):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.totals = {"requests": 0, "errors": 0, "wins": 0, "hedges": 0, "cancelled": 0}
+
+    def record(self, latency, ok):
+        with self.lock:
+            self.samples.append((latency, ok))
+            self.totals["requests"] += 1
+            if not ok:
+                self.totals["errors"] += 1
+
+    def count(self, stat):
+        with self.lock:
+            self.totals[stat] += 1
+
+    def percentile(self, pct, min_samples=1):
+        with self.lock:
+            latencies = sorted(latency for latency, ok in self.samples if ok)
+        if len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]
+
+    def error_rate(self):
+        with self.lock:
+            if not self.samples:
+                return 0.0
+            return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def to_dict(self):
+        p50, p95 = self.percentile(50), self.percentile(95)
+        with self.lock:
+            totals = dict(self.totals)
+            window = len(self.samples)
+        return {
+            **totals,
+            "window": window,
+            "error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
+
+
+class ModelRouter:
+    """Sends a prompt to one of several interchangeable model clients.
+
+    A client is any object with a `name` and a blocking `generate(prompt) -> str`;
+    an `async generate_async(prompt)` is used by `generate_async` when present.
+
+    Clients are tried in configured order, with those whose recent error rate
+    is above `max_error_rate` moved to the back. When the current request has
+    run longer than that model's rolling p95 latency, a hedged duplicate goes
+    to the next model; a failed or invalid answer falls back to the next model
+    straight away. The first answer that passes `validate` wins and the others
+    are cancelled (async) or abandoned (threads cannot be interrupted; their
+    latency is still recorded).
+    """
+
+    def __init__(self, clients, hedge=True, max_parallel=2, window=100, min_samples=10,
+                 default_hedge_delay=10.0, min_hedge_delay=0.5, max_error_rate=0.5, max_workers=32):
+        if not clients:
+            raise ValueError("ModelRouter needs at least one client")
+        self.clients = list(clients)
+        self.hedge = hedge
+        self.max_parallel = max_parallel
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_error_rate = max_error_rate
+        self.stats = {client.name: ModelStats(window) for client in self.clients}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model")
+
+    def order(self):
+        return sorted(self.clients, key=lambda client: self.stats[client.name].error_rate() > self.max_error_rate)
+
+    def hedge_delay(self, client):
+        p95 = self.stats[client.name].percentile(95, self.min_samples)
+        return self.default_hedge_delay if p95 is None else max(self.min_hedge_delay, p95)
+
+    @staticmethod
+    def _call(client, prompt):
+        start = time.monotonic()
+        try:
+            return {"text": client.generate(prompt), "error": None, "latency": time.monotonic() - start}
+        except Exception as e:
+            return {"text": None, "error": e, "latency": time.monotonic() - start}
+
+    def _judge(self, client, attempt, validate):
+        """Records an attempt and returns its validation errors, or None if the call itself failed."""
+        if attempt["error"] is not None:
+            self.stats[client.name].record(attempt["latency"], False)
+            return None
+        errors = validate(attempt["text"]) if validate else []
+        self.stats[client.name].record(attempt["latency"], not errors)
+        return errors
+
+    def generate(self, prompt, validate=None):
+        """Returns (text, model_name, errors) for the first valid answer, or for the last
+        invalid one if no model produced a valid answer. Raises the last error if every call failed.
+
+        `validate` takes the text and returns a list of problems (empty when valid).
+        """
+        order = self.order()
+        pending = {}
+        launched = []
+        fallback, last_error = None, None
+
+        def launch(hedged=False):
+            client = order[len(launched)]
+            launched.append((client, time.monotonic()))
+            if hedged:
+                self.stats[client.name].count("hedges")
+            pending[self.executor.submit(bind_trace(self._call), client, prompt)] = client
+
+        def abandon(future, client):
+            self.stats[client.name].count("cancelled")
+            if not future.cancel():
+                future.add_done_callback(lambda f: self._judge(client, f.result(), None))
+
+        launch()
+        while pending:
+            timeout = None
+            if self.hedge and len(launched) < len(order) and len(pending) < self.max_parallel:
+                latest, started = launched[-1]
+                timeout = max(0.0, self.hedge_delay(latest) - (time.monotonic() - started))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                launch(hedged=True)
+                continue
+            for future in done:
+                client = pending.pop(future)
+                attempt = future.result()
+                errors = self._judge(client, attempt, validate)
+                if errors == []:
+                    self.stats[client.name].count("wins")
+                    for other, other_client in pending.items():
+                        abandon(other, other_client)
+                    return attempt["text"], client.name, []
+                if errors is None:
+                    last_error = attempt["error"]
+                else:
+                    fallback = (attempt["text"], client.name, errors)
+                if len(launched) < len(order) and len(pending) < self.max_parallel:
+                    launch()
+        if fallback is not None:
+            return fallback
+        raise last_error
+
+    async def generate_async(self, prompt, validate=None):
+        """Async `generate`; losing requests are cancelled."""
+        order = self.order()
+        pending = {}
+        launched = []
+        fallback, last_error = None, None
+
+        async def call(client):
+            if hasattr(client, 'generate_async'):
+                start = time.monotonic()
+                try:
+                    return {"text": await client.generate_async(prompt), "error": None, "latency": time.monotonic() - start}
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    return {"text": None, "error": e, "latency": time.monotonic() - start}
+            return await asyncio.get_running_loop().run_in_executor(self.executor, bind_trace(self._call), client, prompt)
+
+        def launch(hedged=False):
+            client = order[len(launched)]
+            launched.append((client, time.monotonic()))
+            if hedged:
+                self.stats[client.name].count("hedges")
+            pending[asyncio.ensure_future(call(client))] = client
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and len(launched) < len(order) and len(pending) < self.max_parallel:
+                    latest, started = launched[-1]
+                    timeout = max(0.0, self.hedge_delay(latest) - (time.monotonic() - started))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch(hedged=True)
+                    continue
+                for task in done:
+                    client = pending.pop(task)
+                    attempt = task.result()
+                    errors = self._judge(client, attempt, validate)
+                    if errors == []:
+                        self.stats[client.name].count("wins")
+                        return attempt["text"], client.name, []
+                    if errors is None:
+                        last_error = attempt["error"]
+                    else:
+                        fallback = (attempt["text"], client.name, errors)
+                    if len(launched) < len(order) and len(pending) < self.max_parallel:
+                        launch()
+        finally:
+            for task, client in pending.items():
+                self.stats[client.name].count("cancelled")
+                task.cancel()
+        if fallback is not None:
+            return fallback
+        raise last_error
+
+    def get_stats(self):
+        return {
+            "hedge": self.hedge,
+            "models": {
+                client.name: {**self.stats[client.name].to_dict(), "hedge_delay_ms": round(self.hedge_delay(client) * 1000, 1)}
+                for client in self.clients
+            }
+        }
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket shared by every caller of one upstream.
+
+    Allows `rate` calls per second on average with bursts of up to `burst`.
+    Each caller reserves a token up front and then sleeps until it is due, so
+    waiting callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {"acquired": 0, "throttled": 0, "waited_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls, prefix: str, default_rate: float):
+        """Reads `<prefix>_RATE_LIMIT` (calls/second, 0 disables) and `<prefix>_RATE_BURST`; None when disabled."""
+        rate = float(os.environ.get(f'{prefix}_RATE_LIMIT', str(default_rate)))
+        if rate <= 0:
+            return None
+        burst = os.environ.get(f'{prefix}_RATE_BURST')
+        return cls(rate, float(burst) if burst else None)
+
+    def _reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.stats["acquired"] += 1
+            if delay:
+                self.stats["throttled"] += 1
+                self.stats["waited_seconds"] += delay
+            return delay
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["waited_seconds"] = round(stats["waited_seconds"], 3)
+        stats["rate"] = self.rate
+        stats["burst"] = self.capacity
+        return stats
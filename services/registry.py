@@ -0,0 +1,108 @@
+import atexit
+import threading
+
+
+class ServiceRegistry:
+    """Shared service instances, each created on first use and at most once per process.
+
+    Factories may ask the registry for other services. `lazy(name)` returns a
+    stand-in that can be imported and passed around at module level and only
+    creates the service when one of its attributes is used.
+    """
+
+    def __init__(self):
+        self.factories = {}
+        self.instances = {}
+        self.lock = threading.RLock()
+
+    def register(self, name, factory):
+        self.factories[name] = factory
+
+    def get(self, name):
+        instance = self.instances.get(name)
+        if instance is None:
+            with self.lock:
+                instance = self.instances.get(name)
+                if instance is None:
+                    instance = self.instances[name] = self.factories[name]()
+        return instance
+
+    def lazy(self, name):
+        return LazyService(self, name)
+
+    def created(self):
+        return sorted(self.instances)
+
+
+class LazyService:
+    """Stands in for a registered service, creating it on first attribute access."""
+
+    __slots__ = ('_registry', '_name')
+
+    def __init__(self, registry, name):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        if attr in LazyService.__slots__:
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self):
+        return f"<lazy {self._name} service>"
+
+
+# Service modules are imported inside the factories, so importing the app
+# does not import the Twelve Labs, Gemini or Firebase code at all.
+
+def _twelvelabs():
+    from services.twelvelabs_service import TwelveLabsService
+    return TwelveLabsService()
+
+
+def _gemini():
+    from services.gemini_service import GeminiService
+    return GeminiService()
+
+
+def _firebase():
+    from services.firebase_service import FirebaseService
+    return FirebaseService()
+
+
+def _job_queue():
+    from services.job_queue import JobQueue
+    job_queue = JobQueue()
+    atexit.register(job_queue.shutdown)
+    return job_queue
+
+
+def _batch_runner():
+    from services.batch import BatchRunner
+    return BatchRunner(services.get('firebase'))
+
+
+def _single_flight():
+    from services.single_flight import SingleFlight
+    return SingleFlight.from_env()
+
+
+def _exporter():
+    from services.deck_export import DeckExporter
+    exporter = DeckExporter.from_env(services.get('single_flight'))
+    atexit.register(exporter.shutdown)
+    return exporter
+
+
+services = ServiceRegistry()
+services.register('twelvelabs', _twelvelabs)
+services.register('gemini', _gemini)
+services.register('firebase', _firebase)
+services.register('job_queue', _job_queue)
+services.register('batch_runner', _batch_runner)
+services.register('single_flight', _single_flight)
+services.register('exporter', _exporter)
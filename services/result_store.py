@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from services.cache import MemoryCache, FileCache
+
+
+class ResultStore:
+    """Content-addressed store for expensive AI results.
+
+    Results are keyed by a hash of everything that determines them (operation,
+    inputs, prompt text, model and parameters), so a stored result can be
+    returned as-is whenever the same request comes again. Lookups go through an
+    in-process LRU first and then, if a directory is configured, to JSON files
+    on disk that survive restarts.
+    """
+
+    def __init__(self, directory=None, max_memory_entries: int = 256):
+        self.memory = MemoryCache(max_memory_entries)
+        self.disk = FileCache(directory, max_entries=100000) if directory else None
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+
+    @classmethod
+    def from_env(cls):
+        directory = os.environ.get('RESULT_STORE_DIR', os.path.join('.cache', 'results'))
+        return cls(directory or None)
+
+    @staticmethod
+    def make_key(**parts):
+        payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        if entry is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return entry["value"]
+
+    def put(self, key, value):
+        entry = {"value": value, "stored_at": time.time()}
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+        self._count("writes")
+
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats, "persistent": self.disk is not None}
@@ -0,0 +1,247 @@
+from concurrent.futures import Future
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+
+# How often a worker waiting on another worker's call checks its lock.
+LOCK_POLL_INTERVAL = 0.05
+# Shared results are only read by workers that were already waiting, so old ones can go.
+RESULT_MAX_AGE = 60
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one.
+
+    `do(key, fn)` runs `fn()` unless a call with the same key is already in
+    flight, in which case it waits for that call and returns its result (or
+    raises its exception). Returns (result, leader), where `leader` is True
+    only for the caller whose `fn` ran, e.g. so that only it saves the result.
+
+    With a `directory`, calls are also coalesced across the processes on the
+    host: the caller that holds an exclusive lock on `<key>.lock` runs `fn`,
+    publishes a JSON-serializable result to `<key>.json` and removes the lock
+    file. Callers in other processes that were waiting on the lock take that
+    result; when there is none (the call raised, or its process died), the
+    first of them runs `fn` itself. A waiter gives up on another process
+    after `wait_timeout` seconds and makes the call anyway.
+    """
+
+    def __init__(self, directory=None, wait_timeout=600.0, enabled=True):
+        self.directory = directory
+        self.wait_timeout = wait_timeout
+        self.enabled = enabled
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "shared_across_workers": 0, "wait_timeouts": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            directory=os.environ.get('SINGLE_FLIGHT_DIR', os.path.join('.cache', 'single-flight')) or None,
+            wait_timeout=float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', '600')),
+            enabled=os.environ.get('SINGLE_FLIGHT', 'on').lower() not in ('0', 'off', 'false', 'no')
+        )
+
+    @staticmethod
+    def make_key(operation, **parts):
+        payload = json.dumps({"operation": operation, **parts}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def _join(self, key):
+        """Returns (future, leader): the in-flight call for `key`, or a new one this caller must run."""
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future, False
+            future = self.calls[key] = Future()
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self.lock:
+            del self.calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        if not self.enabled:
+            self._count("calls")
+            return fn(), True
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(), False
+        try:
+            result, leader = self._call(key, fn)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result, leader
+
+    async def do_async(self, key, fn):
+        """`do` for a coroutine function, waiting without blocking the event loop."""
+        if not self.enabled:
+            self._count("calls")
+            return await fn(), True
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future), False
+        try:
+            result, leader = await self._call_async(key, fn)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result, leader
+
+    def _call(self, key, fn):
+        if not self.directory:
+            self._count("calls")
+            return fn(), True
+        started = time.time()
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            lock = open(self._path(key, 'lock'), 'a')
+            locked = self._try_lock(lock)
+            try:
+                while not locked and time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_INTERVAL)
+                    locked = self._try_lock(lock)
+                if locked:
+                    shared = self._shared_result(key, started)
+                    if shared is not None:
+                        return shared["result"], False
+                    if not self._is_current(lock, key):
+                        continue
+                else:
+                    self._count("wait_timeouts")
+                self._count("calls")
+                result = fn()
+                self._publish(key, result)
+                return result, True
+            finally:
+                self._release(lock, key, locked)
+
+    async def _call_async(self, key, fn):
+        if not self.directory:
+            self._count("calls")
+            return await fn(), True
+        started = time.time()
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            lock = open(self._path(key, 'lock'), 'a')
+            locked = self._try_lock(lock)
+            try:
+                while not locked and time.monotonic() < deadline:
+                    await asyncio.sleep(LOCK_POLL_INTERVAL)
+                    locked = self._try_lock(lock)
+                if locked:
+                    shared = self._shared_result(key, started)
+                    if shared is not None:
+                        return shared["result"], False
+                    if not self._is_current(lock, key):
+                        continue
+                else:
+                    self._count("wait_timeouts")
+                self._count("calls")
+                result = await fn()
+                self._publish(key, result)
+                return result, True
+            finally:
+                self._release(lock, key, locked)
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    @staticmethod
+    def _try_lock(lock):
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _is_current(self, lock, key):
+        """Whether `lock` is still the file at the key's lock path, i.e. was not removed by its last holder."""
+        try:
+            return os.fstat(lock.fileno()).st_ino == os.stat(self._path(key, 'lock')).st_ino
+        except OSError:
+            return False
+
+    def _release(self, lock, key, locked):
+        # Lock files would pile up, one per key, so the holder removes its own before unlocking.
+        # Callers already waiting on it find it gone after taking the lock and open the new one.
+        if locked and self._is_current(lock, key):
+            try:
+                os.remove(self._path(key, 'lock'))
+            except OSError:
+                pass
+        lock.close()
+
+    def _shared_result(self, key, started):
+        """The result another process published after this caller started waiting, if any."""
+        try:
+            with open(self._path(key, 'json')) as f:
+                shared = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if shared.get("finished_at", 0) < started:
+            return None
+        self._count("shared_across_workers")
+        return shared
+
+    def _publish(self, key, result):
+        path = self._path(key, 'json')
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({"finished_at": time.time(), "result": result}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            # Waiting processes then make the call themselves.
+            print(f"Single-flight result for {key} not shared: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        self._prune()
+
+    def _prune(self):
+        cutoff = time.time() - RESULT_MAX_AGE
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            in_flight = len(self.calls)
+        return {
+            **stats,
+            "saved": stats["coalesced"] + stats["shared_across_workers"],
+            "in_flight": in_flight,
+            "enabled": self.enabled,
+            "across_workers": bool(self.directory)
+        }
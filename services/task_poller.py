@@ -0,0 +1,234 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import heapq
+import hmac
+import itertools
+import os
+import threading
+import time
+
+SUCCEEDED = ("ready", "completed")
+FAILED = ("failed", "error")
+
+
+def verify_webhook_signature(secret, header, body, tolerance_seconds=300):
+    """Checks a `TL-Signature: t=<timestamp>,v1=<hmac>` header, an HMAC-SHA256 of "<timestamp>.<body>"."""
+    parts = dict(part.split('=', 1) for part in header.split(',') if '=' in part)
+    timestamp, signature = parts.get('t'), parts.get('v1')
+    if not timestamp or not signature:
+        return False
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance_seconds:
+            return False
+    except ValueError:
+        return False
+    expected = hmac.new(secret.encode(), timestamp.encode() + b'.' + body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class TaskPoller:
+    """Polls every pending Twelve Labs indexing task from one scheduler thread.
+
+    `watch` returns a Future that resolves to {"status", "video_id", "task"} or
+    {"error": ...}, so callers can block on it or attach callbacks. Each task
+    is polled less often as it ages (about every `age_factor` of its age, within
+    [min_interval, max_interval]), or based on its reported remaining time or
+    progress when the API sends one. All polls share a budget of
+    `max_requests_per_second`, and polling pauses while the API reports the
+    rate limit as exhausted (429 with Retry-After, or X-Ratelimit-Remaining 0).
+
+    With `webhook` set, completion is expected through `notify` and polling
+    drops to a slow safety net of `webhook_interval`.
+
+    `fetch(task_id)` returns (status_code, body, headers).
+    """
+
+    def __init__(self, fetch, min_interval=2.0, max_interval=30.0, age_factor=0.2,
+                 max_requests_per_second=2.0, max_workers=4, webhook=False, webhook_interval=60.0):
+        self.fetch = fetch
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.age_factor = age_factor
+        self.request_spacing = 1.0 / max_requests_per_second if max_requests_per_second > 0 else 0.0
+        self.webhook = webhook
+        self.webhook_interval = webhook_interval
+        self.tasks = {}
+        self.heap = []
+        self.sequence = itertools.count()
+        self.cond = threading.Condition()
+        self.paused_until = 0.0
+        self.next_request_at = 0.0
+        self.stopping = False
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task-poll")
+        self.thread = None
+        self.stats = {"watched": 0, "polls": 0, "poll_errors": 0, "rate_limited": 0,
+                      "completed": 0, "failed": 0, "timed_out": 0, "webhooks": 0}
+
+    @classmethod
+    def from_env(cls, fetch):
+        return cls(
+            fetch,
+            min_interval=float(os.environ.get('TWELVELABS_POLL_MIN_INTERVAL', '2')),
+            max_interval=float(os.environ.get('TWELVELABS_POLL_MAX_INTERVAL', '30')),
+            max_requests_per_second=float(os.environ.get('TWELVELABS_POLL_RATE', '2')),
+            webhook=bool(os.environ.get('TWELVELABS_WEBHOOK_SECRET')),
+            webhook_interval=float(os.environ.get('TWELVELABS_WEBHOOK_POLL_INTERVAL', '60'))
+        )
+
+    def watch(self, task_id, timeout_seconds=900):
+        """Starts tracking a task, or returns the existing Future if it is already tracked."""
+        with self.cond:
+            entry = self.tasks.get(task_id)
+            if entry is not None:
+                return entry["future"]
+            now = time.monotonic()
+            entry = self.tasks[task_id] = {
+                "future": Future(), "started": now, "deadline": now + timeout_seconds,
+                "polls": 0, "errors": 0, "in_flight": False, "status": None
+            }
+            self.stats["watched"] += 1
+            # The first check comes soon; a freshly created task is rarely done.
+            self._schedule(task_id, now + self.min_interval)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="task-poller", daemon=True)
+                self.thread.start()
+            return entry["future"]
+
+    def notify(self, task_id, task):
+        """Resolves a task from a webhook delivery. Returns False for untracked or non-final tasks."""
+        with self.cond:
+            if task_id not in self.tasks or task.get("status") not in SUCCEEDED + FAILED:
+                return False
+            self.stats["webhooks"] += 1
+            future, result = self._resolve(task_id, task)
+        # Callbacks run outside the lock; they may watch other tasks.
+        future.set_result(result)
+        return True
+
+    def _schedule(self, task_id, due):
+        heapq.heappush(self.heap, (due, next(self.sequence), task_id))
+        self.cond.notify_all()
+
+    def _resolve(self, task_id, task):
+        """Stops tracking a finished task and returns (future, result) for the caller to set once unlocked."""
+        entry = self.tasks.pop(task_id)
+        status = task.get("status")
+        if status in SUCCEEDED:
+            self.stats["completed"] += 1
+            video_id = task.get("video_id") or (task.get("data") or {}).get("video_id")
+            return entry["future"], {"status": status, "video_id": video_id, "task": task}
+        self.stats["failed"] += 1
+        return entry["future"], {"error": f"Indexing failed with status {status}", "task": task}
+
+    def _run(self):
+        while True:
+            timed_out = None
+            with self.cond:
+                while True:
+                    if self.stopping:
+                        return
+                    now = time.monotonic()
+                    due = self.heap[0][0] if self.heap else None
+                    ready_at = max(due, self.paused_until, self.next_request_at) if due is not None else None
+                    if ready_at is not None and ready_at <= now:
+                        break
+                    self.cond.wait(None if ready_at is None else ready_at - now)
+                _, _, task_id = heapq.heappop(self.heap)
+                entry = self.tasks.get(task_id)
+                if entry is None or entry["in_flight"]:
+                    continue
+                if now >= entry["deadline"]:
+                    del self.tasks[task_id]
+                    self.stats["timed_out"] += 1
+                    timed_out = entry["future"]
+                else:
+                    entry["in_flight"] = True
+                    self.next_request_at = now + self.request_spacing
+            if timed_out is not None:
+                timed_out.set_result({"error": "Upload timed out"})
+            else:
+                self.executor.submit(self._poll, task_id)
+
+    def _poll(self, task_id):
+        try:
+            status_code, body, headers = self.fetch(task_id)
+        except Exception as e:
+            status_code, body, headers = None, {"error": str(e)}, {}
+
+        with self.cond:
+            self.stats["polls"] += 1
+            entry = self.tasks.get(task_id)
+            self._apply_rate_limit(status_code, headers or {})
+            if entry is None:
+                # Resolved by a webhook while this poll was in flight.
+                return
+            entry["in_flight"] = False
+            entry["polls"] += 1
+
+            finished = None
+            if status_code == 200:
+                entry["errors"] = 0
+                entry["status"] = body.get("status")
+                if entry["status"] in SUCCEEDED + FAILED:
+                    finished = self._resolve(task_id, body)
+            else:
+                entry["errors"] += 1
+                self.stats["poll_errors"] += 1
+            if finished is None:
+                self._schedule(task_id, time.monotonic() + self._interval(entry, body if status_code == 200 else None))
+        if finished is not None:
+            future, result = finished
+            future.set_result(result)
+
+    def _apply_rate_limit(self, status_code, headers):
+        now = time.monotonic()
+        pause = None
+        retry_after = headers.get('Retry-After')
+        if status_code == 429 and retry_after:
+            try:
+                pause = float(retry_after)
+            except ValueError:
+                pass
+        if pause is None and status_code == 429:
+            pause = self.min_interval
+        remaining, reset = headers.get('X-Ratelimit-Remaining'), headers.get('X-Ratelimit-Reset')
+        if remaining is not None and reset is not None:
+            try:
+                if int(float(remaining)) <= 0:
+                    reset = float(reset)
+                    # Either an epoch timestamp or seconds until the window resets.
+                    pause = max(pause or 0.0, reset - time.time() if reset > 1e9 else reset)
+            except ValueError:
+                pass
+        if pause and pause > 0:
+            self.stats["rate_limited"] += 1
+            self.paused_until = max(self.paused_until, now + pause)
+
+    def _interval(self, entry, task):
+        age = time.monotonic() - entry["started"]
+        interval = age * self.age_factor
+        process = (task or {}).get("process") or {}
+        remaining = process.get("remain_seconds")
+        percentage = process.get("percentage")
+        if remaining is None and percentage and 0 < percentage < 100:
+            remaining = age * (100 - percentage) / percentage
+        if remaining is not None:
+            # Check again about halfway through the expected remaining time.
+            interval = remaining / 2
+        if entry["errors"]:
+            interval = max(interval, self.min_interval * 2 ** entry["errors"])
+        if self.webhook:
+            interval = max(interval, self.webhook_interval)
+            return min(max(self.min_interval, interval), max(self.max_interval, self.webhook_interval))
+        return min(max(self.min_interval, interval), self.max_interval)
+
+    def get_stats(self):
+        with self.cond:
+            return {**self.stats, "pending": len(self.tasks), "webhook": self.webhook,
+                    "paused_seconds": round(max(0.0, self.paused_until - time.monotonic()), 3)}
+
+    def shutdown(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
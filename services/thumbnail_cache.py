@@ -0,0 +1,201 @@
+from collections import OrderedDict
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+from services.cache import MemoryCache
+
+
+def sniff_content_type(data):
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    return 'application/octet-stream'
+
+
+class ThumbnailCache:
+    """Size-bounded disk cache for thumbnail images, shared by every process on the host.
+
+    Each image is stored as `<key hash>.img` with a small `<key hash>.json`
+    holding its strong ETag (a SHA-256 of the bytes), content type and key.
+    The metadata file is written last, so an entry is only visible once both
+    are complete. Reads memory-map the image.
+
+    The images and their sizes are kept in an in-memory LRU index with a
+    running byte total, read from the directory once at startup, so a store
+    does not scan the directory. Once the total goes over `max_bytes`, the
+    index is re-read (other processes store, use and remove images too; hits
+    refresh the file's mtime for them) and the least recently used images are
+    removed until the cache is back under `PRUNE_TARGET` of `max_bytes`.
+    """
+
+    # Pruning goes below the limit, so the directory is not re-read on every store once the cache is full.
+    PRUNE_TARGET = 0.9
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, ttl_seconds=86400, max_entries=4096):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.meta = MemoryCache(max_entries)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_stored": 0}
+        # {image path: size}, least recently used first
+        self.index = OrderedDict()
+        self.total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @classmethod
+    def from_env(cls):
+        ttl_seconds = float(os.environ.get('THUMBNAIL_CACHE_TTL', '86400'))
+        if ttl_seconds <= 0:
+            return None
+        return cls(
+            os.environ.get('THUMBNAIL_CACHE_DIR', os.path.join('.cache', 'thumbnails')),
+            max_bytes=int(os.environ.get('THUMBNAIL_CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+            ttl_seconds=ttl_seconds
+        )
+
+    def _paths(self, key):
+        name = os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+        return name + '.img', name + '.json'
+
+    def lookup(self, key):
+        """Returns {"etag", "content_type", "size", "path", "stored_at"} for a fresh entry, else None."""
+        entry = self.meta.get(key)
+        image_path, meta_path = self._paths(key)
+        if entry is None:
+            try:
+                with open(meta_path) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None and entry.get("key") == key:
+                entry["path"] = image_path
+                self.meta.set(key, entry)
+            else:
+                entry = None
+        stale = entry is None or time.time() - entry["stored_at"] >= self.ttl_seconds
+        if stale or not os.path.exists(image_path):
+            if entry is not None:
+                self.meta.delete(key)
+            with self.lock:
+                self.stats["misses"] += 1
+                if not stale:
+                    # Removed by another process
+                    self.total_bytes -= self.index.pop(image_path, 0)
+            return None
+        with self.lock:
+            self.stats["hits"] += 1
+            if image_path in self.index:
+                self.index.move_to_end(image_path)
+        try:
+            os.utime(image_path)
+        except OSError:
+            pass
+        return entry
+
+    def read(self, entry):
+        """Returns the image of an entry as a read-only memory map (bytes for empty files), or None if it is gone."""
+        try:
+            with open(entry["path"], 'rb') as f:
+                if entry["size"] == 0:
+                    return b''
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self.meta.delete(entry.get("key"))
+            return None
+
+    def put(self, key, data, content_type=None):
+        image_path, meta_path = self._paths(key)
+        entry = {
+            "key": key,
+            "etag": hashlib.sha256(data).hexdigest(),
+            "content_type": content_type or sniff_content_type(data),
+            "size": len(data),
+            "stored_at": time.time()
+        }
+        try:
+            self._write(image_path, data, 'wb')
+            self._write(meta_path, json.dumps(entry), 'w')
+        except OSError as e:
+            print(f"Could not cache thumbnail {key}: {e}")
+            return {**entry, "path": None}
+        entry["path"] = image_path
+        self.meta.set(key, entry)
+        with self.lock:
+            self.stats["stores"] += 1
+            self.stats["bytes_stored"] += len(data)
+            self.total_bytes += len(data) - self.index.pop(image_path, 0)
+            self.index[image_path] = len(data)
+            full = self.total_bytes > self.max_bytes
+        if full:
+            self._prune()
+        return entry
+
+    def _write(self, path, content, mode):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode) as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _load_index(self):
+        """Reads the images in the directory into the index, least recently used first."""
+        images = []
+        try:
+            for item in os.scandir(self.directory):
+                if item.name.endswith('.img'):
+                    try:
+                        stat = item.stat()
+                    except OSError:
+                        continue
+                    images.append((stat.st_mtime, item.path, stat.st_size))
+        except OSError:
+            pass
+        with self.lock:
+            # mtimes come from a coarse clock; images stored or used within one tick keep their order in the index
+            order = {path: position for position, path in enumerate(self.index)}
+            images.sort(key=lambda image: (image[0], order.get(image[1], -1)))
+            index = OrderedDict((path, size) for _, path, size in images)
+            self.index = index
+            self.total_bytes = sum(index.values())
+
+    def _prune(self):
+        self._load_index()
+        target = self.max_bytes * self.PRUNE_TARGET
+        while True:
+            with self.lock:
+                if self.total_bytes <= target or not self.index:
+                    return
+                path, size = self.index.popitem(last=False)
+                self.total_bytes -= size
+                self.stats["evictions"] += 1
+            for stale in (path[:-len('.img')] + '.json', path):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["directory"] = self.directory
+        stats["max_bytes"] = self.max_bytes
+        stats["bytes_cached"] = self.total_bytes
+        return stats
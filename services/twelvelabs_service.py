@@ -1,28 +1,247 @@
-from twelvelabs import TwelveLabs
+from services.upload_stream import MultipartStream
+from services.cache import TieredCache, FileCache
+from services.result_store import ResultStore
+from services.rate_limit import RateLimiter
+from services.task_poller import TaskPoller
+from services.thumbnail_cache import ThumbnailCache, sniff_content_type
+from services.metrics import metrics, bind_trace
+from prompts import ANALYSIS_PROMPT
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import Future, ThreadPoolExecutor
 import requests
+import asyncio
+import threading
+import hashlib
+import json
 import sys
 import os
 
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
 class TwelveLabsService:
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, base_url=None, pool_size=None, connect_timeout=None,
+                 read_timeout=None, upload_read_timeout=None, max_retries=None, backoff_factor=None,
+                 cache=None, result_store=None, rate_limiter=None, thumbnail_cache=None):
         if api_key is None:
             api_key = os.environ.get('TWELVELABS_API_KEY', '')
+        if base_url is None:
+            base_url = os.environ.get('TWELVELABS_BASE_URL', 'https://api.twelvelabs.io/v1.3')
+        if pool_size is None:
+            pool_size = int(os.environ.get('TWELVELABS_POOL_SIZE', '10'))
+        if connect_timeout is None:
+            connect_timeout = float(os.environ.get('TWELVELABS_CONNECT_TIMEOUT', '5'))
+        if read_timeout is None:
+            read_timeout = float(os.environ.get('TWELVELABS_READ_TIMEOUT', '30'))
+        if upload_read_timeout is None:
+            upload_read_timeout = float(os.environ.get('TWELVELABS_UPLOAD_READ_TIMEOUT', '300'))
+        if max_retries is None:
+            max_retries = int(os.environ.get('TWELVELABS_MAX_RETRIES', '3'))
+        if backoff_factor is None:
+            backoff_factor = float(os.environ.get('TWELVELABS_BACKOFF_FACTOR', '0.5'))
         self.api_key = api_key
-        self.client = TwelveLabs(api_key=api_key)
+        self.base_url = base_url.rstrip('/')
+        self._client = None
+        self.timeout = (connect_timeout, read_timeout)
+        self.upload_timeout = (connect_timeout, upload_read_timeout)
+        self.session = self._build_session(pool_size, max_retries, backoff_factor)
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._async_http = None
+        self._async_client = None
+        self._task_poller = None
+        self.poller_lock = threading.Lock()
+        self._poll_session = None
+        self.cache = cache if cache is not None else self._build_cache()
+        self.result_store = result_store if result_store is not None else ResultStore.from_env()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter.from_env('TWELVELABS', 5)
+        self.thumbnail_cache = thumbnail_cache if thumbnail_cache is not None else ThumbnailCache.from_env()
+
+    def _build_cache(self):
+        ttl_seconds = float(os.environ.get('TWELVELABS_CACHE_TTL', '30'))
+        if ttl_seconds <= 0:
+            return None
+        max_entries = int(os.environ.get('TWELVELABS_CACHE_SIZE', '512'))
+        cache_dir = os.environ.get('TWELVELABS_CACHE_DIR')
+        shared = FileCache(cache_dir) if cache_dir else None
+        return TieredCache(ttl_seconds=ttl_seconds, max_entries=max_entries, shared=shared)
+
+    def _build_session(self, pool_size, max_retries, backoff_factor):
+        # Idempotent reads are retried on connection errors and on 429/5xx, waiting for
+        # Retry-After when the server sends one. Uploads are never retried: their body
+        # may be a one-shot stream.
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _request(self, operation, method, url, session=None, **kwargs):
+        """Sends a request through the pooled session (or `session`) and records its latency under `operation`."""
+        kwargs.setdefault("timeout", self.timeout)
+        op = metrics.operation("twelvelabs", operation)
+        start = op.start()
+        failed, size = True, None
+        try:
+            response = (session or self.session).request(method, url, **kwargs)
+            failed = response.status_code >= 400
+            size = self._response_size(response)
+            return response
+        finally:
+            op.finish(start, failed, size)
+
+    @staticmethod
+    def _response_size(response):
+        length = response.headers.get("Content-Length")
+        return int(length) if length and length.isdigit() else None
+
+    # The SDKs and httpx are imported on first use; the Twelve Labs SDK alone
+    # takes a few hundred milliseconds to import.
+
+    @property
+    def client(self):
+        if self._client is None:
+            from twelvelabs import TwelveLabs
+            self._client = TwelveLabs(api_key=self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def async_http(self):
+        """Pooled httpx client for the async variants, created on first use inside the event loop."""
+        if self._async_http is None:
+            import httpx
+            self._async_http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0])
+            )
+        return self._async_http
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            from twelvelabs import AsyncTwelveLabs
+            self._async_client = AsyncTwelveLabs(api_key=self.api_key)
+        return self._async_client
+
+    async def _request_async(self, operation, method, url, **kwargs):
+        """Async counterpart of _request, with the same retry policy as the pooled session."""
+        import httpx
+        op = metrics.operation("twelvelabs", operation)
+        start = op.start()
+        failed, size = True, None
+        try:
+            for attempt in range(self.max_retries + 1):
+                retryable = method == "GET" and attempt < self.max_retries
+                try:
+                    response = await self.async_http.request(method, url, **kwargs)
+                except httpx.TransportError:
+                    if not retryable:
+                        raise
+                    await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+                    continue
+                if retryable and response.status_code in RETRY_STATUSES:
+                    await asyncio.sleep(self._retry_delay(response, attempt))
+                    continue
+                failed = response.status_code >= 400
+                size = self._response_size(response)
+                return response
+        finally:
+            op.finish(start, failed, size)
+
+    def _retry_delay(self, response, attempt):
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return int(retry_after)
+        return self.backoff_factor * (2 ** attempt)
+
+    async def aclose(self):
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
+
+    def _get_cached(self, operation, url, headers, tag, params=None):
+        """GETs a JSON resource through the metadata cache and returns (status_code, data).
+
+        Fresh entries are served without a request. Stale entries that carry an
+        ETag are revalidated with If-None-Match, and a 304 renews them.
+        """
+        key, entry, fresh = self._cache_lookup(operation, url, tag, params)
+        if fresh:
+            return 200, entry["value"]
+        response = self._request(operation, "GET", url, headers=self._conditional_headers(headers, entry), params=params)
+        return self._cache_response(key, tag, entry, response)
+
+    async def _get_cached_async(self, operation, url, headers, tag, params=None):
+        key, entry, fresh = self._cache_lookup(operation, url, tag, params)
+        if fresh:
+            return 200, entry["value"]
+        response = await self._request_async(operation, "GET", url, headers=self._conditional_headers(headers, entry), params=params)
+        return self._cache_response(key, tag, entry, response)
+
+    def _cache_lookup(self, operation, url, tag, params):
+        if self.cache is None:
+            return None, None, False
+        key = f"{operation}:{url}:{json.dumps(params or {}, sort_keys=True)}"
+        entry, fresh = self.cache.get(key, tag)
+        return key, entry, fresh
+
+    @staticmethod
+    def _conditional_headers(headers, entry):
+        if entry and entry.get("etag"):
+            return {**headers, "If-None-Match": entry["etag"]}
+        return headers
+
+    def _cache_response(self, key, tag, entry, response):
+        if response.status_code == 304 and entry:
+            self.cache.revalidated(key, tag, entry)
+            return 200, entry["value"]
+        if response.status_code != 200:
+            return response.status_code, None
+        data = response.json()
+        if self.cache is not None:
+            self.cache.set(key, tag, data, response.headers.get("ETag"))
+        return 200, data
+
+    def invalidate_index(self, index_id):
+        """Drops cached listings and video details for an index, e.g. after an upload."""
+        if self.cache is not None:
+            self.cache.invalidate(f"index:{index_id}")
+            self.cache.invalidate("indexes")
+
+    def get_cache_stats(self):
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.get_stats()}
+
+    def get_request_metrics(self):
+        return metrics.summary("twelvelabs")
     
     def check_connection(self):
         try:
             if not self.api_key:
                 return {"status": "error", "message": "Missing TwelveLabs API key"}
             
-            url = "https://api.twelvelabs.io/v1.3/health"
+            url = f"{self.base_url}/health"
             headers = {
                 "accept": "application/json",
                 "x-api-key": self.api_key
             }
             
-            response = requests.get(url, headers=headers)
+            response = self._request("check_connection", "GET", url, headers=headers)
             if response.status_code == 200:
                 return {"status": "ok", "message": "Twelve Labs connection successful"}
             else:
@@ -30,6 +249,21 @@ class TwelveLabsService:
         except Exception as e:
             return {"status": "error", "message": f"Error connecting to Twelve Labs: {e}"}
 
+    async def check_connection_async(self):
+        try:
+            if not self.api_key:
+                return {"status": "error", "message": "Missing TwelveLabs API key"}
+            headers = {
+                "accept": "application/json",
+                "x-api-key": self.api_key
+            }
+            response = await self._request_async("check_connection", "GET", f"{self.base_url}/health", headers=headers)
+            if response.status_code == 200:
+                return {"status": "ok", "message": "Twelve Labs connection successful"}
+            return {"status": "error", "message": f"Failed to connect to Twelve Labs: Status {response.status_code}"}
+        except Exception as e:
+            return {"status": "error", "message": f"Error connecting to Twelve Labs: {e}"}
+
     def get_indexes(self):
         try:
             print("Fetching indexes...")
@@ -37,152 +271,309 @@ class TwelveLabsService:
                 print("No API key available")
                 return []
             
-            url = "https://api.twelvelabs.io/v1.3/indexes"
+            url = f"{self.base_url}/indexes"
             headers = {
                 "accept": "application/json",
                 "x-api-key": self.api_key
             }
             
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                result = []
-                for index in data.get('data', []):
-                    result.append({
-                        "id": index['_id'],
-                        "name": index['index_name']
-                    })
-                return result
+            status_code, data = self._get_cached("get_indexes", url, headers, "indexes")
+            if status_code == 200:
+                return self._format_indexes(data)
             else:
-                print(f"Failed to fetch indexes: Status {response.status_code}")
+                print(f"Failed to fetch indexes: Status {status_code}")
+                return []
+        except Exception as e:
+            print(f"Error fetching indexes: {e}")
+            return []
+
+    async def get_indexes_async(self):
+        try:
+            if not self.api_key:
                 return []
+            headers = {
+                "accept": "application/json",
+                "x-api-key": self.api_key
+            }
+            status_code, data = await self._get_cached_async("get_indexes", f"{self.base_url}/indexes", headers, "indexes")
+            if status_code == 200:
+                return self._format_indexes(data)
+            print(f"Failed to fetch indexes: Status {status_code}")
+            return []
         except Exception as e:
             print(f"Error fetching indexes: {e}")
             return []
+
+    @staticmethod
+    def _format_indexes(data):
+        result = []
+        for index in data.get('data', []):
+            result.append({
+                "id": index['_id'],
+                "name": index['index_name']
+            })
+        return result
     
-    def get_videos(self, index_id):
+    def get_videos(self, index_id, **params):
+        page = self.get_videos_page(index_id, **params)
+        if "error" in page:
+            return []
+        return page["data"]
+
+    def get_videos_page(self, index_id, page=None, page_limit=None, sort_by=None, sort_option=None):
+        """Fetches one page of videos, passing the paging and sort parameters through upstream.
+
+        Returns {"data": [...], "page_info": {...}} or {"error": ...}.
+        """
         try:
             if not self.api_key:
                 print("No API key available")
-                return []
+                return {"error": "Missing TwelveLabs API key"}
             
-            url = f"https://api.twelvelabs.io/v1.3/indexes/{index_id}/videos"
+            url = f"{self.base_url}/indexes/{index_id}/videos"
             headers = {
                 "accept": "application/json",
                 "x-api-key": self.api_key
             }
+            params = self._videos_params(page, page_limit, sort_by, sort_option)
             
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                result = []
-                for video in data.get('data', []):
-                    system_metadata = video.get('system_metadata', {})
-                    hls_data = video.get('hls', {})
-                    thumbnail_urls = hls_data.get('thumbnail_urls', [])
-                    thumbnail_url = thumbnail_urls[0] if thumbnail_urls else None
-                    video_url = hls_data.get('video_url')
-                    
-                    result.append({
-                        "id": video['_id'],
-                        "name": system_metadata.get('filename', f'Video {video["_id"]}'),
-                        "duration": system_metadata.get('duration', 0),
-                        "thumbnail_url": thumbnail_url,
-                        "video_url": video_url,
-                        "width": system_metadata.get('width', 0),
-                        "height": system_metadata.get('height', 0),
-                        "fps": system_metadata.get('fps', 0),
-                        "size": system_metadata.get('size', 0)
-                    })
-                return result
-            else:
-                print(f"Failed to fetch videos: Status {response.status_code}")
-                return []
+            status_code, data = self._get_cached("get_videos", url, headers, f"index:{index_id}", params)
+            return self._videos_page(status_code, data)
         except Exception as e:
             print(f"Error fetching videos for index {index_id}: {e}")
-            return []
-    
-    def analyze_video(self, video_id):
+            return {"error": f"Error fetching videos for index {index_id}: {e}"}
+
+    async def get_videos_page_async(self, index_id, page=None, page_limit=None, sort_by=None, sort_option=None):
         try:
-            prompt = """Provide a clear and organized overview of the video, capturing its main theme, purpose, and progression of ideas.
+            if not self.api_key:
+                return {"error": "Missing TwelveLabs API key"}
+            url = f"{self.base_url}/indexes/{index_id}/videos"
+            headers = {
+                "accept": "application/json",
+                "x-api-key": self.api_key
+            }
+            params = self._videos_params(page, page_limit, sort_by, sort_option)
+            status_code, data = await self._get_cached_async("get_videos", url, headers, f"index:{index_id}", params)
+            return self._videos_page(status_code, data)
+        except Exception as e:
+            print(f"Error fetching videos for index {index_id}: {e}")
+            return {"error": f"Error fetching videos for index {index_id}: {e}"}
 
-Describe all significant topics, arguments, and perspectives in detail, ensuring that no relevant point is overlooked.
+    @staticmethod
+    def _videos_params(page, page_limit, sort_by, sort_option):
+        params = {
+            "page": page,
+            "page_limit": page_limit,
+            "sort_by": sort_by,
+            "sort_option": sort_option
+        }
+        return {key: value for key, value in params.items() if value is not None}
 
-Incorporate observations of visual and auditory elements such as gestures, expressions, tone, and contextual visuals that enrich understanding."""
-            analysis_response = self.client.analyze(
-                video_id=video_id,
-                prompt=prompt
-            )
+    def _videos_page(self, status_code, data):
+        if status_code == 200:
+            return {
+                "data": [self._format_video(video) for video in data.get('data', [])],
+                "page_info": data.get('page_info', {})
+            }
+        print(f"Failed to fetch videos: Status {status_code}")
+        return {"error": f"Failed to fetch videos: Status {status_code}"}
+
+    def iter_video_pages(self, index_id, page_limit=50, sort_by=None, sort_option=None):
+        """Yields every page of an index in order, fetching the next page while the caller
+        consumes the current one. Stops after yielding the first {"error": ...} page.
+        """
+        fetch = lambda page: self.get_videos_page(index_id, page, page_limit, sort_by, sort_option)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="video-pages")
+        try:
+            current = fetch(1)
+            while True:
+                if "error" in current:
+                    yield current
+                    return
+                page_info = current["page_info"]
+                page = page_info.get("page", 1)
+                has_next = page < page_info.get("total_page", 1) and current["data"]
+                upcoming = executor.submit(bind_trace(fetch), page + 1) if has_next else None
+                yield current
+                if upcoming is None:
+                    return
+                current = upcoming.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _format_video(video):
+        system_metadata = video.get('system_metadata', {})
+        hls_data = video.get('hls', {})
+        thumbnail_urls = hls_data.get('thumbnail_urls', [])
+        thumbnail_url = thumbnail_urls[0] if thumbnail_urls else None
+        video_url = hls_data.get('video_url')
+        
+        return {
+            "id": video['_id'],
+            "name": system_metadata.get('filename', f'Video {video["_id"]}'),
+            "duration": system_metadata.get('duration', 0),
+            "thumbnail_url": thumbnail_url,
+            "video_url": video_url,
+            "width": system_metadata.get('width', 0),
+            "height": system_metadata.get('height', 0),
+            "fps": system_metadata.get('fps', 0),
+            "size": system_metadata.get('size', 0)
+        }
+    
+    def analyze_video(self, video_id, force=False):
+        """Analyzes a video with Twelve Labs, reusing a stored result for the same video and prompt unless `force` is set."""
+        try:
+            key = self._analysis_key(video_id)
+            if not force:
+                stored = self.result_store.get(key)
+                if stored is not None:
+                    return stored
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            with metrics.operation("twelvelabs", "analyze").timed() as timing:
+                analysis_response = self.client.analyze(
+                    video_id=video_id,
+                    prompt=ANALYSIS_PROMPT
+                )
+                timing.size = len(analysis_response.data or '')
+            self.result_store.put(key, analysis_response.data)
+            return analysis_response.data
+        except Exception as e:
+            print(f"Error analyzing video {video_id}: {e}")
+            raise e
+
+    async def analyze_video_async(self, video_id, force=False):
+        try:
+            key = self._analysis_key(video_id)
+            if not force:
+                stored = self.result_store.get(key)
+                if stored is not None:
+                    return stored
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async()
+            with metrics.operation("twelvelabs", "analyze").timed() as timing:
+                analysis_response = await self.async_client.analyze(
+                    video_id=video_id,
+                    prompt=ANALYSIS_PROMPT
+                )
+                timing.size = len(analysis_response.data or '')
+            self.result_store.put(key, analysis_response.data)
             return analysis_response.data
         except Exception as e:
             print(f"Error analyzing video {video_id}: {e}")
             raise e
 
+    @staticmethod
+    def _analysis_key(video_id):
+        return ResultStore.make_key(
+            operation="analyze", video_id=video_id, prompt=ANALYSIS_PROMPT, model="twelvelabs-analyze", params={}
+        )
+
     def get_video_details(self, index_id, video_id):
-        if not hasattr(self, 'client') or not getattr(self, 'client', None):
-            return None
         if not self.api_key:
             return None
-        url = f"https://api.twelvelabs.io/v1.3/indexes/{index_id}/videos/{video_id}?embed=false"
+        url = f"{self.base_url}/indexes/{index_id}/videos/{video_id}?embed=false"
         headers = {
             "accept": "application/json",
             "x-api-key": self.api_key,
             "Content-Type": "application/json"
         }
         try:
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                return response.json()
+            status_code, data = self._get_cached("get_video_details", url, headers, f"index:{index_id}")
+            if status_code == 200:
+                return data
             else:
-                print(f"Failed to get video details: Status {response.status_code}")
+                print(f"Failed to get video details: Status {status_code}")
                 return None
         except Exception as e:
             print(f"Exception getting video details: {str(e)}")
             return None
 
     def get_video_thumbnail(self, index_id, video_id):
-        if not hasattr(self, 'client') or not getattr(self, 'client', None):
-            print("[DEBUG] No client available", file=sys.stderr)
-            return None
-        if not self.api_key:
-            print("[DEBUG] No API key available", file=sys.stderr)
+        """Returns the thumbnail image bytes of a video, or None."""
+        thumbnail = self.get_thumbnail(index_id, video_id)
+        if "error" in thumbnail:
             return None
-        url = f"https://api.twelvelabs.io/v1.3/indexes/{index_id}/videos/{video_id}/thumbnail"
-        headers = {
-            "accept": "application/json",
-            "x-api-key": self.api_key
-        }
+        if "data" in thumbnail:
+            return thumbnail["data"]
+        image = self.thumbnail_cache.read(thumbnail)
+        return bytes(image) if image is not None else None
+
+    def get_thumbnail(self, index_id, video_id, thumbnail_url=None):
+        """Returns a video's thumbnail as {"etag", "content_type", "size", "path"} from the disk
+        cache, fetching it on a miss. "path" is replaced by "data" (the bytes) when it could not
+        be cached. Returns {"error": ...} on failure.
+
+        `thumbnail_url`, when already known from a video listing, saves the lookup request.
+        """
+        key = f"{index_id}/{video_id}"
+        if self.thumbnail_cache is not None:
+            entry = self.thumbnail_cache.lookup(key)
+            if entry is not None:
+                return entry
         try:
-            response = requests.get(url, headers=headers)
-            print(f"[DEBUG] Thumbnail endpoint content-type: {response.headers.get('Content-Type')}", file=sys.stderr)
+            data, content_type = self._fetch_thumbnail(index_id, video_id, thumbnail_url)
+        except Exception as e:
+            print(f"Error fetching thumbnail for video {video_id}: {e}")
+            return {"error": f"Error fetching thumbnail: {e}"}
+        if isinstance(data, dict):
+            return data
+        if self.thumbnail_cache is not None:
+            entry = self.thumbnail_cache.put(key, data, content_type)
+            if entry["path"]:
+                return entry
+        else:
+            entry = {"etag": hashlib.sha256(data).hexdigest(), "size": len(data),
+                     "content_type": content_type or sniff_content_type(data)}
+        return {**entry, "path": None, "data": data}
+
+    def get_thumbnails(self, index_id, videos, max_workers=None):
+        """Fetches many thumbnails concurrently. `videos` holds video ids or formatted videos
+        (with "id" and "thumbnail_url"). Returns {video_id: get_thumbnail result}.
+        """
+        if max_workers is None:
+            max_workers = int(os.environ.get('THUMBNAIL_FETCH_CONCURRENCY', '8'))
+        videos = [video if isinstance(video, dict) else {"id": video} for video in videos]
+        if not videos:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(videos)), thread_name_prefix="thumbnail") as executor:
+            futures = [executor.submit(bind_trace(self.get_thumbnail), index_id, video["id"], video.get("thumbnail_url"))
+                       for video in videos]
+            return {video["id"]: future.result() for video, future in zip(videos, futures)}
+
+    def _fetch_thumbnail(self, index_id, video_id, thumbnail_url=None):
+        """Returns (image bytes, content type), or ({"error": ...}, None)."""
+        if not self.api_key:
+            return {"error": "Missing TwelveLabs API key"}, None
+        if not thumbnail_url:
+            response = self._request(
+                "get_video_thumbnail", "GET",
+                f"{self.base_url}/indexes/{index_id}/videos/{video_id}/thumbnail",
+                headers={"accept": "application/json", "x-api-key": self.api_key}
+            )
             if response.status_code != 200:
-                print(f"[DEBUG] Thumbnail endpoint returned status {response.status_code}: {response.text}", file=sys.stderr)
-                return None
+                print(f"Failed to get thumbnail for video {video_id}: Status {response.status_code}")
+                return {"error": f"Failed to get thumbnail: Status {response.status_code}"}, None
             data = response.json()
-            if not isinstance(data, dict) or 'thumbnail' not in data:
-                print(f"[DEBUG] Unexpected thumbnail response: {data}", file=sys.stderr)
-                return None
-            thumbnail_url = data.get('thumbnail')
-            print(f"[DEBUG] Extracted thumbnail URL: {thumbnail_url}", file=sys.stderr)
-            if thumbnail_url:
-                img_resp = requests.get(thumbnail_url)
-                print(f"[DEBUG] Image fetch status: {img_resp.status_code}", file=sys.stderr)
-                if img_resp.status_code == 200:
-                    print(f"[DEBUG] Image fetch successful, bytes: {len(img_resp.content)}", file=sys.stderr)
-                    return img_resp.content
-                else:
-                    print(f"[DEBUG] Failed to fetch actual thumbnail image: {img_resp.status_code}", file=sys.stderr)
-                    return None
-            else:
-                print("[DEBUG] No thumbnail URL in JSON response", file=sys.stderr)
-                return None
-        except Exception as e:
-            print(f"[DEBUG] Exception getting thumbnail: {str(e)}", file=sys.stderr)
-            return None
+            thumbnail_url = data.get('thumbnail') if isinstance(data, dict) else None
+            if not thumbnail_url:
+                return {"error": "No thumbnail available for this video"}, None
+        image = self._request("get_video_thumbnail_image", "GET", thumbnail_url)
+        if image.status_code != 200:
+            print(f"Failed to fetch thumbnail image for video {video_id}: Status {image.status_code}")
+            return {"error": f"Failed to fetch thumbnail image: Status {image.status_code}"}, None
+        content_type = (image.headers.get('Content-Type') or '').split(';')[0].strip()
+        return image.content, content_type if content_type.startswith('image/') else None
 
     def upload_video_file(self, index_id: str, file_path: str, timeout_seconds: int = 900):
+        created = self.create_upload_task(index_id, file_path)
+        if "error" in created:
+            return created
+        return self.wait_for_task(created["task_id"], timeout_seconds, index_id=index_id)
 
-        import sys
+    def create_upload_task(self, index_id: str, file_path: str):
+        """Uploads a local file and returns {"task_id": ...} or {"error": ...} without waiting for indexing."""
         try:
             if not self.api_key:
                 return {"error": "Missing TwelveLabs API key"}
@@ -193,11 +584,6 @@ Incorporate observations of visual and auditory elements such as gestures, expre
             
             print(f"[DEBUG] Starting upload for file: {file_path}", file=sys.stderr)
 
-            tasks_url = "https://api.twelvelabs.io/v1.3/tasks"
-            headers = {
-                "x-api-key": self.api_key
-            }
-
             # Create upload task
             with open(file_path, "rb") as f:
                 files = {
@@ -206,40 +592,107 @@ Incorporate observations of visual and auditory elements such as gestures, expre
                 data = {
                     "index_id": index_id
                 }
-                resp = requests.post(tasks_url, headers=headers, files=files, data=data)
+                resp = self._request("create_task", "POST", f"{self.base_url}/tasks", headers={"x-api-key": self.api_key}, files=files, data=data, timeout=self.upload_timeout)
 
-            if resp.status_code not in (200, 201):
-                return {"error": f"Failed to create upload task: {resp.status_code} {resp.text}"}
+            task_id, error = self._task_id_from_response(resp)
+            if error:
+                return error
+            return {"task_id": task_id}
+        except Exception as e:
+            return {"error": str(e)}
 
-            resp_json = resp.json() if resp.text else {}
-            task_id = resp_json.get("id") or resp_json.get("task_.id") or resp_json.get("_id")
-            if not task_id:
-                return {"error": f"No task id returned: {resp_json}"}
+    def create_upload_task_stream(self, index_id: str, stream, filename: str, progress=None,
+                                  chunk_size: int = 1024 * 1024, max_buffered_chunks: int = 4):
+        """Creates an upload task by piping `stream` to Twelve Labs as a chunked multipart body.
 
-            # Poll task until ready
-            import time
-            start_time = time.time()
-            print(f"[DEBUG] Starting to poll task {task_id} for completion...", file=sys.stderr)
-            
-            while time.time() - start_time < timeout_seconds:
-                r = requests.get(f"{tasks_url}/{task_id}", headers=headers)
-                if r.status_code != 200:
-                    time.sleep(2)
-                    continue
-                task = r.json() if r.text else {}
-                status = task.get("status")
-                print(f"[DEBUG] Task {task_id} status: {status}", file=sys.stderr)
-                
-                if status in ("ready", "completed"):
-                    video_id = task.get("video_id") or (task.get("data") or {}).get("video_id")
-                    print(f"[DEBUG] Indexing completed successfully! Video ID: {video_id}", file=sys.stderr)
-                    return {"status": status, "video_id": video_id, "task": task}
-                if status in ("failed", "error"):
-                    print(f"[DEBUG] Indexing failed with status: {status}", file=sys.stderr)
-                    return {"error": f"Indexing failed with status {status}", "task": task}
-                time.sleep(2)
-
-            print(f"[DEBUG] Upload timed out after {timeout_seconds} seconds", file=sys.stderr)
-            return {"error": "Upload timed out"}
+        Nothing is staged to disk; returns {"task_id": ...} or {"error": ...}.
+        """
+        try:
+            if not self.api_key:
+                return {"error": "Missing TwelveLabs API key"}
+            if not index_id:
+                return {"error": "Missing index_id"}
+
+            body = MultipartStream(
+                {"index_id": index_id}, "video_file", filename, stream,
+                chunk_size=chunk_size, max_buffered_chunks=max_buffered_chunks, progress=progress
+            )
+            headers = {
+                "x-api-key": self.api_key,
+                "Content-Type": body.content_type
+            }
+            resp = self._request("create_task", "POST", f"{self.base_url}/tasks", headers=headers, data=body, timeout=self.upload_timeout)
+
+            task_id, error = self._task_id_from_response(resp)
+            if error:
+                return error
+            return {"task_id": task_id, "progress": body.progress.to_dict()}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _task_id_from_response(self, resp):
+        if resp.status_code not in (200, 201):
+            return None, {"error": f"Failed to create upload task: {resp.status_code} {resp.text}"}
+
+        resp_json = resp.json() if resp.text else {}
+        task_id = resp_json.get("id") or resp_json.get("task_.id") or resp_json.get("_id")
+        if not task_id:
+            return None, {"error": f"No task id returned: {resp_json}"}
+        return task_id, None
+
+    @property
+    def task_poller(self):
+        """Shared poller for every pending indexing task, started on first use."""
+        with self.poller_lock:
+            if self._task_poller is None:
+                # Polls go through a session without urllib3 retries: the poller
+                # schedules its own retries and must not block on Retry-After.
+                self._poll_session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=0)
+                self._poll_session.mount("https://", adapter)
+                self._poll_session.mount("http://", adapter)
+                self._task_poller = TaskPoller.from_env(self._fetch_task)
+            return self._task_poller
+
+    def _fetch_task(self, task_id):
+        r = self._request("get_task", "GET", f"{self.base_url}/tasks/{task_id}",
+                          session=self._poll_session, headers={"x-api-key": self.api_key})
+        try:
+            body = r.json() if r.text else {}
+        except ValueError:
+            body = {}
+        return r.status_code, body, r.headers
+
+    def watch_task(self, task_id: str, timeout_seconds: int = 900, index_id: str = None):
+        """Returns a Future resolving to {"status", "video_id", "task"} or {"error": ...} once indexing ends."""
+        done = Future()
+
+        def finish(future):
+            try:
+                result = future.result()
+                if "error" not in result:
+                    self.invalidate_index(index_id or result["task"].get("index_id"))
+            except Exception as e:
+                result = {"error": str(e)}
+            done.set_result(result)
+
+        self.task_poller.watch(task_id, timeout_seconds).add_done_callback(finish)
+        return done
+
+    def notify_task(self, payload: dict):
+        """Resolves a watched task from a webhook event. Returns True if it was being waited on."""
+        task = payload.get("data") if isinstance(payload.get("data"), dict) else payload
+        task_id = task.get("id") or task.get("_id")
+        status = task.get("status") or (payload.get("type") or "").rsplit('.', 1)[-1]
+        if not task_id:
+            return False
+        return self.task_poller.notify(task_id, {**task, "status": status})
+
+    def get_task_stats(self):
+        return self.task_poller.get_stats()
+
+    def wait_for_task(self, task_id: str, timeout_seconds: int = 900, index_id: str = None):
+        try:
+            return self.watch_task(task_id, timeout_seconds, index_id=index_id).result()
         except Exception as e:
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+import uuid
+
+
+class UploadProgress:
+    """Byte-level counters for a streaming upload, safe to read from other threads."""
+
+    def __init__(self, total_bytes=None, on_update=None):
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.bytes_sent = 0
+        self.chunks = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self.on_update = on_update
+
+    def read(self, n):
+        self.bytes_read += n
+
+    def sent(self, n):
+        self.bytes_sent += n
+        self.chunks += 1
+        if self.on_update:
+            self.on_update(self)
+
+    def finish(self):
+        self.finished_at = time.time()
+        if self.on_update:
+            self.on_update(self)
+
+    def to_dict(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "bytes_read": self.bytes_read,
+            "bytes_sent": self.bytes_sent,
+            "total_bytes": self.total_bytes,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(elapsed, 3),
+            "bytes_per_second": int(self.bytes_sent / elapsed) if elapsed > 0 else 0,
+        }
+
+
+class MultipartStream:
+    """Iterable multipart/form-data body that pulls a file part from a stream.
+
+    A reader thread copies the source stream into a queue of at most
+    `max_buffered_chunks` chunks. The queue blocks the reader when the upstream
+    connection is slower than the client, so memory stays bounded at roughly
+    `(max_buffered_chunks + 1) * chunk_size` and the client is slowed down to
+    the upstream's pace. Passing the instance as `data=` to requests sends it
+    with chunked transfer encoding.
+    """
+
+    def __init__(self, fields: dict, file_field: str, filename: str, stream,
+                 content_type: str = "application/octet-stream",
+                 chunk_size: int = 1024 * 1024, max_buffered_chunks: int = 4,
+                 progress: UploadProgress = None):
+        self.boundary = uuid.uuid4().hex
+        self.fields = fields
+        self.file_field = file_field
+        self.filename = filename
+        self.stream = stream
+        self.file_content_type = content_type
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(maxsize=max_buffered_chunks)
+        self.progress = progress or UploadProgress()
+        self.error = None
+        self._stop = threading.Event()
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def _preamble(self):
+        parts = []
+        for name, value in self.fields.items():
+            parts.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        filename = self.filename.replace('"', '')
+        parts.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{self.file_field}"; filename="{filename}"\r\n'
+            f"Content-Type: {self.file_content_type}\r\n\r\n"
+        )
+        return "".join(parts).encode()
+
+    def _epilogue(self):
+        return f"\r\n--{self.boundary}--\r\n".encode()
+
+    def _put(self, item):
+        # Re-check the stop flag so an abandoned upload doesn't leave the reader blocked forever.
+        while not self._stop.is_set():
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self.stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                self.progress.read(len(chunk))
+                if not self._put(chunk):
+                    return
+        except Exception as e:
+            self.error = e
+        self._put(None)
+
+    def __iter__(self):
+        reader = threading.Thread(target=self._read, name="upload-stream-reader", daemon=True)
+        reader.start()
+        try:
+            preamble = self._preamble()
+            self.progress.sent(len(preamble))
+            yield preamble
+            while True:
+                chunk = self.chunks.get()
+                if chunk is None:
+                    break
+                self.progress.sent(len(chunk))
+                yield chunk
+            if self.error:
+                raise IOError(f"Failed to read upload stream: {self.error}")
+            epilogue = self._epilogue()
+            self.progress.sent(len(epilogue))
+            yield epilogue
+        finally:
+            self._stop.set()
+            self.progress.finish()
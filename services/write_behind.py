@@ -0,0 +1,313 @@
+from collections import OrderedDict
+import atexit
+import copy
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+
+def _normalize(path):
+    return '/'.join(part for part in path.split('/') if part)
+
+
+def _merge(pending, path, value):
+    """Applies one write to a dict of path -> value, keeping paths from overlapping. Returns True if it replaced a write."""
+    path = _normalize(path)
+    replaced = path in pending
+    for other in [other for other in pending if other.startswith(path + '/')]:
+        del pending[other]
+        replaced = True
+    for other in pending:
+        if path.startswith(other + '/'):
+            # Fold the write into the pending ancestor so a single update still covers both.
+            node = pending[other] = copy.deepcopy(pending[other]) if isinstance(pending[other], dict) else {}
+            parts = path[len(other) + 1:].split('/')
+            for part in parts[:-1]:
+                if not isinstance(node.get(part), dict):
+                    node[part] = {}
+                node = node[part]
+            node[parts[-1]] = value
+            return True
+    pending[path] = value
+    return replaced
+
+
+def _lookup(writes, path):
+    if path in writes:
+        return True, writes[path]
+    for other, value in writes.items():
+        if path.startswith(other + '/'):
+            for part in path[len(other) + 1:].split('/'):
+                if not isinstance(value, dict) or part not in value:
+                    return True, None
+                value = value[part]
+            return True, value
+    return False, None
+
+
+class WriteBehindBuffer:
+    """Takes database writes off the request path and saves them in batches.
+
+    `put` accepts a dict of paths to values and returns as soon as the write is
+    journaled. A background thread sends pending writes with one multi-path
+    `update` when `flush_size` paths are waiting or `flush_interval` seconds
+    after the oldest one. Later writes to the same path replace earlier ones
+    before they are sent. A failed update is retried with exponential backoff
+    and its writes are kept, never dropped.
+
+    With a `spool_dir`, every accepted write is appended to a per-process
+    journal first, and journals left behind by a process that died are
+    replayed on start. `lookup` serves reads from writes that have not been
+    saved yet.
+    """
+
+    def __init__(self, database, max_pending=1000, flush_size=100, flush_interval=1.0,
+                 spool_dir=None, max_backoff=30.0, put_timeout=5.0):
+        self.database = database
+        self.max_pending = max_pending
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.put_timeout = put_timeout
+        self.pending = OrderedDict()
+        self.inflight = {}
+        self.oldest = None
+        self.attempts = 0
+        self.retry_at = None
+        self.flush_requested = False
+        self.stopping = False
+        self.cond = threading.Condition()
+        self.stats = {"writes": 0, "coalesced": 0, "flushes": 0, "paths_flushed": 0,
+                      "failures": 0, "rejected": 0, "recovered": 0, "last_error": None}
+
+        self.spool = None
+        if spool_dir:
+            self._open_spool(spool_dir)
+
+        self.thread = threading.Thread(target=self._run, name="firebase-write-behind", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def from_env(cls, database):
+        buffer = cls(
+            database,
+            max_pending=int(os.environ.get('FIREBASE_WRITE_MAX_PENDING', '1000')),
+            flush_size=int(os.environ.get('FIREBASE_WRITE_FLUSH_SIZE', '100')),
+            flush_interval=float(os.environ.get('FIREBASE_WRITE_FLUSH_INTERVAL', '1')),
+            spool_dir=os.environ.get('FIREBASE_SPOOL_DIR', os.path.join('.cache', 'firebase-spool')) or None
+        )
+        atexit.register(buffer.close)
+        return buffer
+
+    def put(self, updates: dict):
+        with self.cond:
+            deadline = time.monotonic() + self.put_timeout
+            new_paths = len([path for path in updates if _normalize(path) not in self.pending])
+            while len(self.pending) + new_paths > self.max_pending and len(self.pending) and not self.stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["rejected"] += 1
+                    return {"error": "Write buffer is full"}
+                self.cond.wait(remaining)
+            if self.stopping:
+                return {"error": "Write buffer is closed"}
+            try:
+                self._journal(updates)
+            except OSError as e:
+                return {"error": f"Failed to spool write: {e}"}
+            for path, value in updates.items():
+                if _merge(self.pending, path, value):
+                    self.stats["coalesced"] += 1
+            self.stats["writes"] += 1
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            self.cond.notify_all()
+        return {"success": True, "queued": True}
+
+    def lookup(self, path: str):
+        """Returns (True, value) when a write to `path` is still waiting to be saved, else (False, None)."""
+        path = _normalize(path)
+        with self.cond:
+            found, value = _lookup(self.pending, path)
+            if not found:
+                found, value = _lookup(self.inflight, path)
+            return found, copy.deepcopy(value)
+
+    def flush(self, timeout=10.0):
+        """Blocks until everything accepted so far has been saved, or `timeout` passes. Returns True when drained."""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            self.flush_requested = True
+            self.cond.notify_all()
+            while self.pending or self.inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        with self.cond:
+            if self.stopping:
+                return
+            self.stopping = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
+        with self.cond:
+            if self.spool and not self.pending and not self.inflight:
+                self.spool["file"].close()
+                os.unlink(self.spool["path"])
+                os.unlink(self.spool["path"][:-len('.jsonl')] + '.lock')
+                self.spool["lock"].close()
+                self.spool = None
+
+    def get_stats(self):
+        with self.cond:
+            return {**self.stats, "pending": len(self.pending), "inflight": len(self.inflight),
+                    "spool": self.spool["path"] if self.spool else None}
+
+    def _due(self):
+        if not self.pending:
+            return False
+        if self.stopping:
+            return True
+        if self.retry_at is not None and time.monotonic() < self.retry_at:
+            return False
+        return (self.flush_requested or len(self.pending) >= self.flush_size
+                or time.monotonic() - self.oldest >= self.flush_interval)
+
+    def _wait_time(self):
+        if self.oldest is None:
+            return None
+        due = time.monotonic() if self.flush_requested else self.oldest + self.flush_interval
+        if self.retry_at is not None:
+            due = max(due, self.retry_at)
+        return max(0.0, due - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self._due():
+                    if self.stopping:
+                        return
+                    self.cond.wait(self._wait_time())
+                batch, self.pending = self.pending, OrderedDict()
+                self.inflight = batch
+                self.oldest = None
+                self.flush_requested = False
+                self.cond.notify_all()
+
+            error = None
+            try:
+                self.database.reference('/').update(dict(batch))
+            except Exception as e:
+                error = str(e)
+
+            with self.cond:
+                self.inflight = {}
+                if error is None:
+                    self.attempts = 0
+                    self.retry_at = None
+                    self.stats["flushes"] += 1
+                    self.stats["paths_flushed"] += len(batch)
+                    self._compact_spool()
+                    self.cond.notify_all()
+                    continue
+
+                # Put the batch back underneath anything written since.
+                newer, self.pending = self.pending, batch
+                for path, value in newer.items():
+                    _merge(self.pending, path, value)
+                self.oldest = self.oldest or time.monotonic()
+                # The batch was already due: retry once the backoff is over rather than after another interval.
+                self.flush_requested = True
+                self.attempts += 1
+                self.stats["failures"] += 1
+                self.stats["last_error"] = error
+                self.retry_at = time.monotonic() + min(self.max_backoff, 0.5 * 2 ** (self.attempts - 1))
+                print(f"Firebase write-behind flush failed (attempt {self.attempts}): {error}")
+                self.cond.notify_all()
+                if self.stopping:
+                    # Leave the rest in the spool for the next start.
+                    return
+
+    # Spooling. Each process journals to its own file and holds an flock on a
+    # companion lock file; a journal whose lock can be taken belongs to a dead
+    # process and is replayed into this one.
+
+    def _open_spool(self, spool_dir):
+        os.makedirs(spool_dir, exist_ok=True)
+        name = os.path.join(spool_dir, f"spool-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        lock = open(f"{name}.lock", 'w')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        self.spool = {"path": f"{name}.jsonl", "lock": lock, "file": open(f"{name}.jsonl", 'a')}
+
+        for journal in sorted(glob.glob(os.path.join(spool_dir, 'spool-*.jsonl'))):
+            if journal != self.spool["path"]:
+                self._recover(journal)
+        if self.pending:
+            self.oldest = time.monotonic()
+
+    def _recover(self, journal):
+        lock_path = journal[:-len('.jsonl')] + '.lock'
+        try:
+            lock = open(lock_path, 'a')
+        except OSError:
+            return
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return
+        try:
+            with open(journal) as f:
+                for line in f:
+                    try:
+                        updates = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append.
+                        continue
+                    for path, value in updates.items():
+                        _merge(self.pending, path, value)
+                    self.stats["recovered"] += 1
+            # The recovered writes must be in this process's journal before the dead one goes,
+            # or a crash in between would lose them.
+            if not self._compact_spool():
+                return
+            os.unlink(journal)
+            os.unlink(lock_path)
+        except OSError as e:
+            print(f"Could not recover write spool {journal}: {e}")
+        finally:
+            lock.close()
+
+    def _journal(self, updates):
+        if not self.spool:
+            return
+        spool = self.spool["file"]
+        spool.write(json.dumps(updates) + '\n')
+        spool.flush()
+        os.fsync(spool.fileno())
+
+    def _compact_spool(self):
+        """Rewrites the journal to hold only writes that are not saved yet. Returns False if it could not."""
+        if not self.spool:
+            return True
+        try:
+            tmp_path = self.spool["path"] + '.tmp'
+            with open(tmp_path, 'w') as f:
+                if self.pending:
+                    f.write(json.dumps(self.pending) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.spool["path"])
+            self.spool["file"].close()
+            self.spool["file"] = open(self.spool["path"], 'a')
+        except OSError as e:
+            print(f"Could not compact write spool: {e}")
+            return False
+        return True
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Runs each test in an empty directory, so caches and stores under .cache start empty."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('RESULT_STORE_DIR', '')
+    monkeypatch.setenv('TWELVELABS_CACHE_TTL', '0')
+    monkeypatch.setenv('TWELVELABS_RATE_LIMIT', '0')
+    monkeypatch.setenv('GEMINI_RATE_LIMIT', '0')
+    return tmp_path
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from benchmarks.stubs import StubGeminiModel
+from services.analysis_compactor import AnalysisCompactor, estimate_tokens
+from services.gemini_service import GeminiModelClient, GeminiService
+from services.result_store import ResultStore
+
+
+class FakeSummarizer:
+    """Answers every summary prompt with a short summary naming its section's first word."""
+
+    def __init__(self, latency=0.0, fail=False):
+        self.latency = latency
+        self.fail = fail
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.latency)
+            if self.fail:
+                raise RuntimeError("model overloaded")
+            section = prompt.split("Section:\n", 1)[1]
+            return f"Summary of {section.split()[0]}."
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def analysis(paragraphs=40, words=120):
+    return "\n\n".join(f"Topic{i} " + " ".join(f"word{i}x{j}" for j in range(words)) for i in range(paragraphs))
+
+
+def make_compactor(generate, **kwargs):
+    return AnalysisCompactor(generate, token_budget=1000, section_tokens=400, result_store=ResultStore(), **kwargs)
+
+
+def test_analysis_within_budget_is_unchanged():
+    model = FakeSummarizer()
+    text = analysis(paragraphs=2, words=20)
+
+    assert make_compactor(model).compact(text) == text
+    assert model.prompts == []
+
+
+def test_repeated_paragraphs_are_dropped_before_summarizing():
+    paragraph = "The speaker explains how the cache is invalidated after every write to the index."
+    text = "\n\n".join([paragraph, paragraph.upper(), "Something else entirely."] * 2)
+
+    compactor = make_compactor(FakeSummarizer())
+    assert compactor.deduplicate(compactor.paragraphs(text)) == [paragraph, "Something else entirely."]
+
+
+def test_sections_are_summarized_concurrently_and_cached():
+    model = FakeSummarizer(latency=0.05)
+    compactor = make_compactor(model, max_workers=4)
+    text = analysis()
+
+    compacted = compactor.compact(text, video_id="v1")
+
+    assert estimate_tokens(compacted) <= 1000
+    assert compacted.startswith("Summary of Topic0.")
+    assert model.max_active > 1
+    calls = len(model.prompts)
+    assert compactor.compact(text, video_id="v1") == compacted
+    assert len(model.prompts) == calls
+
+
+def test_failed_summaries_fall_back_to_trimming_and_are_not_cached():
+    model = FakeSummarizer(fail=True)
+    compactor = make_compactor(model)
+    text = analysis()
+
+    compacted = compactor.compact(text, video_id="v1")
+
+    assert estimate_tokens(compacted) <= 1000
+    # Every part of the video keeps a share of the budget
+    assert all(section[:40] in compacted for section in compactor.sections(compactor.paragraphs(text)))
+    model.fail = False
+    assert compactor.compact(text, video_id="v1").startswith("Summary of Topic0.")
+
+
+def test_decks_with_different_slide_counts_reuse_the_compacted_analysis(monkeypatch):
+    monkeypatch.setenv('GEMINI_ANALYSIS_TOKEN_BUDGET', '1000')
+    monkeypatch.setenv('GEMINI_ANALYSIS_SECTION_TOKENS', '400')
+    model = StubGeminiModel(latency=0)
+    prompts = []
+    generate_content = model.generate_content
+    model.generate_content = lambda prompt, **kwargs: prompts.append(prompt) or generate_content(prompt, **kwargs)
+    service = GeminiService(api_key='test', clients=[GeminiModelClient('stub', model=model)])
+
+    for num_slides in (3, 5):
+        assert "error" not in service.generate_slides(analysis(), f"Make {num_slides} slides", video_id="v1")
+
+    summaries = [prompt for prompt in prompts if "Section:" in prompt]
+    decks = [prompt for prompt in prompts if "Section:" not in prompt]
+    assert len(decks) == 2
+    assert len(summaries) == len(prompts) - 2 and summaries
+    assert all("word0x100" not in prompt for prompt in decks)
@@ -0,0 +1,30 @@
+import zipfile
+
+from services.deck_render import render_pptx
+
+DECK = {
+    "presentation_name": "Ideas <& more>",
+    "slides": [{"slide_number": n, "title": f"Slide {n}", "sub_points": [f"Point {p}" for p in range(n % 3)]}
+               for n in range(1, 6)]
+}
+
+
+def test_pptx_has_a_title_slide_and_one_slide_per_deck_slide(tmp_path):
+    render_pptx(DECK, tmp_path / "deck.pptx")
+
+    with zipfile.ZipFile(tmp_path / "deck.pptx") as package:
+        assert package.testzip() is None
+        names = package.namelist()
+        slides = [name for name in names if name.startswith("ppt/slides/slide")]
+        assert slides == [f"ppt/slides/slide{n}.xml" for n in range(1, 7)]
+        assert names.index("[Content_Types].xml") == 0
+        assert "Ideas &lt;&amp; more&gt;" in package.read("ppt/slides/slide1.xml").decode()
+        assert "Point 1" in package.read("ppt/slides/slide3.xml").decode()
+        assert package.read("ppt/presentation.xml").decode().count("<p:sldId ") == 6
+
+
+def test_pptx_is_reproducible(tmp_path):
+    render_pptx(DECK, tmp_path / "a.pptx")
+    render_pptx(DECK, tmp_path / "b.pptx")
+
+    assert (tmp_path / "a.pptx").read_bytes() == (tmp_path / "b.pptx").read_bytes()
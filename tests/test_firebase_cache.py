@@ -0,0 +1,30 @@
+from services.firebase_cache import FirebaseReadCache
+from services.firebase_service import FirebaseService
+from services.local_db import LocalDatabase
+
+
+def make_services():
+    """Two workers sharing one database, each with its own read cache."""
+    database = LocalDatabase()
+    return [FirebaseService(database=database, read_cache=FirebaseReadCache(database))
+            for _ in range(2)]
+
+
+def test_cached_miss_is_reloaded_after_another_worker_writes():
+    reader, writer = make_services()
+
+    assert reader.get_presentation("v1") is None
+    writer.save_presentation("v1", {"presentation_name": "Deck", "slides": []})
+
+    assert reader.get_presentation("v1")["presentation_name"] == "Deck"
+    assert reader.get_cache_stats()["negative_hits"] == 0
+
+
+def test_cached_miss_is_served_while_nothing_was_written():
+    reader, _ = make_services()
+
+    assert reader.get_presentation("v1") is None
+    assert reader.get_presentation("v1") is None
+
+    stats = reader.get_cache_stats()
+    assert (stats["misses"], stats["negative_hits"]) == (1, 1)
@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+
+from routes.metrics import metrics_bp
+from services.metrics import MetricsRegistry, bind_trace, instrument, metrics
+
+
+def test_figures_of_exited_threads_are_kept():
+    registry = MetricsRegistry()
+    operation = registry.operation("test", "work")
+
+    def work():
+        for _ in range(3):
+            operation.finish(operation.start(), size=100)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    work()
+
+    duration, size, errors, in_flight = operation.snapshot()
+    assert (duration.count, size.count, errors, in_flight) == (15, 15, 0, 0)
+    # The shards of the four exited threads were folded; only this thread's is left.
+    assert len(operation.shards) == 1
+
+
+def test_errors_and_calls_in_flight_are_counted():
+    registry = MetricsRegistry()
+
+    @instrument("test", registry=registry)
+    def lookup(found):
+        return {"id": 1} if found else {"error": "Not found"}
+
+    lookup(True)
+    lookup(False)
+    operation = registry.operation("test", "lookup")
+    start = operation.start()
+
+    _, _, errors, in_flight = operation.snapshot()
+    assert (errors, in_flight) == (1, 1)
+    operation.finish(start)
+
+
+def test_responses_are_counted_by_route_method_and_status():
+    app = Flask(__name__)
+    app.register_blueprint(metrics_bp)
+
+    @app.route('/items/<item_id>')
+    def item(item_id):
+        return ('found', 200) if item_id == '1' else ('missing', 404)
+
+    client = app.test_client()
+    for item_id in ('1', '1', '2'):
+        client.get(f'/items/{item_id}')
+    text = client.get('/metrics').get_data(as_text=True)
+
+    assert 'app_http_responses_total{route="/items/<item_id>",method="GET",status="200"} 2' in text
+    assert 'app_http_responses_total{route="/items/<item_id>",method="GET",status="404"} 1' in text
+    assert 'app_operation_errors_total{component="http",operation="GET /items/<item_id>"} 0' in text
+    metrics.operations.pop(("http", "GET /items/<item_id>"))
+    metrics.routes.pop(("/items/<item_id>", "GET"))
+
+
+def test_spans_of_work_submitted_to_a_pool_join_the_trace():
+    registry = MetricsRegistry(trace_sample=1.0)
+
+    @instrument("test", registry=registry)
+    def fetch(page):
+        return {"page": page}
+
+    trace = registry.start_trace("GET /videos")
+    with ThreadPoolExecutor(2) as executor:
+        for page in (1, 2):
+            executor.submit(bind_trace(fetch), page).result()
+        # Not bound: the pool thread does not see the trace
+        executor.submit(fetch, 3).result()
+    registry.end_trace(trace)
+
+    assert [span["operation"] for span in trace.spans] == ["fetch", "fetch"]
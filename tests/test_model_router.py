@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+
+from services.model_router import ModelRouter
+
+VALID = "valid deck"
+
+
+def validate(text):
+    return [] if text == VALID else [f"not a deck: {text}"]
+
+
+class FakeClient:
+    """Model client answering `reply` (or raising it) after `latency` seconds."""
+
+    def __init__(self, name, latency=0.0, reply=VALID):
+        self.name = name
+        self.latency = latency
+        self.reply = reply
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+
+class AsyncFakeClient(FakeClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cancelled = False
+
+    async def generate_async(self, prompt):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+
+def warm_up(router, name, latency, samples=10):
+    """Gives a model a latency history, so its p95 sets the hedge delay."""
+    for _ in range(samples):
+        router.stats[name].record(latency, True)
+
+
+def test_fast_primary_is_used_alone():
+    primary, secondary = FakeClient("primary"), FakeClient("secondary")
+    router = ModelRouter([primary, secondary])
+
+    assert router.generate("prompt", validate) == (VALID, "primary", [])
+    assert secondary.calls == 0
+
+
+def test_slow_primary_is_hedged_past_its_p95():
+    primary, secondary = FakeClient("primary", latency=1.0), FakeClient("secondary", latency=0.05)
+    router = ModelRouter([primary, secondary], min_hedge_delay=0.01)
+    warm_up(router, "primary", 0.05)
+
+    start = time.monotonic()
+    assert router.generate("prompt", validate) == (VALID, "secondary", [])
+
+    assert time.monotonic() - start < 0.5
+    stats = router.get_stats()["models"]
+    assert stats["secondary"]["hedges"] == 1
+    assert stats["secondary"]["wins"] == 1
+    assert stats["primary"]["cancelled"] == 1
+
+
+def test_no_hedge_when_disabled():
+    primary, secondary = FakeClient("primary", latency=0.2), FakeClient("secondary")
+    router = ModelRouter([primary, secondary], hedge=False, min_hedge_delay=0.01)
+    warm_up(router, "primary", 0.01)
+
+    assert router.generate("prompt", validate) == (VALID, "primary", [])
+    assert secondary.calls == 0
+
+
+def test_failed_call_falls_back_straight_away():
+    primary = FakeClient("primary", reply=RuntimeError("overloaded"))
+    secondary = FakeClient("secondary")
+    router = ModelRouter([primary, secondary], default_hedge_delay=10)
+
+    start = time.monotonic()
+    assert router.generate("prompt", validate) == (VALID, "secondary", [])
+    assert time.monotonic() - start < 1
+    assert router.get_stats()["models"]["primary"]["errors"] == 1
+
+
+def test_invalid_answer_falls_back_and_the_last_invalid_one_is_returned_if_nothing_is_valid():
+    router = ModelRouter([FakeClient("primary", reply="prose"), FakeClient("secondary")])
+    assert router.generate("prompt", validate) == (VALID, "secondary", [])
+
+    router = ModelRouter([FakeClient("primary", reply="prose"), FakeClient("secondary", reply="more prose")])
+    assert router.generate("prompt", validate) == ("more prose", "secondary", ["not a deck: more prose"])
+
+
+def test_every_call_failing_raises_the_last_error():
+    router = ModelRouter([FakeClient("primary", reply=RuntimeError("first")),
+                          FakeClient("secondary", reply=RuntimeError("second"))])
+
+    with pytest.raises(RuntimeError, match="second"):
+        router.generate("prompt", validate)
+
+
+def test_models_with_many_errors_are_tried_last():
+    primary, secondary = FakeClient("primary"), FakeClient("secondary")
+    router = ModelRouter([primary, secondary], max_error_rate=0.5)
+    for _ in range(10):
+        router.stats["primary"].record(0.1, False)
+
+    assert router.generate("prompt", validate) == (VALID, "secondary", [])
+    assert primary.calls == 0
+
+
+def test_async_hedge_cancels_the_loser():
+    primary, secondary = AsyncFakeClient("primary", latency=5.0), AsyncFakeClient("secondary", latency=0.05)
+    router = ModelRouter([primary, secondary], min_hedge_delay=0.01)
+    warm_up(router, "primary", 0.05)
+
+    start = time.monotonic()
+    assert asyncio.run(router.generate_async("prompt", validate)) == (VALID, "secondary", [])
+
+    assert time.monotonic() - start < 1
+    assert primary.cancelled
+    assert router.get_stats()["models"]["primary"]["cancelled"] == 1
+
+
+def test_async_falls_back_on_invalid_answers():
+    router = ModelRouter([AsyncFakeClient("primary", reply="prose"), AsyncFakeClient("secondary")])
+
+    assert asyncio.run(router.generate_async("prompt", validate)) == (VALID, "secondary", [])
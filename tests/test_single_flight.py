@@ -0,0 +1,177 @@
+import asyncio
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Upstream:
+    """A call that blocks until released, counting how often it ran."""
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def call_concurrently(single_flight, fn, callers=8):
+    """Runs `callers` identical calls at once and returns their outcomes, each (result, leader) or an exception."""
+    def call():
+        try:
+            return single_flight.do("key", fn)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(callers) as executor:
+        futures = [executor.submit(call) for _ in range(callers)]
+        fn.started.wait(5)
+        # Let every caller reach the in-flight call before it finishes
+        while single_flight.get_stats()["coalesced"] < callers - 1:
+            time.sleep(0.01)
+        fn.release.set()
+        return [future.result() for future in futures]
+
+
+@pytest.mark.parametrize("directory", [None, "single-flight"])
+def test_concurrent_identical_calls_run_once(directory):
+    single_flight = SingleFlight(directory)
+    upstream = Upstream(result={"slides": 3})
+
+    outcomes = call_concurrently(single_flight, upstream)
+
+    assert upstream.calls == 1
+    assert all(result == {"slides": 3} for result, _ in outcomes)
+    assert sorted(leader for _, leader in outcomes) == [False] * 7 + [True]
+    assert single_flight.get_stats()["saved"] == 7
+
+
+def test_exception_reaches_every_waiter():
+    single_flight = SingleFlight()
+    error = ValueError("upstream failed")
+
+    outcomes = call_concurrently(single_flight, Upstream(error=error))
+
+    assert outcomes == [error] * 8
+    assert single_flight.get_stats()["in_flight"] == 0
+
+
+def test_concurrent_async_calls_run_once():
+    single_flight = SingleFlight("single-flight")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "deck"
+
+    async def main():
+        return await asyncio.gather(*(single_flight.do_async("key", fetch) for _ in range(5)))
+
+    outcomes = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert sorted(outcomes) == [("deck", False)] * 4 + [("deck", True)]
+
+
+OTHER_WORKER = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from services.single_flight import SingleFlight
+
+def fetch():
+    open(sys.argv[3], 'w').close()
+    time.sleep(0.5)
+    return {"from": "other worker"}
+
+print(SingleFlight(sys.argv[2]).do("key", fetch))
+"""
+
+
+def test_result_of_another_process_is_shared(tmp_path):
+    started = tmp_path / "started"
+    other = subprocess.Popen([sys.executable, "-c", OTHER_WORKER, ROOT, str(tmp_path / "sf"), str(started)])
+    try:
+        while not started.exists():
+            assert other.poll() is None
+            time.sleep(0.01)
+        single_flight = SingleFlight(str(tmp_path / "sf"))
+        calls = []
+
+        result = single_flight.do("key", lambda: calls.append(1) or {"from": "this worker"})
+    finally:
+        other.wait(10)
+
+    assert result == ({"from": "other worker"}, False)
+    assert calls == []
+    assert single_flight.get_stats()["shared_across_workers"] == 1
+    assert not any(name.endswith('.lock') for name in os.listdir(tmp_path / "sf"))
+
+
+def hold_lock(single_flight, key="key"):
+    """Takes the key's lock the way another worker's call would."""
+    lock = open(single_flight._path(key, 'lock'), 'a')
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
+
+
+def test_waiter_makes_the_call_when_the_lock_holder_publishes_nothing():
+    single_flight = SingleFlight("single-flight")
+    holder = hold_lock(single_flight)
+
+    with ThreadPoolExecutor(1) as executor:
+        waiting = executor.submit(single_flight.do, "key", lambda: "computed here")
+        time.sleep(0.2)
+        assert not waiting.done()
+        # The holder dies: its lock is released without a result or the lock file being removed
+        holder.close()
+        result = waiting.result(5)
+
+    assert result == ("computed here", True)
+    assert single_flight.get_stats()["shared_across_workers"] == 0
+
+
+def test_stale_result_file_is_ignored_and_recomputed():
+    single_flight = SingleFlight("single-flight")
+    with open(single_flight._path("key", 'json'), 'w') as f:
+        json.dump({"finished_at": time.time() - 30, "result": "stale"}, f)
+
+    result = single_flight.do("key", lambda: "fresh")
+
+    assert result == ("fresh", True)
+    with open(single_flight._path("key", 'json')) as f:
+        assert json.load(f)["result"] == "fresh"
+
+
+def test_result_published_while_waiting_is_taken():
+    single_flight = SingleFlight("single-flight")
+    holder = hold_lock(single_flight)
+
+    with ThreadPoolExecutor(1) as executor:
+        waiting = executor.submit(single_flight.do, "key", lambda: "computed here")
+        time.sleep(0.1)
+        SingleFlight("single-flight")._publish("key", "published")
+        os.remove(single_flight._path("key", 'lock'))
+        holder.close()
+        result = waiting.result(5)
+
+    assert result == ("published", False)
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from benchmarks.stubs import StubGeminiModel, sample_deck
+from services.gemini_service import GeminiModelClient, GeminiService
+from services.llm_json import DeckStreamParser
+
+DECK = {
+    "presentation_name": 'Quotes "inside", a back\\slash and {braces}',
+    "slides": [
+        {"slide_number": 1, "title": "Intro [part 1]", "sub_points": ["a, b", "c: d"]},
+        {"slide_number": 2, "title": "Details", "sub_points": ["été – 漢字", "}{"]},
+        {"slide_number": 3, "title": "Wrap up", "sub_points": []}
+    ]
+}
+RESPONSE = 'Sure, here it is {not the deck}:\n```json\n' + json.dumps(DECK, indent=2) + '\n```\nHope this helps!'
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, len(RESPONSE)])
+def test_chunked_deck_is_parsed_incrementally(size):
+    parser = DeckStreamParser()
+    events = [event for chunk in chunks(RESPONSE, size) for event in parser.feed(chunk)]
+
+    assert events == [("presentation_name", DECK["presentation_name"])] + [("slide", slide) for slide in DECK["slides"]]
+    assert parser.finish() == (DECK, [])
+
+
+def test_slide_is_emitted_as_soon_as_it_closes():
+    first_slide_end = RESPONSE.index('"c: d"') + RESPONSE[RESPONSE.index('"c: d"'):].index('}') + 1
+    parser = DeckStreamParser()
+
+    events = parser.feed(RESPONSE[:first_slide_end])
+
+    assert events[-1] == ("slide", DECK["slides"][0])
+    assert parser.feed(RESPONSE[first_slide_end:])[0] == ("slide", DECK["slides"][1])
+
+
+@pytest.mark.parametrize("response, error", [
+    ("Sorry, I cannot make a presentation from this analysis.", "No JSON object found in Gemini response"),
+    ("{'presentation_name': 'Deck', 'slides': []}",
+     'Gemini response has no JSON object with a "presentation_name" or "slides" key'),
+    ('Here is a summary: {"title": "Deck"}',
+     'Gemini response has no JSON object with a "presentation_name" or "slides" key'),
+], ids=["no braces", "single quotes", "other object"])
+def test_response_without_a_deck_names_what_is_missing(response, error):
+    parser = DeckStreamParser()
+    parser.feed(response)
+
+    assert parser.finish() == (None, [error])
+
+
+def make_service(model):
+    return GeminiService(api_key='test', clients=[GeminiModelClient('stub', model=model)])
+
+
+def test_stream_slides_with_a_streaming_model():
+    service = make_service(StubGeminiModel(latency=0, num_slides=4, chunk_size=16))
+
+    events = list(service.stream_slides("An analysis", "Make 4 slides", video_id="v1"))
+
+    deck = sample_deck(4)
+    assert events == ([("meta", {"presentation_name": deck["presentation_name"]})]
+                      + [("slide", slide) for slide in deck["slides"]] + [("done", deck)])
+    # The same request again replays the stored deck
+    assert list(service.stream_slides("An analysis", "Make 4 slides", video_id="v1")) == events
+
+
+def test_stream_route_sends_events_and_saves_the_deck(monkeypatch):
+    monkeypatch.setenv('KEEP_ALIVE', 'off')
+    import main
+    from services.firebase_service import FirebaseService
+    from services.local_db import LocalDatabase
+    from services.registry import services
+
+    firebase = FirebaseService(database=LocalDatabase())
+    firebase.save_analysis("v1", {"analysis": "An analysis"})
+    monkeypatch.setitem(services.instances, 'firebase', firebase)
+    monkeypatch.setitem(services.instances, 'gemini', make_service(StubGeminiModel(latency=0, num_slides=3, chunk_size=8)))
+
+    response = main.app.test_client().post('/videos/v1/presentation/stream', json={"num_slides": 3})
+
+    assert response.mimetype == 'text/event-stream'
+    events = [block.split('\n', 1) for block in response.get_data(as_text=True).strip().split('\n\n')]
+    names = [name.removeprefix('event: ') for name, _ in events]
+    assert names == ["meta", "slide", "slide", "slide", "done"]
+    assert json.loads(events[-1][1].removeprefix('data: ')) == sample_deck(3)
+    assert firebase.get_presentation("v1") == sample_deck(3)
+
+
+def truncated_model():
+    model = StubGeminiModel(latency=0, num_slides=4, chunk_size=16)
+    model.text = model.text[:model.text.index('"slide_number": 3')]
+    return model
+
+
+def test_truncated_deck_is_flagged_and_not_stored():
+    service = make_service(truncated_model())
+
+    deck = service.generate_slides("An analysis", "Make 4 slides", video_id="v1")
+    events = list(service.stream_slides("An analysis", "Make 4 slides", video_id="v1"))
+
+    assert deck == {**sample_deck(4), "slides": sample_deck(4)["slides"][:2], "truncated": True}
+    assert events[-1] == ("done", deck)
+    assert service.result_store.get(service._slides_key("An analysis", "Make 4 slides", "v1")) is None
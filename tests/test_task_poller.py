@@ -0,0 +1,188 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from benchmarks.stubs import StubTaskServer
+from services.task_poller import TaskPoller
+from services.twelvelabs_service import TwelveLabsService
+
+
+@pytest.fixture
+def server():
+    stub = StubTaskServer(duration=0.3)
+    yield stub
+    stub.close()
+
+
+class Fetcher:
+    """`fetch` for a TaskPoller that reads tasks from the stub server and records every response."""
+
+    def __init__(self, server, failures=0):
+        self.server = server
+        self.failures = failures
+        self.responses = []
+        self.lock = threading.Lock()
+
+    def __call__(self, task_id):
+        if self.failures:
+            self.failures -= 1
+            status_code, body, headers = 503, {}, {}
+        else:
+            r = requests.get(f"{self.server.url}/tasks/{task_id}")
+            status_code, body, headers = r.status_code, r.json(), r.headers
+        with self.lock:
+            self.responses.append((time.monotonic(), status_code))
+        return status_code, body, headers
+
+    def gaps(self):
+        times = [at for at, _ in self.responses]
+        return [later - earlier for earlier, later in zip(times, times[1:])]
+
+
+def make_poller(fetch, **kwargs):
+    options = {"min_interval": 0.05, "max_interval": 5, "age_factor": 0, "max_requests_per_second": 0}
+    return TaskPoller(fetch, **{**options, **kwargs})
+
+
+def test_poll_interval_grows_with_task_age():
+    poller = make_poller(None, min_interval=1, max_interval=30, age_factor=0.2)
+
+    def interval(age, task=None):
+        return poller._interval({"started": time.monotonic() - age, "errors": 0}, task)
+
+    assert [round(interval(age)) for age in (0, 10, 60, 1000)] == [1, 2, 12, 30]
+    assert round(interval(60, {"process": {"remain_seconds": 8}})) == 4
+    assert round(interval(10, {"process": {"percentage": 25}})) == 15
+
+
+def test_failed_polls_back_off_and_the_interval_resets_on_success(server):
+    # Far from done, so the stub reports 0% and the interval stays at min_interval
+    server.duration = 10000
+    fetch = Fetcher(server, failures=3)
+    poller = make_poller(fetch)
+
+    poller.watch(server.create_task())
+    while len(fetch.responses) < 5:
+        time.sleep(0.05)
+    poller.shutdown()
+
+    assert [status for _, status in fetch.responses[:5]] == [503, 503, 503, 200, 200]
+    backoff = fetch.gaps()[:3]
+    assert [round(gap, 1) for gap in backoff] == [0.1, 0.2, 0.4]
+    assert fetch.gaps()[3] < 0.1
+
+
+def test_polling_pauses_for_retry_after(server):
+    server.rate_limit = 1
+    fetch = Fetcher(server)
+    poller = make_poller(fetch, max_requests_per_second=20)
+
+    results = [poller.watch(server.create_task()) for _ in range(3)]
+    assert all(future.result(timeout=15)["status"] == "ready" for future in results)
+
+    throttled = [at for at, status in fetch.responses if status == 429]
+    assert throttled
+    for at in throttled:
+        # The stub asks for one second; nothing is sent until it has passed.
+        assert all(later >= at + 0.95 for later, _ in fetch.responses if later > at)
+    assert poller.get_stats()["rate_limited"] == len(throttled)
+
+
+def test_polling_pauses_when_the_rate_limit_is_used_up(server):
+    server.rate_limit = 2
+    server.rate_headers = True
+    fetch = Fetcher(server)
+    poller = make_poller(fetch, max_requests_per_second=20)
+
+    results = [poller.watch(server.create_task()) for _ in range(4)]
+    assert all(future.result(timeout=15)["status"] == "ready" for future in results)
+
+    # X-Ratelimit-Remaining 0 pauses polling until X-Ratelimit-Reset, before the server has to refuse a request
+    assert server.requests["throttled"] == 0
+    assert poller.get_stats()["rate_limited"] > 0
+
+
+def test_task_that_never_finishes_times_out(server):
+    server.duration = 10000
+    poller = make_poller(Fetcher(server))
+
+    result = poller.watch(server.create_task(), timeout_seconds=0.3).result(timeout=5)
+
+    assert result == {"error": "Upload timed out"}
+    assert poller.get_stats()["timed_out"] == 1
+
+
+SECRET = "webhook-secret"
+
+
+def sign(body, secret=SECRET, timestamp=None):
+    timestamp = str(int(time.time()) if timestamp is None else timestamp)
+    signature = hmac.new(secret.encode(), timestamp.encode() + b'.' + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+@pytest.fixture
+def webhook_app(server, monkeypatch):
+    monkeypatch.setenv('TWELVELABS_WEBHOOK_SECRET', SECRET)
+    monkeypatch.setenv('TWELVELABS_POLL_MIN_INTERVAL', '0.05')
+    monkeypatch.setenv('TWELVELABS_POLL_RATE', '0')
+    monkeypatch.setenv('KEEP_ALIVE', 'off')
+    import main
+    from services.registry import services
+
+    service = TwelveLabsService(api_key='test', base_url=server.url, backoff_factor=0)
+    monkeypatch.setitem(services.instances, 'twelvelabs', service)
+    yield main.app.test_client(), service
+    service.task_poller.shutdown()
+
+
+def post_event(client, task_id):
+    body = json.dumps({"type": "index.task.ready", "data": {"id": task_id, "video_id": "video-1"}}).encode()
+    return client.post('/webhooks/twelvelabs', data=body, content_type='application/json',
+                       headers={"TL-Signature": sign(body)})
+
+
+def test_webhook_completes_a_task_without_waiting_for_the_next_poll(server, webhook_app):
+    client, service = webhook_app
+    server.duration = 10000
+    task_id = server.create_task()
+    future = service.watch_task(task_id, index_id='stub-index')
+    # The first poll comes after min_interval; the next only after the 60 s webhook safety interval
+    while server.requests["get"] < 1:
+        time.sleep(0.01)
+
+    response = post_event(client, task_id)
+
+    assert response.status_code == 200
+    assert response.get_json() == {"received": True, "matched": True}
+    result = future.result(timeout=1)
+    assert (result["status"], result["video_id"]) == ("ready", "video-1")
+    assert server.requests["get"] == 1
+    assert service.get_task_stats()["webhooks"] == 1
+
+
+@pytest.mark.parametrize("signature", [
+    lambda body: "",
+    lambda body: "t=1,v1=0",
+    lambda body: sign(b"another body"),
+    lambda body: sign(body, secret="wrong-secret"),
+    lambda body: sign(body, timestamp=int(time.time()) - 3600),
+], ids=["missing", "malformed", "other body", "wrong secret", "too old"])
+def test_webhook_with_a_bad_signature_is_rejected(server, webhook_app, signature):
+    client, service = webhook_app
+    server.duration = 10000
+    task_id = server.create_task()
+    future = service.watch_task(task_id)
+
+    body = json.dumps({"type": "index.task.ready", "data": {"id": task_id}}).encode()
+    response = client.post('/webhooks/twelvelabs', data=body, content_type='application/json',
+                           headers={"TL-Signature": signature(body)})
+
+    assert response.status_code == 401
+    assert not future.done()
+    assert service.get_task_stats()["webhooks"] == 0
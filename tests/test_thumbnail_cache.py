@@ -0,0 +1,50 @@
+import os
+
+from services.thumbnail_cache import ThumbnailCache
+
+IMAGE = b'\xff\xd8\xff' + b'\0' * 97
+
+
+def cached_keys(cache):
+    return sorted(key for key in ("a", "b", "c", "d", "e") if cache.lookup(key) is not None)
+
+
+def test_stores_do_not_scan_the_directory_until_the_cache_is_full(monkeypatch):
+    cache = ThumbnailCache("thumbnails", max_bytes=1000)
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scans.append(path) or scandir(path))
+
+    for i in range(10):
+        cache.put(f"video-{i}", IMAGE)
+    assert scans == []
+    assert cache.get_stats()["bytes_cached"] == 1000
+
+    cache.put("video-10", IMAGE)
+    assert len(scans) == 1
+    # Pruned to 90% of the limit
+    assert cache.get_stats()["bytes_cached"] == 900
+    assert cache.get_stats()["evictions"] == 2
+    assert cache.lookup("video-0") is None and cache.lookup("video-1") is None
+    assert cache.lookup("video-10")["content_type"] == "image/jpeg"
+
+
+def test_least_recently_used_images_are_evicted_first():
+    cache = ThumbnailCache("thumbnails", max_bytes=450)
+    for key in ("a", "b", "c", "d"):
+        cache.put(key, IMAGE)
+    assert cache.lookup("a") is not None
+
+    cache.put("e", IMAGE)
+
+    # Pruned to 90% of the limit, which takes one image
+    assert cached_keys(cache) == ["a", "c", "d", "e"]
+
+
+def test_index_is_read_from_the_directory_at_startup():
+    ThumbnailCache("thumbnails", max_bytes=450).put("a", IMAGE)
+
+    cache = ThumbnailCache("thumbnails", max_bytes=450)
+
+    assert cache.get_stats()["bytes_cached"] == 100
+    assert cache.lookup("a")["size"] == 100
@@ -0,0 +1,66 @@
+import io
+
+import pytest
+
+from benchmarks.stubs import Latency, StubTaskServer
+from services.twelvelabs_service import TwelveLabsService
+from services.upload_stream import UploadProgress
+
+
+@pytest.fixture
+def server():
+    stub = StubTaskServer(duration=0.2)
+    yield stub
+    stub.close()
+
+
+def make_service(stub, **kwargs):
+    return TwelveLabsService(api_key='test', base_url=stub.url, backoff_factor=0, **kwargs)
+
+
+def test_stream_upload_sends_every_byte(server):
+    video = b'\x00\x01video' * 100_000
+    progress = UploadProgress(total_bytes=len(video))
+
+    result = make_service(server).create_upload_task_stream(
+        'index', io.BytesIO(video), 'clip.mp4', progress=progress, chunk_size=64 * 1024)
+
+    assert result["task_id"] == "task1"
+    assert result["progress"]["bytes_read"] == len(video)
+    assert progress.bytes_sent > len(video)  # the multipart framing is counted too
+    assert progress.chunks > 1
+    assert server.requests["create"] == 1
+
+
+def test_stream_upload_is_not_retried(server):
+    server.latency = Latency(0, failure_rate=1)
+
+    result = make_service(server, max_retries=3).create_upload_task_stream('index', io.BytesIO(b'video'), 'clip.mp4')
+
+    assert "503" in result["error"]
+    assert server.requests["failed"] == 1
+
+
+def test_reads_are_retried_on_5xx(server):
+    server.latency = Latency(0, failure_rate=1)
+
+    response = make_service(server, max_retries=2)._request("get_task", "GET", f"{server.url}/tasks/task1")
+
+    assert response.status_code == 503
+    assert server.requests["failed"] == 3
+
+
+def test_upload_then_poll_waits_out_retry_after(server, monkeypatch):
+    monkeypatch.setenv('TWELVELABS_POLL_MIN_INTERVAL', '0.05')
+    monkeypatch.setenv('TWELVELABS_POLL_RATE', '0')
+    server.rate_limit = 1
+    service = make_service(server)
+
+    tasks = [service.create_upload_task_stream('index', io.BytesIO(b'video'), f'clip{i}.mp4')["task_id"] for i in range(2)]
+    results = [service.watch_task(task_id, timeout_seconds=10, index_id='index').result(timeout=10) for task_id in tasks]
+
+    assert [result["status"] for result in results] == ["ready", "ready"]
+    assert [result["video_id"] for result in results] == ["video-task1", "video-task2"]
+    assert server.requests["throttled"] >= 1
+    assert service.get_task_stats()["rate_limited"] >= 1
+    service.task_poller.shutdown()
@@ -0,0 +1,43 @@
+import pytest
+
+
+class VideoPages:
+    """Stands in for TwelveLabsService's page listing."""
+
+    def __init__(self, page):
+        self.page = page
+
+    def get_videos_page(self, index_id, **kwargs):
+        return self.page
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('KEEP_ALIVE', 'off')
+    import main
+    return main.app.test_client()
+
+
+def use_page(monkeypatch, page):
+    from services.registry import services
+    monkeypatch.setitem(services.instances, 'twelvelabs', VideoPages(page))
+
+
+def test_page_of_videos_carries_the_paging_headers(client, monkeypatch):
+    use_page(monkeypatch, {"data": [{"id": "video-1"}], "page_info": {"page": 2, "total_page": 3, "total_results": 5}})
+
+    response = client.get('/indexes/index-1/videos?page=2')
+
+    assert response.status_code == 200
+    assert response.get_json() == [{"id": "video-1"}]
+    assert (response.headers['X-Page'], response.headers['X-Total-Pages'], response.headers['X-Total-Results']) == \
+        ('2', '3', '5')
+
+
+def test_upstream_error_is_a_502_not_an_empty_index(client, monkeypatch):
+    use_page(monkeypatch, {"error": "Failed to fetch videos: 500"})
+
+    response = client.get('/indexes/index-1/videos')
+
+    assert response.status_code == 502
+    assert response.get_json() == {"error": "Failed to fetch videos: 500"}
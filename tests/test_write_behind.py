@@ -0,0 +1,140 @@
+import glob
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from services.firebase_service import FirebaseService
+from services.local_db import LocalDatabase
+from services.write_behind import WriteBehindBuffer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RecordingDatabase(LocalDatabase):
+    """A LocalDatabase whose root updates are recorded and can be made to fail."""
+
+    def __init__(self, failures=0):
+        super().__init__()
+        self.failures = failures
+        self.updates = []
+
+    def reference(self, path='/'):
+        ref = super().reference(path)
+        if path != '/':
+            return ref
+        update = ref.update
+
+        def recorded(value):
+            self.updates.append((time.monotonic(), dict(value)))
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("database unavailable")
+            update(value)
+        ref.update = recorded
+        return ref
+
+
+def test_repeated_writes_are_coalesced_into_one_update():
+    database = RecordingDatabase()
+    buffer = WriteBehindBuffer(database, flush_interval=60)
+
+    for name in ("first", "second", "third"):
+        buffer.put({"presentations/v1": {"presentation_name": name}})
+    buffer.put({"presentations/v1/slides": []})
+    assert buffer.flush()
+
+    assert len(database.updates) == 1
+    assert database.reference("presentations/v1").get() == {"presentation_name": "third", "slides": []}
+    assert buffer.get_stats()["coalesced"] == 3
+    buffer.close()
+
+
+def test_failed_flush_is_retried_with_backoff_and_keeps_the_writes():
+    database = RecordingDatabase(failures=1)
+    buffer = WriteBehindBuffer(database, flush_interval=60)
+
+    buffer.put({"video_analysis/v1": {"analysis": "An analysis"}})
+    assert buffer.flush(timeout=5)
+
+    (failed_at, batch), (retried_at, retried) = database.updates
+    assert retried == batch
+    assert retried_at - failed_at >= 0.5
+    assert database.reference("video_analysis/v1/analysis").get() == "An analysis"
+    stats = buffer.get_stats()
+    assert (stats["failures"], stats["flushes"]) == (1, 1)
+    buffer.close()
+
+
+def test_reads_see_writes_that_are_not_saved_yet():
+    database = RecordingDatabase(failures=1000)
+    buffer = WriteBehindBuffer(database, flush_interval=60)
+    firebase = FirebaseService(database=database, write_buffer=buffer)
+
+    firebase.save_presentation("v1", {"presentation_name": "Deck", "slides": []})
+
+    assert database.reference("presentations/v1").get() is None
+    assert firebase.get_presentation("v1")["presentation_name"] == "Deck"
+    assert buffer.lookup("presentations/v1/presentation_name") == (True, "Deck")
+    assert buffer.lookup("presentations/v2") == (False, None)
+    buffer.close()
+
+
+CRASHING_WORKER = """
+import os, sys
+sys.path.insert(0, sys.argv[1])
+from services.write_behind import WriteBehindBuffer
+
+class Unreachable:
+    def reference(self, path='/'):
+        raise ConnectionError("database unavailable")
+
+buffer = WriteBehindBuffer(Unreachable(), flush_interval=60, spool_dir=sys.argv[2])
+buffer.put({"presentations/v1": {"presentation_name": "Deck"}})
+buffer.put({"presentations/v1/slides": [{"title": "One"}], "video_analysis/v1": {"analysis": "An analysis"}})
+os._exit(1)
+"""
+
+
+def crash_worker(spool_dir):
+    subprocess.run([sys.executable, "-c", CRASHING_WORKER, ROOT, str(spool_dir)], check=False, timeout=30)
+
+
+def test_spool_of_a_crashed_worker_is_replayed(tmp_path):
+    crash_worker(tmp_path)
+    assert len(glob.glob(str(tmp_path / "spool-*.jsonl"))) == 1
+
+    database = RecordingDatabase()
+    buffer = WriteBehindBuffer(database, flush_interval=60, spool_dir=str(tmp_path))
+    assert buffer.flush()
+
+    assert database.reference("presentations/v1").get() == {"presentation_name": "Deck", "slides": [{"title": "One"}]}
+    assert database.reference("video_analysis/v1/analysis").get() == "An analysis"
+    assert buffer.get_stats()["recovered"] == 2
+    buffer.close()
+    assert os.listdir(tmp_path) == []
+
+
+class Crash(Exception):
+    pass
+
+
+def test_recovered_writes_are_journaled_before_the_dead_spool_is_removed(tmp_path, monkeypatch):
+    crash_worker(tmp_path)
+    (dead_journal,) = glob.glob(str(tmp_path / "spool-*.jsonl"))
+    unlink = os.unlink
+
+    def crash_on_removing_the_dead_journal(path, *args, **kwargs):
+        if path == dead_journal:
+            raise Crash()
+        unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "unlink", crash_on_removing_the_dead_journal)
+    with pytest.raises(Crash):
+        WriteBehindBuffer(RecordingDatabase(failures=1000), flush_interval=60, spool_dir=str(tmp_path))
+
+    (own_journal,) = [path for path in glob.glob(str(tmp_path / "spool-*.jsonl")) if path != dead_journal]
+    with open(own_journal) as f:
+        assert "An analysis" in f.read()